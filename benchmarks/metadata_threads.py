@@ -0,0 +1,59 @@
+"""Metadata throughput of HDFileSystem as a function of thread count
+
+Runs ``info`` and ``ls`` calls from a growing number of threads, once with
+all threads sharing one connection and once with ``thread_local=True``, and
+prints the number of calls per second for each.
+
+    $ python benchmarks/metadata_threads.py --host localhost --port 8020
+"""
+from __future__ import print_function
+
+import argparse
+import threading
+import time
+
+from hdfs3 import HDFileSystem
+
+
+def run(hdfs, path, nthreads, calls):
+    def work():
+        for i in range(calls):
+            hdfs.info(path)
+            hdfs.ls(path, detail=False)
+
+    threads = [threading.Thread(target=work) for i in range(nthreads)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return 2 * calls * nthreads / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8020)
+    parser.add_argument('--path', default='/tmp',
+                        help='directory to query')
+    parser.add_argument('--calls', type=int, default=200,
+                        help='iterations per thread')
+    parser.add_argument('--threads', default='1,2,4,8,16,32',
+                        help='comma-separated thread counts')
+    args = parser.parse_args()
+
+    counts = [int(n) for n in args.threads.split(',')]
+    print('%8s %14s %14s' % ('threads', 'shared ops/s', 'local ops/s'))
+    for n in counts:
+        rates = []
+        for thread_local in [False, True]:
+            hdfs = HDFileSystem(host=args.host, port=args.port,
+                                thread_local=thread_local,
+                                max_handles=max(counts))
+            rates.append(run(hdfs, args.path, n, args.calls))
+            hdfs.disconnect()
+        print('%8d %14.0f %14.0f' % (n, rates[0], rates[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,9 @@ from __future__ import absolute_import
 
 from .conf import conf
 from .core import HDFileSystem, HDFile
-from .mapping import HDFSMap
+from .mapping import HDFSMap, HDFSPackedMap
+from .index import HDFSIndex
+from .hedge import HedgedReads
 
 from ._version import get_versions
 __version__ = get_versions()['version']
@@ -0,0 +1,218 @@
+"fsspec file-system interface to HDFileSystem"
+from __future__ import absolute_import
+
+from hashlib import md5
+
+import fsspec
+from fsspec.spec import AbstractFileSystem, AbstractBufferedFile
+from fsspec.utils import stringify_path
+
+from .compatibility import FileExistsError, urlparse
+from .core import HDFileSystem, DEFAULT_WORKERS
+from .utils import threaded_map, MyNone
+
+
+def _to_fsspec(info):
+    """ fsspec's form of an info dict: the kind is under 'type' """
+    info = dict(info)
+    info['type'] = info['kind']
+    return info
+
+
+class FsspecHDFileSystem(AbstractFileSystem):
+    """ HDFileSystem behind the fsspec interface
+
+    Gives fsspec-based libraries (dask, pandas, ...) access to HDFS through
+    libhdfs3, with fsspec's caching of file blocks. Listings and file
+    information come from the native metadata calls, and ``cat``,
+    ``cat_file`` and ``cat_ranges`` fetch byte ranges of many files
+    concurrently. The ``hdfs3://`` protocol is registered with fsspec by
+    an entry point of the installed package, and by importing this module.
+
+    Parameters
+    ----------
+    host, port : as for ``HDFileSystem``
+    hdfs : HDFileSystem or None
+        existing connection to use instead of making one
+    workers : int
+        number of files read concurrently by ``cat`` and ``cat_ranges``
+    kwargs : passed to ``HDFileSystem``
+
+    Examples
+    --------
+    >>> import hdfs3._fsspec  # doctest: +SKIP
+    >>> fs = fsspec.filesystem('hdfs3', host='namenode', port=8020)  # doctest: +SKIP
+    >>> fs.cat_ranges(['/data/a.parquet', '/data/b.parquet'], -8, None)  # doctest: +SKIP
+    [b'...PAR1', b'...PAR1']
+    >>> df = pd.read_csv('hdfs3://namenode:8020/data/file.csv')  # doctest: +SKIP
+    """
+    protocol = ('hdfs3', 'hdfs')
+    root_marker = '/'
+
+    def __init__(self, host=MyNone, port=MyNone, hdfs=None,
+                 workers=DEFAULT_WORKERS, **kwargs):
+        super(FsspecHDFileSystem, self).__init__(
+            host=host, port=port, hdfs=hdfs, workers=workers, **kwargs)
+        if hdfs is None:
+            hdfs = HDFileSystem(host=host, port=port, **kwargs)
+        self.hdfs = hdfs
+        self.workers = workers
+
+    @classmethod
+    def _strip_protocol(cls, path):
+        if isinstance(path, list):
+            return [cls._strip_protocol(p) for p in path]
+        path = stringify_path(path)
+        if '://' in path:
+            path = urlparse(path).path
+        return path.rstrip('/') or cls.root_marker
+
+    @staticmethod
+    def _get_kwargs_from_urls(path):
+        url = urlparse(stringify_path(path))
+        out = {}
+        if url.hostname:
+            out['host'] = url.hostname
+        if url.port:
+            out['port'] = url.port
+        return out
+
+    def ls(self, path, detail=True, **kwargs):
+        path = self._strip_protocol(path)
+        if not self.hdfs.isdir(path):
+            # fsspec lists a file as itself
+            out = [self.info(path)]
+        else:
+            out = [_to_fsspec(i) for i in self.hdfs.ls(path, detail=True)]
+        return out if detail else [i['name'] for i in out]
+
+    def info(self, path, **kwargs):
+        return _to_fsspec(self.hdfs.info(self._strip_protocol(path)))
+
+    def exists(self, path, **kwargs):
+        return self.hdfs.exists(self._strip_protocol(path))
+
+    def ukey(self, path):
+        """ Hash of the path, modification time and size """
+        info = self.info(path)
+        return md5(('%s-%s-%s' % (info['name'], info['last_mod'],
+                                  info['size'])).encode()).hexdigest()
+
+    def mkdir(self, path, create_parents=True, **kwargs):
+        path = self._strip_protocol(path)
+        if create_parents:
+            self.hdfs.makedirs(path)
+        else:
+            self.hdfs.mkdir(path)
+
+    def makedirs(self, path, exist_ok=False):
+        path = self._strip_protocol(path)
+        if not exist_ok and self.hdfs.exists(path):
+            raise FileExistsError(path)
+        self.hdfs.makedirs(path)
+
+    def rmdir(self, path):
+        self.hdfs.rm(self._strip_protocol(path), recursive=False)
+
+    def _rm(self, path):
+        self.hdfs.rm(self._strip_protocol(path), recursive=False)
+
+    def rm(self, path, recursive=False, maxdepth=None):
+        if maxdepth is not None:
+            return super(FsspecHDFileSystem, self).rm(path, recursive,
+                                                      maxdepth)
+        paths = path if isinstance(path, list) else [path]
+        errors = self.hdfs.rm_many(self._strip_protocol(paths), recursive,
+                                   self.workers)
+        for err in errors.values():
+            if err is not None:
+                raise err
+
+    def mv(self, path1, path2, recursive=False, maxdepth=None, **kwargs):
+        path1 = self._strip_protocol(path1)
+        path2 = self._strip_protocol(path2)
+        if not self.hdfs.mv(path1, path2):
+            raise IOError('Move failed: %s -> %s' % (path1, path2))
+
+    def cat_file(self, path, start=None, end=None, **kwargs):
+        path = self._strip_protocol(path)
+        return self.hdfs._read_ranges(path, [(start, end)])[0]
+
+    def cat_ranges(self, paths, starts, ends, max_gap=None, on_error='return',
+                   **kwargs):
+        """ Byte ranges of one or more files, see ``HDFileSystem.cat_ranges``
+        """
+        if not isinstance(paths, list):
+            raise TypeError('paths must be a list')
+        out = self.hdfs.cat_ranges(self._strip_protocol(paths), starts, ends,
+                                   self.workers)
+        if on_error != 'return':
+            for res in out:
+                if isinstance(res, Exception):
+                    raise res
+        return out
+
+    def cat(self, path, recursive=False, on_error='raise', **kwargs):
+        paths = self.expand_path(path, recursive=recursive)
+        if (len(paths) == 1 and not isinstance(path, list) and
+                paths[0] == self._strip_protocol(path)):
+            return self.cat_file(paths[0])
+        results = threaded_map(self.cat_file, paths, self.workers,
+                               return_exceptions=True)
+        out = {}
+        for path, res in zip(paths, results):
+            if isinstance(res, Exception):
+                if on_error == 'raise':
+                    raise res
+                if on_error == 'omit':
+                    continue
+            out[path] = res
+        return out
+
+    def _open(self, path, mode='rb', block_size=None, autocommit=True,
+              cache_options=None, **kwargs):
+        if not autocommit:
+            raise NotImplementedError('HDFS writes cannot be deferred')
+        return FsspecHDFile(self, path, mode, block_size=block_size,
+                            cache_options=cache_options, **kwargs)
+
+
+class FsspecHDFile(AbstractBufferedFile):
+    """ fsspec file reading and writing through an ``HDFile``
+
+    Reads fetch the ranges asked for by fsspec's cache from one open
+    ``HDFile``, whose size is known from the start, so that seeking costs no
+    request to the name-node.
+    """
+
+    def __init__(self, fs, path, mode='rb', **kwargs):
+        self._file = None
+        super(FsspecHDFile, self).__init__(fs, path, mode, **kwargs)
+
+    def _fetch_range(self, start, end):
+        if self._file is None:
+            self._file = self.fs.hdfs.open(self.path, 'rb', size=self.size)
+        self._file.seek(start)
+        return self._file.read(end - start)
+
+    def _initiate_upload(self):
+        if self.mode == 'xb' and self.fs.hdfs.exists(self.path):
+            raise FileExistsError(self.path)
+        self._file = self.fs.hdfs.open(self.path,
+                                       'ab' if self.mode == 'ab' else 'wb')
+
+    def _upload_chunk(self, final=False):
+        self._file.write(self.buffer.getvalue())
+        if final:
+            self._file.close()
+            self._file = None
+        return True
+
+    def close(self):
+        super(FsspecHDFile, self).close()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+fsspec.register_implementation('hdfs3', FsspecHDFileSystem, clobber=True)
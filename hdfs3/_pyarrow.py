@@ -1,12 +1,189 @@
 from __future__ import absolute_import
 
 import pyarrow as pa
+try:
+    from pyarrow import fs as pafs
+except ImportError:  # pyarrow < 2
+    pafs = None
 
+from .compatibility import FileNotFoundError, urlparse
+from .core import DEFAULT_WORKERS, DEFAULT_READ_BUFFER_SIZE
+from .utils import threaded_map
 
-class HDFSWrapper(pa.filesystem.DaskFileSystem):
-    """Pyarrow compatibility wrapper class"""
-    def isdir(self, path):
-        return self.fs.isdir(path)
 
-    def isfile(self, path):
-        return self.fs.isfile(path)
+if hasattr(pa, 'filesystem'):  # removed in pyarrow 2
+    class HDFSWrapper(pa.filesystem.DaskFileSystem):
+        """Pyarrow compatibility wrapper class"""
+        def isdir(self, path):
+            return self.fs.isdir(path)
+
+        def isfile(self, path):
+            return self.fs.isfile(path)
+
+
+class ArrowHDFile(object):
+    """ HDFile as the file object of a ``pyarrow.PythonFile``
+
+    pyarrow reads through ``read_buffer``, which returns a ``pyarrow.Buffer``
+    over the memory that the data was read into, without copying it. The
+    size of the file is looked up once, so that the seeks and ``read_at``
+    calls of pyarrow's readers make no requests to the name-node. Other
+    attributes are those of the file.
+    """
+
+    def __init__(self, f):
+        self.f = f
+
+    def read_buffer(self, nbytes):
+        return pa.py_buffer(self.f.read(nbytes, out_buffer=True))
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+
+def open_input_file(hdfs, path):
+    """ Open a file on HDFS for reading as a ``pyarrow.NativeFile``
+
+    Examples
+    --------
+    >>> f = open_input_file(hdfs, '/data/file.parquet')  # doctest: +SKIP
+    >>> f.read_at(8, f.size() - 8)  # doctest: +SKIP
+    b'...PAR1'
+    >>> pyarrow.parquet.read_table(f)  # doctest: +SKIP
+    """
+    return pa.PythonFile(ArrowHDFile(hdfs.open(path, 'rb')), mode='r')
+
+
+def _file_info(path, kind, size, last_mod):
+    if kind == 'directory':
+        return pafs.FileInfo(path, pafs.FileType.Directory, mtime=last_mod)
+    return pafs.FileInfo(path, pafs.FileType.File, mtime=last_mod, size=size)
+
+
+class HDFSHandler(object if pafs is None else pafs.FileSystemHandler):
+    """ pyarrow file-system handler calling an HDFileSystem
+
+    Wrapped in a ``pyarrow.fs.PyFileSystem``, as made by
+    ``arrow_filesystem``, this lets ``pyarrow.dataset`` and
+    ``pyarrow.parquet`` work on HDFS through libhdfs3. Information about
+    many paths, and recursive listings, are fetched concurrently; files
+    are read through ``ArrowHDFile``.
+
+    Parameters
+    ----------
+    hdfs : HDFileSystem
+    workers : int
+        number of concurrent requests for file information and listings
+    """
+
+    def __init__(self, hdfs, workers=DEFAULT_WORKERS):
+        self.hdfs = hdfs
+        self.workers = workers
+
+    def __eq__(self, other):
+        return (isinstance(other, HDFSHandler) and
+                other.hdfs.conf == self.hdfs.conf)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        # equal handlers have equal conf
+        return hash(tuple(sorted((k, str(v))
+                                 for k, v in self.hdfs.conf.items())))
+
+    def equals(self, other):
+        return self == other
+
+    def get_type_name(self):
+        return 'hdfs3'
+
+    def normalize_path(self, path):
+        return urlparse(path).path if '://' in path else path
+
+    def _info(self, path):
+        try:
+            info = self.hdfs.info(path)
+        except FileNotFoundError:
+            return pafs.FileInfo(path, pafs.FileType.NotFound)
+        return _file_info(path, info['kind'], info['size'], info['last_mod'])
+
+    def get_file_info(self, paths):
+        return threaded_map(self._info, paths, self.workers)
+
+    def get_file_info_selector(self, selector):
+        path = selector.base_dir
+        if not self.hdfs.isdir(path):
+            if selector.allow_not_found and not self.hdfs.exists(path):
+                return []
+            raise FileNotFoundError(path)
+        if selector.recursive:
+            entries = self.hdfs._walk_entries(path, self.workers)
+        else:
+            entries = self.hdfs.scandir(path)
+        return [_file_info(e.path, e.kind, e.size, e.last_mod)
+                for e in entries]
+
+    def create_dir(self, path, recursive):
+        if recursive:
+            self.hdfs.makedirs(path)
+        else:
+            self.hdfs.mkdir(path)
+
+    def delete_dir(self, path):
+        self.hdfs.rm(path, recursive=True)
+
+    def delete_dir_contents(self, path, missing_dir_ok=False):
+        if not self.hdfs.exists(path):
+            if missing_dir_ok:
+                return
+            raise FileNotFoundError(path)
+        errors = self.hdfs.rm_many(self.hdfs.ls(path, detail=False),
+                                   workers=self.workers)
+        for err in errors.values():
+            if err is not None:
+                raise err
+
+    def delete_root_dir_contents(self):
+        self.delete_dir_contents('/')
+
+    def delete_file(self, path):
+        if not self.hdfs.isfile(path):
+            raise FileNotFoundError(path)
+        self.hdfs.rm(path, recursive=False)
+
+    def move(self, src, dest):
+        if not self.hdfs.mv(src, dest):
+            raise IOError('Move failed: %s -> %s' % (src, dest))
+
+    def copy_file(self, src, dest):
+        with self.hdfs.open(src, 'rb') as f1:
+            with self.hdfs.open(dest, 'wb') as f2:
+                out = True
+                while out:
+                    out = f1.read(DEFAULT_READ_BUFFER_SIZE)
+                    f2.write(out)
+
+    def open_input_stream(self, path):
+        return open_input_file(self.hdfs, path)
+
+    def open_input_file(self, path):
+        return open_input_file(self.hdfs, path)
+
+    def open_output_stream(self, path, metadata):
+        return pa.PythonFile(self.hdfs.open(path, 'wb'), mode='w')
+
+    def open_append_stream(self, path, metadata):
+        return pa.PythonFile(self.hdfs.open(path, 'ab'), mode='w')
+
+
+def arrow_filesystem(hdfs, workers=DEFAULT_WORKERS):
+    """ A ``pyarrow.fs.FileSystem`` calling the given HDFileSystem
+
+    Examples
+    --------
+    >>> import pyarrow.dataset as ds  # doctest: +SKIP
+    >>> fs = arrow_filesystem(hdfs)  # doctest: +SKIP
+    >>> ds.dataset('/data/table', filesystem=fs, format='parquet')  # doctest: +SKIP
+    """
+    return pafs.PyFileSystem(HDFSHandler(hdfs, workers))
@@ -0,0 +1,363 @@
+"Lazy numpy arrays stored as raw binary files on HDFS"
+from __future__ import absolute_import
+
+import functools
+import operator
+
+from .core import DEFAULT_WORKERS
+from .utils import threaded_map, LRUCache
+
+DEFAULT_CHUNK_BYTES = 2 ** 22
+DEFAULT_CACHE_BYTES = 2 ** 28
+# ranges closer than this are read as one, rather than seeking in between
+_MAX_GAP = 2 ** 16
+# largest index array made at a time when gathering short runs of bytes
+_GATHER_ITEMS = 2 ** 20
+
+
+def _normalize_key(key, shape):
+    """ (start, count, step, flip, drop) for each dimension, with step > 0
+
+    >>> _normalize_key((1, slice(None, None, -2)), (3, 5))
+    [(1, 1, 1, False, True), (0, 3, 2, True, False)]
+    """
+    if not isinstance(key, tuple):
+        key = (key,)
+    if sum(k is Ellipsis for k in key) > 1:
+        raise IndexError('an index can only have a single ellipsis')
+    if Ellipsis in key:
+        i = key.index(Ellipsis)
+        fill = (slice(None),) * (len(shape) - len(key) + 1)
+        key = key[:i] + fill + key[i + 1:]
+    if len(key) > len(shape):
+        raise IndexError('too many indices for array of %d dimensions'
+                         % len(shape))
+    key = key + (slice(None),) * (len(shape) - len(key))
+    out = []
+    for k, n in zip(key, shape):
+        if isinstance(k, slice):
+            start, stop, step = k.indices(n)
+            count = len(range(start, stop, step))
+            flip = step < 0
+            if count == 0:
+                start, step = 0, 1
+            elif flip:
+                start, step = start + step * (count - 1), -step
+            out.append((start, count, step, flip, False))
+            continue
+        try:
+            i = operator.index(k)
+        except TypeError:
+            raise TypeError('Only integers, slices and Ellipsis are valid '
+                            'indices, got %r' % (k,))
+        if not -n <= i < n:
+            raise IndexError('index %d is out of bounds for axis of size %d'
+                             % (i, n))
+        out.append((i % n, 1, 1, False, True))
+    return out
+
+
+def _runs(dims, shape, itemsize):
+    """ Byte offsets and common length of the contiguous runs of a selection
+
+    ``dims`` are the normalized indices of ``shape``, both in the order the
+    data is stored; the offsets come out increasing.
+    """
+    import numpy as np
+    strides = [itemsize] * len(shape)
+    for i in range(len(shape) - 2, -1, -1):
+        strides[i] = strides[i + 1] * shape[i + 1]
+    # dimensions taken whole at the end of the layout join into one run
+    m = len(shape)
+    while m and dims[m - 1][:3] == (0, shape[m - 1], 1):
+        m -= 1
+    if m == 0:
+        return np.zeros(1, dtype='int64'), itemsize * int(np.prod(shape))
+    start, count, step = dims[m - 1][:3]
+    if step == 1:
+        length = count * strides[m - 1]
+        starts = np.array([start * strides[m - 1]], dtype='int64')
+        outer = m - 1
+    else:
+        length = strides[m - 1]
+        starts = np.zeros(1, dtype='int64')
+        outer = m
+    for i in range(outer):
+        start, count, step = dims[i][:3]
+        offsets = (start + step * np.arange(count, dtype='int64')) * strides[i]
+        starts = np.add.outer(starts, offsets).ravel()
+    return starts, length
+
+
+def _chunk_size(chunk):
+    return chunk.nbytes
+
+
+def _gather(buf, pos, length, out):
+    """ Copy ``buf[p:p + length]`` for each ``p`` in ``pos`` into ``out`` """
+    import numpy as np
+    if length >= 64:
+        for i, p in enumerate(pos):
+            out[i * length:(i + 1) * length] = buf[p:p + length]
+        return
+    step = max(1, _GATHER_ITEMS // length)
+    offsets = np.arange(length)
+    for i in range(0, len(pos), step):
+        p = pos[i:i + step]
+        out[i * length:(i + len(p)) * length] = buf[
+            (p[:, None] + offsets).ravel()]
+
+
+def _copy_runs(buf, base, starts, ends, length, out):
+    """ Copy into ``out`` the parts of the runs held by ``buf``
+
+    ``buf`` holds the bytes from offset ``base``; the runs of ``length``
+    bytes at ``starts`` (ending at ``ends``) are laid end to end in ``out``.
+    """
+    import numpy as np
+    end = base + len(buf)
+    first = int(np.searchsorted(ends, base, side='right'))
+    stop = int(np.searchsorted(starts, end, side='left'))
+    if first >= stop:
+        return
+    # runs wholly inside buf, and the partial ones at either side
+    lo = first if starts[first] >= base else first + 1
+    hi = stop if ends[stop - 1] <= end else stop - 1
+    if lo < hi:
+        _gather(buf, starts[lo:hi] - base, length,
+                out[lo * length:hi * length])
+    partial = [first] if first < lo else []
+    if hi < stop and stop - 1 not in partial:
+        partial.append(stop - 1)
+    for i in partial:
+        a, b = max(int(starts[i]), base), min(int(ends[i]), end)
+        pos = i * length - int(starts[i])
+        out[pos + a:pos + b] = buf[a - base:b - base]
+
+
+class HDFSArray(object):
+    """ Lazy numpy array over a file of raw binary data on HDFS
+
+    Nothing is read until the array is indexed. Indexing with integers,
+    slices (with any step) and Ellipsis works out the byte ranges holding
+    the selected elements, and reads them concurrently into the result.
+    Ranges separated by small gaps are read as one, up to ``chunk_bytes``
+    at a time, and the selected bytes are copied out of each as soon as it
+    is read, so that little more than the result is held in memory.
+
+    With a cache, data is read in aligned chunks of ``chunk_bytes``, and the
+    most recently used chunks are kept, so that repeated or neighbouring
+    selections are served from memory. Requires numpy.
+
+    Parameters
+    ----------
+    hdfs : HDFileSystem
+    path : string
+        file holding the data
+    dtype : numpy dtype, or anything that numpy converts to one
+        including its byte order, e.g., ``'>f8'``
+    shape : int or tuple of ints
+    offset : int
+        position of the first element in the file, e.g., after a header
+    order : 'C' or 'F'
+        whether the last (C) or the first (Fortran) index varies fastest
+        in the file
+    chunk_bytes : int
+        size of the chunks of the cache; without a cache, ranges longer than
+        this are split, to be read concurrently
+    cache_bytes : int
+        maximum size of the chunks kept; 0 for no cache
+    workers : int
+        number of concurrent readers
+
+    Examples
+    --------
+    >>> arr = HDFSArray(hdfs, '/data/matrix.bin', 'f8', (100000, 1000))  # doctest: +SKIP
+    >>> arr[10:20, ::100].shape  # doctest: +SKIP
+    (10, 10)
+    >>> arr.cache_info()['size']  # one chunk was read  # doctest: +SKIP
+    4194304
+    """
+
+    def __init__(self, hdfs, path, dtype, shape, offset=0, order='C',
+                 chunk_bytes=DEFAULT_CHUNK_BYTES,
+                 cache_bytes=DEFAULT_CACHE_BYTES, workers=DEFAULT_WORKERS):
+        import numpy as np
+        if order not in ('C', 'F'):
+            raise ValueError("order must be 'C' or 'F'")
+        if chunk_bytes < 1:
+            raise ValueError('chunk_bytes must be positive')
+        self.hdfs = hdfs
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        if isinstance(shape, (tuple, list)):
+            self.shape = tuple(operator.index(n) for n in shape)
+        else:
+            self.shape = (operator.index(shape),)
+        if any(n < 0 for n in self.shape):
+            raise ValueError('negative dimensions are not allowed')
+        self.offset = offset
+        self.order = order
+        self.chunk_bytes = chunk_bytes
+        self.workers = workers
+        self.cache = (LRUCache(cache_bytes, sizeof=_chunk_size)
+                      if cache_bytes else None)
+        self.file_size = hdfs.info(path)['size']
+        if self.file_size < offset + self.nbytes:
+            raise ValueError('File %s of %d bytes is too small for %d bytes '
+                             'from offset %d' % (path, self.file_size,
+                                                 self.nbytes, offset))
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        out = 1
+        for n in self.shape:
+            out *= n
+        return out
+
+    @property
+    def itemsize(self):
+        return self.dtype.itemsize
+
+    @property
+    def nbytes(self):
+        return self.size * self.itemsize
+
+    def __len__(self):
+        if not self.shape:
+            raise TypeError('len() of unsized object')
+        return self.shape[0]
+
+    def __repr__(self):
+        return '<HDFSArray %s shape=%s dtype=%s>' % (self.path, self.shape,
+                                                     self.dtype)
+
+    def __array__(self, dtype=None, copy=None):
+        import numpy as np
+        out = np.asarray(self[...])
+        return out if dtype is None else out.astype(dtype, copy=False)
+
+    def cache_info(self):
+        """ Hits, misses and size of the chunk cache, or None without one """
+        return None if self.cache is None else self.cache.info()
+
+    def __getitem__(self, key):
+        import numpy as np
+        dims = _normalize_key(key, self.shape)
+        shape = self.shape
+        if self.order == 'F':
+            dims, shape = dims[::-1], shape[::-1]
+        counts = tuple(d[1] for d in dims)
+        if 0 in counts:
+            data = np.empty(0, dtype='uint8')
+        else:
+            starts, length = _runs(dims, shape, self.itemsize)
+            data = np.empty(len(starts) * length, dtype='uint8')
+            if self.cache is None:
+                self._read_spans(starts, length, data)
+            else:
+                self._read_chunks(starts, length, data)
+        out = data.view(self.dtype).reshape(counts)
+        if self.order == 'F':
+            out = out.transpose()
+            dims = dims[::-1]
+        out = out[tuple(0 if d[4] else slice(None, None, -1 if d[3] else 1)
+                        for d in dims)]
+        return out
+
+    def _fetch(self, reads):
+        """ Do ``(offset, length, out, done)`` reads, of increasing offsets
+        within the array, on up to ``workers`` concurrently open files
+
+        Without ``out``, the read is into a new buffer; ``done``, if given,
+        is then called with the buffer read.
+        """
+        import numpy as np
+        if not reads:
+            return
+        per_file = -(-len(reads) // max(1, self.workers))
+        batches = [reads[i:i + per_file]
+                   for i in range(0, len(reads), per_file)]
+
+        def read(batch):
+            with self.hdfs.open(self.path, 'rb',
+                                size=self.file_size) as f:
+                for start, length, out, done in batch:
+                    if out is None:
+                        out = np.empty(length, dtype='uint8')
+                    f.seek(self.offset + start)
+                    if f.readinto(length, out) < length:
+                        raise IOError('Unexpected end of file %s'
+                                      % self.path)
+                    if done is not None:
+                        done(out)
+
+        threaded_map(read, batches, self.workers)
+
+    def _read_spans(self, starts, length, out):
+        """ Read runs into ``out``, merging close ones into spans of up to
+        about ``chunk_bytes``
+
+        Spans of adjacent runs are read straight into ``out``; the others
+        into a buffer of their own, which the runs are copied from.
+        """
+        import numpy as np
+        size = self.chunk_bytes
+        gaps = starts[1:] - starts[:-1] - length
+        group = np.concatenate([[0], np.cumsum(gaps > _MAX_GAP)])
+        group_start = starts[np.concatenate([[0], np.flatnonzero(
+            group[1:] != group[:-1]) + 1])]
+        part = (starts - group_start[group]) // size
+        breaks = np.flatnonzero((group[1:] != group[:-1]) |
+                                (part[1:] != part[:-1])) + 1
+        first = np.concatenate([[0], breaks]).tolist()
+        last = np.concatenate([breaks - 1, [len(starts) - 1]]).tolist()
+        ends = starts + length
+        reads = []
+        for i, j in zip(first, last):
+            start = int(starts[i])
+            span = int(ends[j]) - start
+            if span == (j - i + 1) * length:
+                pos = i * length
+                for k in range(0, span, size):
+                    n = min(size, span - k)
+                    reads.append((start + k, n, out[pos + k:pos + k + n],
+                                  None))
+            else:
+                reads.append((start, span, None, functools.partial(
+                    _copy_runs, base=start, starts=starts, ends=ends,
+                    length=length, out=out)))
+        self._fetch(reads)
+
+    def _read_chunks(self, starts, length, out):
+        """ Copy runs into ``out`` from the chunks holding them, taken from
+        the cache or read from the file """
+        import numpy as np
+        size = self.chunk_bytes
+        nchunks = -(-self.nbytes // size)
+        cover = np.zeros(nchunks + 1, dtype='int64')
+        np.add.at(cover, starts // size, 1)
+        np.add.at(cover, (starts + length - 1) // size + 1, -1)
+        needed = np.flatnonzero(np.cumsum(cover)[:-1] > 0).tolist()
+        ends = starts + length
+        reads = []
+
+        def done(c, chunk):
+            self.cache.put(c, chunk)
+            _copy_runs(chunk, c * size, starts, ends, length, out)
+
+        for c in needed:
+            chunk = self.cache.get(c)
+            if chunk is None:
+                n = min(size, self.nbytes - c * size)
+                reads.append((c * size, n, None,
+                              functools.partial(done, c)))
+            else:
+                # copied, so that the result never shares memory with the
+                # cache
+                _copy_runs(chunk, c * size, starts, ends, length, out)
+        self._fetch(reads)
@@ -10,6 +10,7 @@ if PY2:
         """Connection to HDFS failed."""
 
     FileNotFoundError = IOError
+    FileExistsError = OSError
     PermissionError = IOError
     from urlparse import urlparse
     unicode = unicode
@@ -19,6 +20,7 @@ else:
     ConnectionError = ConnectionError
     PermissionError = PermissionError
     FileNotFoundError = FileNotFoundError
+    FileExistsError = FileExistsError
     from urllib.parse import urlparse
     unicode = str
     bytes = bytes
@@ -0,0 +1,108 @@
+"Compression of stored values, with a header naming the codec"
+from __future__ import absolute_import
+
+import importlib
+import struct
+import zlib
+
+from .utils import ensure_bytes
+
+# start of every compressed value, followed by one byte of codec id; the
+# first byte is not ASCII, so that text values are never mistaken for it
+MAGIC = b'\x89H3Z'
+# codec id of raw values which happen to start with MAGIC
+_RAW = 0
+
+
+def _gzip_compress(data):
+    c = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return c.compress(data) + c.flush()
+
+
+def _gzip_decompress(data):
+    return zlib.decompress(data, 31)
+
+
+def _zstd_compress(data):
+    import zstandard
+    return zstandard.ZstdCompressor().compress(data)
+
+
+def _zstd_decompress(data):
+    import zstandard
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def _lz4_compress(data):
+    import lz4.frame
+    return lz4.frame.compress(data)
+
+
+def _lz4_decompress(data):
+    import lz4.frame
+    return lz4.frame.decompress(data)
+
+
+# name -> (id in the header, compress, decompress, module needed)
+codecs = {'gzip': (1, _gzip_compress, _gzip_decompress, None),
+          'zstd': (2, _zstd_compress, _zstd_decompress, 'zstandard'),
+          'lz4': (3, _lz4_compress, _lz4_decompress, 'lz4.frame')}
+_by_id = dict((c[0], c) for c in codecs.values())
+
+
+def check_codec(name):
+    """ Raise if the codec is unknown, or the library it needs is missing
+
+    >>> check_codec('gzip')
+    >>> check_codec('rar')
+    Traceback (most recent call last):
+    ...
+    ValueError: Unknown compression 'rar', use one of gzip, lz4, zstd
+    """
+    if name not in codecs:
+        raise ValueError("Unknown compression %r, use one of %s"
+                         % (name, ', '.join(sorted(codecs))))
+    module = codecs[name][3]
+    if module is not None:
+        importlib.import_module(module)
+
+
+def compress(data, codec):
+    """ Compress bytes with the named codec, prefixing the header
+
+    With codec None, the data is returned as is, unless it starts like
+    compressed data: it is then given a header too, so that ``decompress``
+    returns it unchanged.
+
+    >>> data = b'0' * 1000
+    >>> out = compress(data, 'gzip')
+    >>> len(out) < 100
+    True
+    >>> decompress(out) == data
+    True
+    >>> compress(b'raw', None) == b'raw'
+    True
+    """
+    data = ensure_bytes(data)
+    if codec is None:
+        if data[:len(MAGIC)] != MAGIC:
+            return data
+        return MAGIC + struct.pack('B', _RAW) + data
+    ident, func = codecs[codec][:2]
+    return MAGIC + struct.pack('B', ident) + func(data)
+
+
+def decompress(data):
+    """ Decompress the output of ``compress``; other data is returned as is
+
+    >>> decompress(b'not compressed') == b'not compressed'
+    True
+    """
+    if data[:len(MAGIC)] != MAGIC:
+        return data
+    ident = struct.unpack('B', data[len(MAGIC):len(MAGIC) + 1])[0]
+    if ident == _RAW:
+        return data[len(MAGIC) + 1:]
+    if ident not in _by_id:
+        raise ValueError("Unknown compression id %d" % ident)
+    return _by_id[ident][2](data[len(MAGIC) + 1:])
@@ -1,13 +1,54 @@
 from __future__ import absolute_import
 
+import hashlib
 import os
 import re
 import warnings
+from xml.etree import ElementTree
 from .compatibility import FileNotFoundError
 
+
+class _Conf(dict):
+    """ dict which counts its changes, so that values computed from it can
+    be cached until it changes; see ``conf_fingerprint`` """
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self.version = 0
+        self._fingerprint = None  # (version, fingerprint)
+
+
+def _counts_change(name):
+    method = getattr(dict, name)
+
+    def changed(self, *args, **kwargs):
+        self.version += 1
+        return method(self, *args, **kwargs)
+    changed.__name__ = name
+    return changed
+
+
+for _name in ['__setitem__', '__delitem__', '__ior__', 'clear', 'pop',
+              'popitem', 'setdefault', 'update']:
+    if hasattr(dict, _name):
+        setattr(_Conf, _name, _counts_change(_name))
+
+
 # standard defaults
 conf_defaults = {'host': 'localhost', 'port': 8020}
-conf = conf_defaults.copy()
+conf = _Conf(conf_defaults)
+# whether conf was loaded, or deliberately set; see ensure_config
+_loaded = False
+# (nameservice, namenodes) -> last known active namenode
+_active_namenodes = {}
+# file name -> (mtime, size, parsed dict)
+_parsed = {}
+
+
+def _split_address(text):
+    """ ``'host:port'`` to ``(host, port or None)`` """
+    host, _, port = text.strip().partition(':')
+    return host, int(port) if port else None
 
 
 def hdfs_conf(confd, more_files=None):
@@ -20,6 +61,8 @@ def hdfs_conf(confd, more_files=None):
     more_files: list of str or None
         If given, additional filenames to query
     """
+    global _loaded
+    _loaded = True
     files = ['core-site.xml', 'hdfs-site.xml']
     if more_files:
         files.extend(more_files)
@@ -37,56 +80,188 @@ def hdfs_conf(confd, more_files=None):
         text = c['fs.defaultFS']
         if text.startswith('hdfs://'):
             text = text[7:]
-        host = text.split(':', 1)[0]
-        port = text.split(':', 1)[1:]
+        host, port = _split_address(text.split('/', 1)[0])
         if host:
             c['host'] = host
         if port:
-            c['port'] = int(port[0])
+            c['port'] = port
     if 'dfs.namenode.rpc-address' in c:
         # name node address
-        text = c['dfs.namenode.rpc-address']
-        host = text.split(':', 1)[0]
-        port = text.split(':', 1)[1:]
+        host, port = _split_address(c['dfs.namenode.rpc-address'])
         if host:
             c['host'] = host
         if port:
-            c['port'] = int(port[0])
-    if c.get("dfs.nameservices", None):
-        # HA override
-        c['host'] = c["dfs.nameservices"].split(',', 1)[0]
-        c['port'] = None
-    if 'host' not in conf:
+            c['port'] = port
+    nameservices = [ns.strip() for ns in
+                    c.get('dfs.nameservices', '').split(',') if ns.strip()]
+    if nameservices:
+        # prefer the nameservice named by fs.defaultFS
+        ns = c.get('host')
+        if ns not in nameservices:
+            ns = nameservices[0]
+        single = c.get('dfs.namenode.rpc-address.%s' % ns)
+        if ha_namenodes(c, ns):
+            # HA: libhdfs3 resolves the namenodes of the nameservice itself
+            c['host'] = ns
+            c['port'] = None
+        elif single:
+            c['host'], c['port'] = _split_address(single)
+        else:
+            warnings.warn('No namenode addresses found for nameservice %s'
+                          % ns)
+            c['host'] = ns
+            c['port'] = None
+    if 'host' not in c:
         # no host found at all, config cannot work, so warn
         warnings.warn('No host found in HDFS config')
-        conf['host'] = ''
+        c['host'] = ''
     conf.clear()
     conf.update(c)
 
 
+def ha_namenodes(c, nameservice):
+    """ Namenodes of an HA nameservice, last known active one first
+
+    Parameters
+    ----------
+    c: dict
+        configuration containing ``dfs.ha.namenodes.<nameservice>`` and
+        ``dfs.namenode.rpc-address.<nameservice>.<namenode>`` entries
+    nameservice: str
+
+    Returns
+    -------
+    list of ``(namenode, 'host:port')``, empty if the nameservice is not HA.
+    """
+    ids = c.get('dfs.ha.namenodes.%s' % nameservice) or ''
+    out = []
+    for nn in ids.split(','):
+        nn = nn.strip()
+        address = c.get('dfs.namenode.rpc-address.%s.%s' % (nameservice, nn))
+        if nn and address:
+            out.append((nn, address.strip()))
+    active = _active_namenodes.get(_ha_key(nameservice, out))
+    out.sort(key=lambda x: x[0] != active)
+    return out
+
+
+def _ha_key(nameservice, namenodes):
+    return nameservice, frozenset(namenodes)
+
+
+def active_namenode(c, nameservice):
+    """ Last known active namenode of an HA nameservice, or None """
+    key = _ha_key(nameservice, ha_namenodes(c, nameservice))
+    return _active_namenodes.get(key)
+
+
+def set_active_namenode(c, nameservice, namenode):
+    """ Remember which namenode of an HA nameservice is active
+
+    ``ha_namenodes`` puts it first for the rest of the process, so that
+    connections try it before the others.
+    """
+    key = _ha_key(nameservice, ha_namenodes(c, nameservice))
+    _active_namenodes[key] = namenode
+
+
 def reset_to_defaults():
+    global _loaded
+    _loaded = True
     conf.clear()
     conf.update(conf_defaults)
 
 
 def conf_to_dict(fname):
-    """ Read a hdfs-site.xml style conf file, produces dictionary """
+    """ Read a hdfs-site.xml style conf file, produces dictionary
+
+    Results are cached until the file's modification time or size changes.
+    """
+    if not os.path.exists(fname):
+        raise FileNotFoundError("No such file: %s" % fname)
+    st = os.stat(fname)
+    cached = _parsed.get(fname)
+    if cached is None or cached[:2] != (st.st_mtime, st.st_size):
+        with open(fname, 'rb') as f:
+            text = f.read()
+        cached = (st.st_mtime, st.st_size, _parse_conf(text, fname))
+        _parsed[fname] = cached
+    return cached[2].copy()
+
+
+def _parse_conf(text, fname):
+    """ ``{name: value}`` of the ``<property>`` elements of XML conf text """
+    try:
+        root = ElementTree.fromstring(text.strip())
+    except ElementTree.ParseError as e:
+        warnings.warn("Could not parse %s as XML (%s), reading it line by "
+                      "line" % (fname, e))
+        return _parse_conf_lines(text.decode('utf8', 'replace'))
+    conf = {}
+    for prop in root.iter('property'):
+        name = prop.findtext('name')
+        value = prop.findtext('value')
+        if name is not None and value is not None:
+            conf[name.strip()] = value.strip()
+    return conf
+
+
+def _parse_conf_lines(text):
+    """ Fallback for malformed files: name and value on the same lines """
     name_match = re.compile("<name>(.*?)</name>")
     val_match = re.compile("<value>(.*?)</value>")
     conf = {}
-    for line in open(fname):
+    key = None
+    for line in text.splitlines():
         name = name_match.search(line)
         if name:
             key = name.groups()[0]
         val = val_match.search(line)
-        if val:
-            val = val.groups()[0]
-            conf[key] = val
+        if val and key is not None:
+            conf[key] = val.groups()[0]
     return conf
 
 
+def conf_fingerprint(c):
+    """ Short hash identifying the contents of a conf dictionary
+
+    For the process-wide ``conf``, the hash is kept until ``conf`` changes.
+    """
+    cached = getattr(c, '_fingerprint', None)
+    if cached is not None and cached[0] == c.version:
+        return cached[1]
+    text = repr(sorted((str(k), str(v)) for k, v in c.items()))
+    out = hashlib.md5(text.encode('utf8')).hexdigest()
+    if isinstance(c, _Conf):
+        c._fingerprint = (c.version, out)
+    return out
+
+
+def conf_diff(base, c):
+    """ Differences needed to rebuild conf dictionary ``c`` from ``base``
+
+    Returns
+    -------
+    ``(overrides, removed)``: dict of keys whose values are new or differ,
+    and list of keys of base which are not in ``c``.
+    """
+    overrides = dict((k, v) for k, v in c.items()
+                     if k not in base or base[k] != v)
+    removed = [k for k in base if k not in c]
+    return overrides, removed
+
+
+def conf_patch(base, overrides, removed):
+    """ Apply the output of ``conf_diff`` to a copy of ``base`` """
+    c = dict((k, v) for k, v in base.items() if k not in removed)
+    c.update(overrides)
+    return c
+
+
 def guess_config():
     """ Look for config files in common places """
+    global _loaded
+    _loaded = True
     d = None
     if 'LIBHDFS3_CONF' in os.environ:
         if not os.path.exists(os.environ['LIBHDFS3_CONF']):
@@ -114,4 +289,11 @@ def guess_config():
         os.environ['LIBHDFS3_CONF'] = os.path.join(d, 'hdfs-site.xml')
 
 
-guess_config()
+def ensure_config():
+    """ Run ``guess_config``, unless conf was already loaded or set
+
+    This happens when the first ``HDFileSystem`` is created rather than on
+    import, so that importing hdfs3 does no I/O.
+    """
+    if not _loaded:
+        guess_config()
@@ -7,21 +7,51 @@ import logging
 import os
 import posixpath
 import re
+import threading
+import time
 import warnings
 import operator
 import functools
-from collections import deque
+from collections import deque, OrderedDict
 
-from .compatibility import FileNotFoundError, ConnectionError, PY3
-from .conf import conf
+from .compatibility import FileNotFoundError, ConnectionError, PY3, unicode
+from .conf import (conf, conf_fingerprint, conf_diff, conf_patch,
+                   ensure_config, ha_namenodes, active_namenode,
+                   set_active_namenode)
+from .hedge import HedgedReads
 from .utils import (read_block, seek_delimiter, ensure_bytes, ensure_string,
-                    ensure_trailing_slash, MyNone)
+                    ensure_trailing_slash, threaded_map, LRUCache, MyNone)
 
 logger = logging.getLogger(__name__)
 _lib = None
 
 DEFAULT_READ_BUFFER_SIZE = 2 ** 16
 DEFAULT_WRITE_BUFFER_SIZE = 2 ** 26
+DEFAULT_WORKERS = 8
+DEFAULT_BLOCK_CACHE_SIZE = 1024
+# reads of up to this many bytes do not need the size of the file
+_SMALL_READ = 2 ** 20
+DEFAULT_MAX_HANDLES = 16
+
+# native filesystem handles shared within the process:
+# connection key -> [handle, number of HDFileSystem instances using it]
+_handles = {}
+_handles_lock = threading.Lock()
+
+
+def _reset_handles_after_fork():
+    """ Forget connections inherited from the parent process
+
+    They are neither used nor closed in the child, whose copies of the
+    parent's sockets must be left alone; new connections are made instead.
+    """
+    global _handles_lock
+    _handles_lock = threading.Lock()
+    _handles.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_handles_after_fork)
 
 
 def _nbytes(buf):
@@ -31,15 +61,87 @@ def _nbytes(buf):
     return buf.itemsize * functools.reduce(operator.mul, buf.shape)
 
 
+# columns of ``HDFileSystem.ls_arrays``, in the order of ``FileInfo.to_dict``
+_INFO_COLUMNS = ('kind', 'name', 'last_mod', 'size', 'replication',
+                 'block_size', 'owner', 'group', 'permissions', 'last_access')
+_NUMERIC_INFO_COLUMNS = ('last_mod', 'size', 'replication', 'block_size',
+                         'permissions', 'last_access')
+
+
+def _dictionary_encode(pointers):
+    """ Codes and unique (decoded) values for an array of char pointers """
+    import numpy as np
+    lookup = {}
+    codes = [lookup.setdefault(ctypes.string_at(p) if p else b'', len(lookup))
+             for p in pointers.tolist()]
+    uniques = [ensure_string(s) for s in sorted(lookup, key=lookup.get)]
+    return np.array(codes, dtype=np.int32), uniques
+
+
+def _fileinfo_columns(fi, num):
+    """ Copy an array of ``num`` native FileInfo structs into columns
+
+    Numeric fields come out of one structured numpy view over the array,
+    strings are read directly from their pointers and owner/group are
+    dictionary-encoded as ``(codes, uniques)``. ``kind`` is 0 for
+    directories and 1 for files. Must be called before the array is freed.
+    """
+    import numpy as np
+    from .lib import FileInfo
+    types = dict(FileInfo._fields_)
+    names = _NUMERIC_INFO_COLUMNS + ('kind', 'name', 'owner', 'group')
+    dtype = np.dtype({
+        'names': list(names),
+        'formats': [np.uintp if types[n] is ctypes.c_char_p
+                    else np.dtype(types[n]) for n in names],
+        'offsets': [getattr(FileInfo, n).offset for n in names],
+        'itemsize': ctypes.sizeof(FileInfo)})
+    if num:
+        buf = (ctypes.c_char * (num * dtype.itemsize)).from_address(
+            ctypes.addressof(fi.contents))
+        raw = np.frombuffer(buf, dtype=dtype)
+    else:
+        raw = np.zeros(0, dtype=dtype)
+    cols = dict((n, raw[n].copy()) for n in _NUMERIC_INFO_COLUMNS)
+    cols['kind'] = (raw['kind'] != 68).astype(np.int8)
+    cols['name'] = np.array([ensure_string(ctypes.string_at(p))
+                             for p in raw['name'].tolist()], dtype=object)
+    cols['owner'] = _dictionary_encode(raw['owner'])
+    cols['group'] = _dictionary_encode(raw['group'])
+    return cols
+
+
+def _columns_to_arrow(cols):
+    """ Turn the output of ``_fileinfo_columns`` into a pyarrow Table """
+    import pyarrow as pa
+    arrays = {'name': pa.array(cols['name'], type=pa.string()),
+              'kind': pa.DictionaryArray.from_arrays(
+                  pa.array(cols['kind']),
+                  pa.array(['directory', 'file'], type=pa.string()))}
+    for field in ('owner', 'group'):
+        codes, uniques = cols[field]
+        arrays[field] = pa.DictionaryArray.from_arrays(
+            pa.array(codes), pa.array(uniques, type=pa.string()))
+    for field in _NUMERIC_INFO_COLUMNS:
+        arrays[field] = pa.array(cols[field])
+    return pa.Table.from_arrays([arrays[c] for c in _INFO_COLUMNS],
+                                names=list(_INFO_COLUMNS))
+
+
 class HDFileSystem(object):
     """ Connection to an HDFS namenode
 
     >>> hdfs = HDFileSystem(host='127.0.0.1', port=8020)  # doctest: +SKIP
+
+    Instances may be used in processes forked after they connected, for
+    example by ``multiprocessing.Pool``: the child transparently makes its
+    own connection on first use.
     """
-    _first_pid = None
 
     def __init__(self, host=MyNone, port=MyNone, connect=True, autoconf=True,
-                 pars=None, **kwargs):
+                 pars=None, block_cache_size=DEFAULT_BLOCK_CACHE_SIZE,
+                 thread_local=False, max_handles=DEFAULT_MAX_HANDLES,
+                 hedge=None, **kwargs):
         """
         Parameters
         ----------
@@ -57,6 +159,22 @@ class HDFileSystem(object):
             https://hadoop.apache.org/docs/r2.6.0/hadoop-project-dist/hadoop-hdfs/hdfs-default.xml
             This dict looks exactly like the one produced by conf - you can,
             for example, remove any problematic entries.
+        block_cache_size: int
+            Number of files whose block locations are cached by
+            ``get_block_locations``; 0 to disable.
+        thread_local: bool (False)
+            If True, each thread gets its own native connection on first use,
+            so that threads do not contend for a single connection. Files
+            use the connection of the thread which opened them.
+        max_handles: int
+            With ``thread_local``, the maximum number of connections; further
+            threads share the existing ones in turn.
+        hedge: None, True, float or HedgedReads
+            Hedge whole-range reads against slow datanodes: True for an adaptive
+            threshold, a number for a fixed threshold in seconds, or a
+            ``HedgedReads`` policy. The policy is available as ``.hedge``.
+            Only ``read_block`` and ``cat_ranges`` are hedged, not reads on
+            open files.
         kwargs: key/value
             Further override parameters.
             These are applied after the default conf and pars; the most typical
@@ -69,6 +187,9 @@ class HDFileSystem(object):
             user, ticket_cache, token, effective_user : str
                 kerberos things
         """
+        self._autoconf = autoconf
+        if autoconf:
+            ensure_config()
         self.conf = conf.copy() if autoconf else {}
         if pars:
             self.conf.update(pars)
@@ -78,7 +199,20 @@ class HDFileSystem(object):
         if port is not MyNone:
             self.conf['port'] = port
 
-        self._handle = None
+        self._native = None
+        self._key = None
+        self._lazy = False
+        self.thread_local = thread_local
+        self.max_handles = max_handles
+        self._reset_threads()
+        self._block_cache = LRUCache(block_cache_size)
+        if hedge is True:
+            hedge = HedgedReads()
+        elif hedge is False:
+            hedge = None
+        elif hedge is not None and not isinstance(hedge, HedgedReads):
+            hedge = HedgedReads(delay=hedge)
+        self.hedge = hedge
 
         if self.conf.get('ticket_cache') and self.conf.get('token'):
             m = "It is not possible to use ticket_cache and token at same time"
@@ -89,35 +223,195 @@ class HDFileSystem(object):
 
     def __getstate__(self):
         d = self.__dict__.copy()
-        del d['_handle']
+        for k in ['_native', '_key', '_lazy', '_local', '_thread_lock',
+                  '_thread_handles', '_thread_count']:
+            d.pop(k, None)
+        if d.get('_autoconf'):
+            # only ship the differences from the configuration found on
+            # this machine; the receiving side applies them to its own
+            d['conf'] = (conf_fingerprint(conf),) + conf_diff(conf, self.conf)
         logger.debug("Serialize with state: %s", d)
         return d
 
     def __setstate__(self, state):
+        state = state.copy()
+        if isinstance(state['conf'], tuple):
+            fingerprint, overrides, removed = state['conf']
+            ensure_config()
+            if fingerprint != conf_fingerprint(conf):
+                warnings.warn("The HDFS configuration found in this process "
+                              "differs from the one where the filesystem "
+                              "was serialized; applying the serialized "
+                              "overrides to the local configuration",
+                              RuntimeWarning)
+            state['conf'] = conf_patch(conf, overrides, removed)
         self.__dict__.update(state)
-        self._handle = None
-        self.connect()
+        self._native = None
+        self._key = None
+        self._lazy = True
+        self._reset_threads()
+
+    @property
+    def _handle(self):
+        """ Native filesystem handle
+
+        Instances restored from a pickle, or inherited by a forked process,
+        connect here on first use.
+        """
+        self._check_fork()
+        if self._native is None and self._lazy:
+            self.connect()
+        if self._native is None or not self.thread_local:
+            return self._native
+        return self._thread_handle()
+
+    def _reset_threads(self):
+        """ Forget all per-thread connections """
+        self._local = threading.local()
+        self._thread_lock = threading.Lock()
+        self._thread_handles = []  # connections made for threads
+        self._thread_count = 0     # threads which were given a connection
+
+    def _thread_handle(self):
+        """ Native handle of the current thread, in ``thread_local`` mode
+
+        The shared connection counts towards ``max_handles``; once the limit
+        is reached, new threads are given the existing handles in turn.
+        """
+        fs = getattr(self._local, 'handle', None)
+        if fs is None:
+            with self._thread_lock:
+                if len(self._thread_handles) + 1 < self.max_handles:
+                    fs = self._connect()
+                    self._thread_handles.append(fs)
+                else:
+                    handles = [self._native] + self._thread_handles
+                    fs = handles[self._thread_count % len(handles)]
+                self._thread_count += 1
+            self._local.handle = fs
+        return fs
+
+    def _check_fork(self):
+        """ Drop a connection made by a parent process """
+        if self._native is not None and self._key[0] != os.getpid():
+            logger.debug("Dropping handle inherited from process %d",
+                         self._key[0])
+            self._native = None
+            self._key = None
+            self._lazy = True
+            self._reset_threads()
+
+    def _connection_key(self):
+        # handles inherited over fork are never handed out in the child
+        return (os.getpid(),) + tuple(sorted((k, str(v))
+                                             for k, v in self.conf.items()))
 
     def connect(self):
         """ Connect to the name node
 
-        This happens automatically at startup
+        This happens automatically at startup. Instances with the same
+        configuration share one native connection within the process,
+        which is closed when the last of them disconnects.
         """
         get_lib()
-        conf = self.conf.copy()
-        if self._handle:
+        self._check_fork()
+        if self._native:
             return
+        self._lazy = False
+        key = self._connection_key()
+        with _handles_lock:
+            entry = _handles.get(key)
+            if entry is not None:
+                entry[1] += 1
+        if entry is None:
+            fs = self._connect()
+            with _handles_lock:
+                entry = _handles.setdefault(key, [fs, 0])
+                entry[1] += 1
+            if entry[0] is not fs:
+                # another thread connected with the same key meanwhile
+                _lib.hdfsDisconnect(fs)
+        self._native = entry[0]
+        self._key = key
+        if self.thread_local:
+            self._local.handle = self._native
+
+    def _connect(self):
+        """ Make a new native connection using this instance's conf
+
+        For an HA nameservice, the namenodes are given to libhdfs3 with the
+        last known active one first, so that it is tried before the others.
+        The namenodes are only asked which of them is active when none is
+        known yet in this process, or when connecting fails; the one
+        answering is then remembered as active.
+        """
+        conf = self.conf.copy()
+        ns = conf.get('host')
+        namenodes = ha_namenodes(conf, ns)
+        if len(namenodes) < 2:
+            return self._connect_with(conf)
+        if active_namenode(conf, ns) is None:
+            self._update_active_namenode(conf, ns, namenodes)
+            return self._connect_ha(conf, ns)
+        try:
+            return self._connect_ha(conf, ns)
+        except ConnectionError:
+            # the remembered namenode may have gone down or become standby
+            if not self._update_active_namenode(conf, ns, namenodes):
+                raise
+        return self._connect_ha(conf, ns)
+
+    def _connect_ha(self, conf, ns):
+        """ Connect to HA nameservice ``ns``, known active namenode first """
+        conf = conf.copy()
+        order = ','.join(nn for nn, _ in ha_namenodes(conf, ns))
+        conf['dfs.ha.namenodes.%s' % ns] = order
+        return self._connect_with(conf)
+
+    def _update_active_namenode(self, conf, ns, namenodes):
+        """ Ask the namenodes which is active and remember it
+
+        Returns whether the active namenode differs from the one known.
+        """
+        known = active_namenode(conf, ns)
+        active = self._find_active_namenode(namenodes)
+        if active is None or active == known:
+            return False
+        logger.debug("Active namenode of %s is now %s", ns, active)
+        set_active_namenode(conf, ns, active)
+        return True
 
-        if HDFileSystem._first_pid is None:
-            HDFileSystem._first_pid = os.getpid()
-        elif HDFileSystem._first_pid != os.getpid():
-            warnings.warn("Attempting to re-use hdfs3 in child process %d, "
-                          "but it was initialized in parent process %d. "
-                          "Beware that hdfs3 is not fork-safe and this may "
-                          "lead to bugs or crashes."
-                          % (os.getpid(), HDFileSystem._first_pid),
-                          RuntimeWarning, stacklevel=2)
+    def _find_active_namenode(self, namenodes):
+        """ The first of ``[(namenode, 'host:port')]`` serving requests
 
+        The namenodes are asked in turn, stopping at the first to answer. A
+        standby namenode refuses requests, so that either the connection or
+        a request on it fails.
+        """
+        for nn, address in namenodes:
+            host, _, port = address.partition(':')
+            conf = self.conf.copy()
+            conf.update({'host': host, 'port': int(port) if port else None,
+                         'rpc.client.connect.retry': '1',
+                         'rpc.client.connect.timeout': '5000'})
+            try:
+                fs = self._connect_with(conf)
+            except ConnectionError:
+                logger.debug("Namenode %s at %s is unreachable", nn, address)
+                continue
+            try:
+                fi = _lib.hdfsGetPathInfo(fs, b'/')
+                if fi:
+                    _lib.hdfsFreeFileInfo(fi, 1)
+                    return nn
+                logger.debug("Namenode %s at %s refused a request", nn,
+                             address)
+            finally:
+                _lib.hdfsDisconnect(fs)
+
+    def _connect_with(self, conf):
+        """ Make a new native connection using the given conf """
+        conf = conf.copy()
         o = _lib.hdfsNewBuilder()
 
         _lib.hdfsBuilderSetNameNode(o, ensure_bytes(conf.pop('host')))
@@ -148,7 +442,7 @@ class HDFileSystem(object):
         _lib.hdfsFreeBuilder(o)
         if fs:
             logger.debug("Connect to handle %d", fs.contents.filesystem)
-            self._handle = fs
+            return fs
         else:
             msg = ensure_string(_lib.hdfsGetLastError()).split('\n')[0]
             raise ConnectionError('Connection Failed: {}'.format(msg))
@@ -212,14 +506,31 @@ class HDFileSystem(object):
             self.token = None
 
     def disconnect(self):
-        """ Disconnect from name node """
-        if self._handle:
-            logger.debug("Disconnect from handle %d",
-                         self._handle.contents.filesystem)
-            _lib.hdfsDisconnect(self._handle)
-        self._handle = None
+        """ Disconnect from name node
 
-    def open(self, path, mode='rb', replication=0, buff=0, block_size=0):
+        The native connection is only closed once no other instance in the
+        process is using it.
+        """
+        self._check_fork()
+        fs, self._native, self._lazy = self._native, None, False
+        for thread_fs in self._thread_handles:
+            _lib.hdfsDisconnect(thread_fs)
+        self._reset_threads()
+        if not fs:
+            return
+        with _handles_lock:
+            entry = _handles.get(self._key)
+            if entry is None or entry[0] is not fs:
+                return
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            del _handles[self._key]
+        logger.debug("Disconnect from handle %d", fs.contents.filesystem)
+        _lib.hdfsDisconnect(fs)
+
+    def open(self, path, mode='rb', replication=0, buff=0, block_size=0,
+             size=None):
         """ Open a file for reading or writing
 
         Parameters
@@ -234,6 +545,9 @@ class HDFileSystem(object):
             Client buffer size (bytes); if 0, use default.
         block_size: int
             Size of data-node blocks if writing
+        size: int or None
+            Size of the file, if already known; otherwise it is requested
+            from the name-node when first needed
         """
         if not self._handle:
             raise IOError("Filesystem not connected")
@@ -247,7 +561,36 @@ class HDFileSystem(object):
             raise NotImplementedError("Text mode not supported, use mode='%s'"
                                       " and manage bytes" % (mode + 'b'))
         return HDFile(self, path, mode, replication=replication, buff=buff,
-                      block_size=block_size)
+                      block_size=block_size, size=size)
+
+    def open_array(self, path, dtype, shape, offset=0, order='C', **kwargs):
+        """ Lazy numpy array over a file of raw binary data
+
+        Only the parts of the file holding the elements selected by indexing
+        are read, concurrently, and recently read chunks are cached; see
+        ``hdfs3.array.HDFSArray``. Requires numpy.
+
+        Parameters
+        ----------
+        path : string
+            file holding the data
+        dtype : numpy dtype
+        shape : int or tuple of ints
+        offset : int
+            position of the first element in the file
+        order : 'C' or 'F'
+            layout of the elements in the file
+        kwargs : passed to ``HDFSArray`` (chunk_bytes, cache_bytes, workers)
+
+        Examples
+        --------
+        >>> arr = hdfs.open_array('/data/matrix.bin', 'f8', (100000, 1000))  # doctest: +SKIP
+        >>> arr[-5:, 0]  # doctest: +SKIP
+        array([0.5, 0.1, 0.9, 0.3, 0.2])
+        """
+        from .array import HDFSArray
+        return HDFSArray(self, path, dtype, shape, offset=offset,
+                         order=order, **kwargs)
 
     def du(self, path, total=False, deep=False):
         """Returns file sizes on a path.
@@ -279,36 +622,134 @@ class HDFileSystem(object):
                 'percent-free': 100 * (cap - used) / cap}
 
     def get_block_locations(self, path, start=0, length=0):
-        """ Fetch physical locations of blocks """
+        """ Fetch physical locations of blocks
+
+        The locations of whole files are kept in an LRU cache (see
+        ``block_cache_size``) keyed on the path, modification time and size,
+        so a repeated call only costs an ``info`` request.
+        """
         if not self._handle:
             raise IOError("Filesystem not connected")
+        info = self.info(path)
+        key = (ensure_string(path), info['last_mod'], info['size'])
+        blocks = self._block_cache.get(key)
+        if blocks is None:
+            blocks = self._fetch_block_locations(path, info['size'])
+            self._block_cache.put(key, blocks)
         start = int(start) or 0
-        length = int(length) or self.info(path)['size']
+        end = start + (int(length) or info['size'])
+        return [{'hosts': list(hosts), 'length': blength, 'offset': offset}
+                for offset, blength, hosts in blocks
+                if offset < end and offset + blength > start]
+
+    def _fetch_block_locations(self, path, length):
+        """ List of (offset, length, hosts) for the blocks of a file """
         nblocks = ctypes.c_int(0)
         out = _lib.hdfsGetFileBlockLocations(self._handle,
                                              ensure_bytes(path),
-                                             ctypes.c_int64(start),
+                                             ctypes.c_int64(0),
                                              ctypes.c_int64(length),
                                              ctypes.byref(nblocks))
         locs = []
         for i in range(nblocks.value):
             block = out[i]
-            hosts = [block.hosts[i] for i in
-                     range(block.numOfNodes)]
-            locs.append({'hosts': hosts, 'length': block.length,
-                         'offset': block.offset})
+            hosts = tuple(block.hosts[j] for j in range(block.numOfNodes))
+            locs.append((block.offset, block.length, hosts))
         _lib.hdfsFreeFileBlockLocations(out, nblocks)
         return locs
 
+    def locality_map(self, paths, workers=DEFAULT_WORKERS):
+        """ Which hosts hold the blocks of many files, as compact arrays
+
+        Block locations are fetched concurrently (and cached, as for
+        ``get_block_locations``). Requires numpy.
+
+        Parameters
+        ----------
+        paths : string or list of strings
+            files to locate; entries containing "*" are expanded with ``glob``
+        workers : int
+            number of concurrent requests
+
+        Returns
+        -------
+        dict with keys
+
+        hosts : list of str
+            the data-node host names seen
+        host_bytes : int64 array
+            total bytes held by each host, counting every replica
+        paths : list of str
+            the files located
+        block_path : int32 array
+            for each block, the index of its file in ``paths``
+        block_offset, block_length : int64 arrays
+        block_hosts_ptr, block_hosts : int64 and int32 arrays
+            the hosts holding block ``i`` are
+            ``block_hosts[block_hosts_ptr[i]:block_hosts_ptr[i + 1]]``
+        errors : dict
+            exception raised for each file that could not be located
+
+        Examples
+        --------
+        >>> m = hdfs.locality_map('/data/*.csv')  # doctest: +SKIP
+        >>> best = m['hosts'][m['host_bytes'].argmax()]  # doctest: +SKIP
+        """
+        import numpy as np
+        paths = self._expand_paths(paths)
+        results = threaded_map(self.get_block_locations, paths, workers,
+                               return_exceptions=True)
+        hosts, found, errors = {}, [], {}
+        block_path, block_offset, block_length = [], [], []
+        block_hosts_ptr, block_hosts = [0], []
+        for path, blocks in zip(paths, results):
+            if isinstance(blocks, Exception):
+                errors[path] = blocks
+                continue
+            for block in blocks:
+                block_path.append(len(found))
+                block_offset.append(block['offset'])
+                block_length.append(block['length'])
+                block_hosts.extend(
+                    hosts.setdefault(ensure_string(h), len(hosts))
+                    for h in block['hosts'])
+                block_hosts_ptr.append(len(block_hosts))
+            found.append(path)
+        block_length = np.array(block_length, dtype=np.int64)
+        block_hosts_ptr = np.array(block_hosts_ptr, dtype=np.int64)
+        block_hosts = np.array(block_hosts, dtype=np.int32)
+        replica_length = np.repeat(block_length, np.diff(block_hosts_ptr))
+        host_bytes = np.bincount(block_hosts, weights=replica_length,
+                                 minlength=len(hosts)).astype(np.int64)
+        return {'hosts': sorted(hosts, key=hosts.get),
+                'host_bytes': host_bytes,
+                'paths': found,
+                'block_path': np.array(block_path, dtype=np.int32),
+                'block_offset': np.array(block_offset, dtype=np.int64),
+                'block_length': block_length,
+                'block_hosts_ptr': block_hosts_ptr,
+                'block_hosts': block_hosts,
+                'errors': errors}
+
     def info(self, path):
         """ File information (as a dict) """
-        if not self.exists(path):
+        fi = _lib.hdfsGetPathInfo(self._handle, ensure_bytes(path))
+        if not fi:
             raise FileNotFoundError(path)
-        fi = _lib.hdfsGetPathInfo(self._handle, ensure_bytes(path)).contents
+        fi = fi.contents
         out = fi.to_dict()
         _lib.hdfsFreeFileInfo(ctypes.byref(fi), 1)
         return out
 
+    def _entry(self, path):
+        """ ``DirEntry`` for a single path """
+        fi = _lib.hdfsGetPathInfo(self._handle, ensure_bytes(path))
+        if not fi:
+            raise FileNotFoundError(path)
+        out = DirEntry(fi.contents)
+        _lib.hdfsFreeFileInfo(fi, 1)
+        return out
+
     def isdir(self, path):
         """Return True if path refers to an existing directory."""
         try:
@@ -331,14 +772,12 @@ class HDFileSystem(object):
         dirs = []
         files = []
 
-        for info in self.ls(path, True):
-            name = info['name']
-            tail = posixpath.split(name)[1]
-            if info['kind'] == 'directory':
-                full_dirs.append(name)
-                dirs.append(tail)
+        for entry in self.scandir(path):
+            if entry.is_dir():
+                full_dirs.append(entry.path)
+                dirs.append(entry.name)
             else:
-                files.append(tail)
+                files.append(entry.name)
 
         yield path, dirs, files
 
@@ -346,6 +785,142 @@ class HDFileSystem(object):
             for res in self.walk(d):
                 yield res
 
+    def _walk_entries(self, path, workers=DEFAULT_WORKERS, maxdepth=None,
+                      prune=None):
+        """ Entries below path, listed one level of the tree at a time
+
+        The directories of each level are listed concurrently. Directories
+        for which ``prune(entry)`` is true are yielded but not descended into.
+        Directories that disappear during the walk are skipped, but a
+        missing ``path`` raises FileNotFoundError.
+        """
+        if maxdepth is not None and maxdepth < 1:
+            return
+        listings, depth = [list(self.scandir(path))], 1
+        while listings:
+            level = []
+            descend = maxdepth is None or depth < maxdepth
+            for entries in listings:
+                if isinstance(entries, FileNotFoundError):
+                    continue
+                elif isinstance(entries, Exception):
+                    raise entries
+                for entry in entries:
+                    yield entry
+                    if (descend and entry.is_dir() and
+                            not (prune and prune(entry))):
+                        level.append(entry.path)
+            depth += 1
+            listings = threaded_map(lambda p: list(self.scandir(p)), level,
+                                    workers, return_exceptions=True)
+
+    def find(self, path, name=None, kind=None, min_size=None, max_size=None,
+             newer_than=None, older_than=None, owner=None, maxdepth=None,
+             prune=None, workers=DEFAULT_WORKERS, detail=False):
+        """ Find entries below path which match all of the given conditions
+
+        The tree is listed one level at a time, with the directories of each
+        level listed concurrently, and the conditions are applied as entries
+        arrive. Subtrees rejected by ``prune`` are never listed.
+
+        Parameters
+        ----------
+        path : string
+            directory to search below
+        name : string or compiled regular expression
+            searched for (``re.search``) in the final component of each path
+        kind : 'file' or 'directory'
+        min_size, max_size : int
+            bounds on the size in bytes (inclusive)
+        newer_than, older_than : int
+            bounds on ``last_mod``, in seconds since the epoch (exclusive)
+        owner : string
+        maxdepth : int or None
+            how many levels to descend; 1 means the contents of path only
+        prune : callable or None
+            called with the ``DirEntry`` of each directory found; if it
+            returns True, that directory's contents are not listed (the
+            directory itself is still matched against the conditions)
+        workers : int
+            number of concurrent listing requests
+        detail : bool (False)
+            if True, return a list of dicts as ``ls(path, True)``, otherwise
+            a list of paths
+
+        Raises FileNotFoundError if path does not exist; directories below it
+        which disappear while the tree is listed are skipped.
+
+        Examples
+        --------
+        >>> hdfs.find('/data', name=r'\\.parquet$', newer_than=1500000000,
+        ...           prune=lambda d: d.name.startswith('_'))  # doctest: +SKIP
+        """
+        if name is not None and not hasattr(name, 'search'):
+            name = re.compile(name)
+        out = []
+        for entry in self._walk_entries(path, workers, maxdepth, prune):
+            if ((kind is not None and entry.kind != kind) or
+                    (min_size is not None and entry.size < min_size) or
+                    (max_size is not None and entry.size > max_size) or
+                    (newer_than is not None and
+                     entry.last_mod <= newer_than) or
+                    (older_than is not None and
+                     entry.last_mod >= older_than) or
+                    (owner is not None and entry.owner != owner) or
+                    (name is not None and not name.search(entry.name))):
+                continue
+            out.append(entry.to_dict() if detail else entry.path)
+        return out
+
+    def watch(self, path, interval=5, recursive=True, initial=False,
+              workers=DEFAULT_WORKERS):
+        """ Poll a directory tree, yielding the changes found
+
+        A snapshot of the tree is kept between polls, and each poll only
+        re-lists directories whose modification time changed (unchanged
+        directories cost one ``info`` call each), so the cost of a poll
+        mostly depends on how much changed. See ``hdfs3.watch.TreeSnapshot``.
+
+        This generator runs forever; stop iterating (or call ``close()``
+        on it) to stop watching.
+
+        Parameters
+        ----------
+        path : string
+            directory to watch
+        interval : float
+            seconds to wait between polls
+        recursive : bool (True)
+            whether to watch subdirectories
+        initial : bool (False)
+            whether to report the entries already present as 'added'
+        workers : int
+            number of concurrent requests within a poll
+
+        Yields
+        ------
+        ``(event, path, info)`` tuples, where event is 'added', 'modified'
+        or 'removed', and info is the ``ls``-style dict of the entry (None
+        for removals).
+
+        Examples
+        --------
+        >>> for event, path, info in hdfs.watch('/landing', 10):  # doctest: +SKIP
+        ...     if event == 'added' and info['kind'] == 'file':
+        ...         process(path)
+        """
+        from .watch import TreeSnapshot
+        snapshot = TreeSnapshot(self, path, recursive=recursive,
+                                workers=workers)
+        events = snapshot.poll()
+        while True:
+            if initial:
+                for event in events:
+                    yield event
+            initial = True
+            time.sleep(interval)
+            events = snapshot.poll()
+
     def glob(self, path):
         """ Get list of paths mathing glob-like pattern (i.e., with "*"s).
 
@@ -401,6 +976,75 @@ class HDFileSystem(object):
         else:
             return [o['name'] for o in out]
 
+    def scandir(self, path):
+        """ Iterate over the entries at path, see ``os.scandir``
+
+        Yields light-weight ``DirEntry`` objects, whose string fields are
+        only decoded when accessed. The native listing is released as soon
+        as iteration finishes or the generator is closed, so callers may stop
+        early without paying for the rest of the directory.
+
+        Examples
+        --------
+        >>> big = [e.path for e in hdfs.scandir('/data')
+        ...        if e.is_file() and e.size > 2**30]  # doctest: +SKIP
+        """
+        if not self.exists(path):
+            raise FileNotFoundError(path)
+        num = ctypes.c_int(0)
+        fi = _lib.hdfsListDirectory(self._handle, ensure_bytes(path),
+                                    ctypes.byref(num))
+        try:
+            for i in range(num.value):
+                yield DirEntry(fi[i])
+        finally:
+            _lib.hdfsFreeFileInfo(fi, num.value)
+
+    def ls_arrays(self, path, format='numpy'):
+        """ List files at path as columns rather than one dict per entry
+
+        The columns are extracted in bulk from the native listing before it
+        is freed, which for very large directories uses much less memory and
+        time than ``ls(path, detail=True)``. Requires numpy (and pyarrow for
+        ``format='arrow'``).
+
+        Parameters
+        ----------
+        path : string/bytes
+            location at which to list files
+        format : 'numpy' or 'arrow'
+            if 'numpy', return a dict of numpy arrays, one per field of
+            ``ls(path, True)`` (except ``encryption_info``), where the
+            owner and group columns share one string object per distinct
+            value; if 'arrow', return a ``pyarrow.Table`` with
+            dictionary-encoded kind, owner and group columns.
+
+        Examples
+        --------
+        >>> cols = hdfs.ls_arrays('/data')  # doctest: +SKIP
+        >>> cols['name'][cols['size'] > 2**30]  # doctest: +SKIP
+        """
+        if format not in ('numpy', 'arrow'):
+            raise ValueError("format must be 'numpy' or 'arrow'")
+        if not self.exists(path):
+            raise FileNotFoundError(path)
+        num = ctypes.c_int(0)
+        fi = _lib.hdfsListDirectory(self._handle, ensure_bytes(path),
+                                    ctypes.byref(num))
+        try:
+            cols = _fileinfo_columns(fi, num.value)
+        finally:
+            _lib.hdfsFreeFileInfo(fi, num.value)
+        if format == 'arrow':
+            return _columns_to_arrow(cols)
+        import numpy as np
+        for field in ('owner', 'group'):
+            codes, uniques = cols.pop(field)
+            cols[field] = np.array(uniques, dtype=object)[codes]
+        cols['kind'] = np.array(['directory', 'file'], dtype=object)[
+            cols['kind']]
+        return cols
+
     @property
     def host(self):
         return self.conf.get('host', '')
@@ -410,14 +1054,14 @@ class HDFileSystem(object):
         return self.conf.get('port', '')
 
     def __repr__(self):
-        if self._handle is None:
+        if self._native is None:
             state = 'Disconnected'
         else:
             state = 'Connected'
         return 'hdfs://%s:%s, %s' % (self.host, self.port, state)
 
     def __del__(self):
-        if self._handle:
+        if getattr(self, '_native', None):
             self.disconnect()
 
     def mkdir(self, path):
@@ -542,6 +1186,122 @@ class HDFileSystem(object):
             msg = ensure_string(_lib.hdfsGetLastError()).split('\n')[0]
             raise IOError("chown failed on %s %s" % (path, msg))
 
+    def _expand_paths(self, paths):
+        """ List of paths, with any glob patterns expanded """
+        if isinstance(paths, (bytes, unicode)):
+            paths = [paths]
+        out = []
+        for path in paths:
+            if '*' in ensure_string(path):
+                out.extend(self.glob(path))
+            else:
+                out.append(path)
+        return out
+
+    def _apply_many(self, func, items, workers, keys=None):
+        """ Call ``func`` on each item concurrently, collecting any errors
+
+        Returns an ordered dict of key (by default, the item itself) to
+        ``None`` on success, or the exception raised for that item, in the
+        order of ``items``. Keys must be unique, so that no result is lost.
+        """
+        keys = items if keys is None else keys
+        seen, dups = set(), []
+        for key in keys:
+            if key in seen:
+                dups.append(key)
+            seen.add(key)
+        if dups:
+            raise ValueError('Paths given more than once: %s'
+                             % ', '.join(map(str, dups)))
+        results = threaded_map(func, items, workers, return_exceptions=True)
+        return OrderedDict((key, res if isinstance(res, Exception) else None)
+                           for key, res in zip(keys, results))
+
+    def chmod_many(self, paths, mode, workers=DEFAULT_WORKERS):
+        """ Change access control of many paths concurrently
+
+        Parameters
+        ----------
+        paths : string or list of strings
+            paths to change; entries containing "*" are expanded with ``glob``
+        mode : integer
+            as for ``chmod``
+        workers : int
+            number of concurrent requests
+
+        Returns
+        -------
+        dict of path to ``None`` if successful, or the exception raised
+        for that path, in the order of ``paths``. A path given (or matched)
+        more than once raises ValueError before anything is changed.
+        """
+        return self._apply_many(lambda p: self.chmod(p, mode),
+                                self._expand_paths(paths), workers)
+
+    def chown_many(self, paths, owner, group, workers=DEFAULT_WORKERS):
+        """ Change owner/group of many paths concurrently
+
+        See ``chmod_many`` for the arguments and return value.
+        """
+        return self._apply_many(lambda p: self.chown(p, owner, group),
+                                self._expand_paths(paths), workers)
+
+    def set_replication_many(self, paths, replication,
+                             workers=DEFAULT_WORKERS):
+        """ Set the replication of many files concurrently
+
+        See ``chmod_many`` for the arguments and return value.
+        """
+        return self._apply_many(
+            lambda p: self.set_replication(p, replication),
+            self._expand_paths(paths), workers)
+
+    def rm_many(self, paths, recursive=True, workers=DEFAULT_WORKERS):
+        """ Remove many paths concurrently
+
+        See ``chmod_many`` for the arguments and return value.
+        """
+        return self._apply_many(lambda p: self.rm(p, recursive),
+                                self._expand_paths(paths), workers)
+
+    def mkdir_many(self, paths, workers=DEFAULT_WORKERS):
+        """ Make many directories concurrently
+
+        See ``chmod_many`` for the arguments and return value; glob patterns
+        are not expanded here.
+        """
+        if isinstance(paths, (bytes, unicode)):
+            paths = [paths]
+        return self._apply_many(self.mkdir, list(paths), workers)
+
+    def mv_many(self, moves, workers=DEFAULT_WORKERS):
+        """ Move many paths concurrently
+
+        Parameters
+        ----------
+        moves : dict or list of (source, destination) pairs
+        workers : int
+            number of concurrent requests
+
+        Returns
+        -------
+        dict of source path to ``None`` if successful, or the exception
+        raised for that move, in the order of ``moves``. A source given more
+        than once raises ValueError before anything is moved.
+        """
+        if isinstance(moves, dict):
+            moves = moves.items()
+        moves = list(moves)
+
+        def move(pair):
+            if not self.mv(*pair):
+                msg = ensure_string(_lib.hdfsGetLastError()).split('\n')[0]
+                raise IOError('Move failed: %s -> %s %s' % (pair + (msg,)))
+
+        return self._apply_many(move, moves, workers,
+                                keys=[src for src, _ in moves])
+
     def cat(self, path):
         """ Return contents of file """
         if not self.exists(path):
@@ -586,12 +1346,8 @@ class HDFileSystem(object):
 
     def tail(self, path, size=1024):
         """ Return last bytes of file """
-        length = self.du(path)[ensure_trailing_slash(path)]
-        if size > length:
-            return self.cat(path)
-        with self.open(path, 'rb') as f:
-            f.seek(length - size)
-            return f.read(size)
+        return self._read_ranges(path, [(-size, None) if size > 0
+                                        else (0, 0)])[0]
 
     def head(self, path, size=1024):
         """ Return first bytes of file """
@@ -631,16 +1387,112 @@ class HDFileSystem(object):
         >>> hdfs.read_block('/data/file.csv', 0, 13, delimiter=b'\\n')  # doctest: +SKIP
         b'Alice, 100\\nBob, 200'
 
+        If the filesystem was created with ``hedge``, a read which is slow
+        to finish is issued again on a second stream, see ``HedgedReads``.
+
         See Also
         --------
         hdfs3.utils.read_block
         """
-        with self.open(fn, 'rb') as f:
-            size = f.info()['size']
-            if offset + length > size:
-                length = size - offset
-            bytes = read_block(f, offset, length, delimiter)
-        return bytes
+        def read():
+            with self.open(fn, 'rb') as f:
+                size = f.info()['size']
+                end = size if offset + length > size else offset + length
+                return read_block(f, offset, end - offset, delimiter)
+
+        if self.hedge is None:
+            return read()
+        return self.hedge.read(read)
+
+    def cat_ranges(self, paths, starts, ends, workers=DEFAULT_WORKERS,
+                   sizes=None):
+        """ Bytes of a range of each of many files, fetched concurrently
+
+        Each file is opened once for all of its ranges. Apart from the open,
+        the size of a file is requested only for ranges relative to its end,
+        and not at all when ``sizes`` are given. If the filesystem was
+        created with ``hedge``, a file slow to read is read again on a second
+        stream, see ``HedgedReads``.
+
+        Parameters
+        ----------
+        paths : list of strings
+        starts, ends : int, None, or lists of them, one per path
+            as in slicing: negative offsets count back from the end of the
+            file, and None stands for its start or end
+        workers : int
+            number of files read concurrently
+        sizes : list of ints, optional
+            sizes of the files, as known from a listing
+
+        Returns
+        -------
+        list, in the order of ``paths``, of the bytes of each range, or the
+        exception raised when reading it.
+
+        Examples
+        --------
+        >>> paths = hdfs.glob('/data/table/*.parquet')  # doctest: +SKIP
+        >>> footers = hdfs.cat_ranges(paths, -8, None)  # doctest: +SKIP
+        >>> footers[0]  # doctest: +SKIP
+        b'...PAR1'
+        """
+        n = len(paths)
+        starts = starts if isinstance(starts, list) else [starts] * n
+        ends = ends if isinstance(ends, list) else [ends] * n
+        if (len(starts) != n or len(ends) != n or
+                (sizes is not None and len(sizes) != n)):
+            raise ValueError('paths, starts, ends and sizes differ in length')
+        groups = {}
+        for i, path in enumerate(paths):
+            groups.setdefault(path, []).append(i)
+        groups = list(groups.items())
+
+        def read(group):
+            path, items = group
+            ranges = [(starts[i], ends[i]) for i in items]
+            size = None if sizes is None else sizes[items[0]]
+            if self.hedge is None:
+                return self._read_ranges(path, ranges, size)
+            return self.hedge.read(
+                lambda: self._read_ranges(path, ranges, size))
+
+        results = threaded_map(read, groups, workers, return_exceptions=True)
+        out = [None] * n
+        for (_, items), res in zip(groups, results):
+            for k, i in enumerate(items):
+                out[i] = res if isinstance(res, Exception) else res[k]
+        return out
+
+    def _read_ranges(self, path, ranges, size=None):
+        """ Bytes of each (start, end) range of one file, opening it once
+
+        Offsets are as in slicing: negative ones count back from the end of
+        the file, and None stands for its start or end. Unless given, the
+        size of the file is only looked up for ranges that need it.
+        """
+        try:
+            f = self.open(path, 'rb', size=size)
+        except IOError:
+            if not self.exists(path):
+                raise FileNotFoundError(path)
+            raise
+        out = []
+        with f:
+            for start, end in ranges:
+                start = 0 if start is None else start
+                if start < 0 or end is None or end < 0:
+                    start, end, _ = slice(start, end).indices(f.size)
+                if end <= start:
+                    out.append(b'')
+                    continue
+                try:
+                    f.seek(start)
+                except ValueError:  # past the end
+                    out.append(b'')
+                    continue
+                out.append(f.read(end - start))
+        return out
 
     def list_encryption_zones(self):
         """Get list of all the encryption zones"""
@@ -671,6 +1523,82 @@ def get_lib():
         _lib = l
 
 
+class DirEntry(object):
+    """ Entry in a directory listing, as yielded by ``HDFileSystem.scandir``
+
+    Numeric fields are plain attributes; ``path``, ``name``, ``owner`` and
+    ``group`` are decoded on first access.
+    """
+    __slots__ = ('_kind', '_path', '_owner', '_group', '_encryption_info',
+                 'last_mod', 'size', 'replication', 'block_size',
+                 'permissions', 'last_access')
+
+    def __init__(self, fi):
+        """ Copy the fields out of a native FileInfo struct """
+        self._kind = fi.kind
+        self._path = fi.name
+        self._owner = fi.owner
+        self._group = fi.group
+        if fi.encryption_info:
+            self._encryption_info = fi.encryption_info.contents.to_dict()
+        else:
+            self._encryption_info = None
+        self.last_mod = fi.last_mod
+        self.size = fi.size
+        self.replication = fi.replication
+        self.block_size = fi.block_size
+        self.permissions = fi.permissions
+        self.last_access = fi.last_access
+
+    @property
+    def path(self):
+        """ Full path of the entry """
+        self._path = ensure_string(self._path)
+        return self._path
+
+    @property
+    def name(self):
+        """ Final component of the path """
+        return posixpath.basename(self.path)
+
+    @property
+    def owner(self):
+        self._owner = ensure_string(self._owner)
+        return self._owner
+
+    @property
+    def group(self):
+        self._group = ensure_string(self._group)
+        return self._group
+
+    @property
+    def kind(self):
+        return {68: 'directory', 70: 'file'}.get(self._kind)
+
+    def is_dir(self):
+        return self._kind == 68
+
+    def is_file(self):
+        return self._kind == 70
+
+    def to_dict(self):
+        """ The same dict as produced by ``HDFileSystem.ls(path, True)`` """
+        return {'kind': self.kind,
+                'name': self.path,
+                'last_mod': self.last_mod,
+                'size': self.size,
+                'replication': self.replication,
+                'block_size': self.block_size,
+                'owner': self.owner,
+                'group': self.group,
+                'permissions': self.permissions,
+                'last_access': self.last_access,
+                'encryption_info': self._encryption_info}
+
+    def __repr__(self):
+        return '<DirEntry %r>' % self.path
+
+
 mode_numbers = {'w': 1, 'r': 0, 'a': 1025,
                 'wb': 1, 'rb': 0, 'ab': 1025}
 
@@ -688,7 +1616,8 @@ class HDFile(object):
     ...     df = pd.read_csv(f, nrows=1000)  # doctest: +SKIP
     """
 
-    def __init__(self, fs, path, mode, replication=0, buff=0, block_size=0):
+    def __init__(self, fs, path, mode, replication=0, buff=0, block_size=0,
+                 size=None):
         """ Called by open on a HDFileSystem """
         if 't' in mode:
             raise NotImplementedError("Opening a file in text mode is not"
@@ -698,13 +1627,22 @@ class HDFile(object):
         self.replication = replication
         self.buff = buff
         self._fs = fs._handle
+        self._pid = os.getpid()
         self.buffers = []
         self._handle = None
         self.mode = mode
         self.block_size = block_size
         self.lines = deque([])
+        self.loc = 0
         self._set_handle()
-        self.size = self.info()['size']
+        self._size = size
+
+    @property
+    def size(self):
+        """ Size of the file, fetched on first use unless given to open """
+        if self._size is None:
+            self._size = self.info()['size']
+        return self._size
 
     def _set_handle(self):
         out = _lib.hdfsOpenFile(self._fs, ensure_bytes(self.path),
@@ -717,6 +1655,26 @@ class HDFile(object):
                           (self.path, self.mode, msg))
         self._handle = out
 
+    def _check_fork(self):
+        """ Reopen a file inherited from a parent process
+
+        Files open for reading are reopened on the child's own connection at
+        the same position; files being written cannot be continued.
+        """
+        if self._pid == os.getpid() or self._handle is None:
+            return
+        if not self.readable():
+            raise IOError("File %s was opened for writing in process %d and "
+                          "cannot be used in a forked process"
+                          % (self.path, self._pid))
+        # the inherited handle is left alone: its position is taken from
+        # ``loc``, kept up to date by read and seek
+        self._fs = self.fs._handle
+        self._set_handle()
+        self._pid = os.getpid()
+        if self.loc > 0:
+            self.seek(self.loc)
+
     def readinto(self, length, out):
         """
         Read up to ``length`` bytes from the file into the ``out`` buffer,
@@ -736,6 +1694,7 @@ class HDFile(object):
         int
             number of bytes read
         """
+        self._check_fork()
         if not _lib.hdfsFileIsOpenForRead(self._handle):
             raise IOError('File not in read mode')
         bufsize = length
@@ -756,6 +1715,7 @@ class HDFile(object):
                 bufpos += ret
             else:
                 raise IOError('Read file %s Failed:' % self.path, -ret)
+        self.loc += bufpos
         return bufpos
 
     def read(self, length=None, out_buffer=None):
@@ -771,8 +1731,8 @@ class HDFile(object):
         ----------
 
         length : int
-            number of bytes to read. if it is None, read all remaining bytes
-            from the current position.
+            number of bytes to read. if it is None or negative, read all
+            remaining bytes from the current position.
 
         out_buffer : buffer, None or True
             the buffer to use as output, None to return bytes, True to create
@@ -787,9 +1747,18 @@ class HDFile(object):
             the data read as a memoryview into the buffer
         """
         return_buffer = out_buffer is not None
-        max_read = self.size - self.tell()
-        read_length = max_read if length in [None, -1] else length
-        read_length = min(max_read, read_length)
+        if length is not None and length < 0:
+            length = None
+        if (self._size is None and length is not None and
+                (out_buffer is None or out_buffer is True) and
+                length <= _SMALL_READ):
+            # the read stops at the end of the file anyway, so save a
+            # request for the size when the buffer would be small
+            read_length = length
+        else:
+            max_read = self.size - self.tell()
+            read_length = max_read if length is None else length
+            read_length = min(max_read, read_length)
 
         if out_buffer is None or out_buffer is True:
             out_buffer = bytearray(read_length)
@@ -806,6 +1775,25 @@ class HDFile(object):
             return memoryview(out_buffer)
         return memoryview(out_buffer).tobytes()
 
+    def readall(self):
+        """ Read from the current position to the end of the file
+
+        Unlike ``read()``, this does not need the size of the file, saving a
+        request to the name-node when it was not given to ``open``.
+        """
+        if self._size is not None:
+            return self.read()
+        chunks = []
+        chunksize = DEFAULT_READ_BUFFER_SIZE
+        while True:
+            buf = bytearray(chunksize)
+            n = self.readinto(chunksize, buf)
+            chunks.append(bytes(buf) if n == chunksize else bytes(buf[:n]))
+            if n < chunksize:
+                break
+            chunksize = min(chunksize * 2, 2 ** 24)
+        return b''.join(chunks)
+
     def readline(self, chunksize=0, lineterminator='\n'):
         """ Return a line using buffered reading.
 
@@ -856,6 +1844,7 @@ class HDFile(object):
 
     def tell(self):
         """ Get current byte location in a file """
+        self._check_fork()
         out = _lib.hdfsTell(self._fs, self._handle)
         if out == -1:
             msg = ensure_string(_lib.hdfsGetLastError()).split('\n')[0]
@@ -883,18 +1872,27 @@ class HDFile(object):
         """
         if from_what not in {0, 1, 2}:
             raise ValueError('seek mode must be 0, 1 or 2')
-        info = self.info()
+        self._check_fork()
+        if self._size is None and from_what == 0 and offset >= 0:
+            # libhdfs3 checks the bounds itself; the size is only looked
+            # up to report a failure
+            out = _lib.hdfsSeek(self._fs, self._handle, ctypes.c_int64(offset))
+            if out == 0:
+                self.loc = offset
+                return offset
+        size = self.size
         if from_what == 1:
             offset = offset + self.tell()
         elif from_what == 2:
-            offset = info['size'] + offset
-        if offset < 0 or offset > info['size']:
+            offset = size + offset
+        if offset < 0 or offset > size:
             raise ValueError('Attempt to seek outside file')
         out = _lib.hdfsSeek(self._fs, self._handle, ctypes.c_int64(offset))
         if out == -1:  # pragma: no cover
             msg = ensure_string(_lib.hdfsGetLastError()).split('\n')[0]
             raise IOError('Seek Failed on file %s' % (self.path, msg))
-        return self.tell()
+        self.loc = offset
+        return offset
 
     def info(self):
         """ Filesystem metadata about this file """
@@ -905,6 +1903,7 @@ class HDFile(object):
         data = ensure_bytes(data)
         if not data:
             return
+        self._check_fork()
         if not _lib.hdfsFileIsOpenForWrite(self._handle):
             msg = ensure_string(_lib.hdfsGetLastError()).split('\n')[0]
             raise IOError('File not write mode: {}'.format(msg))
@@ -918,12 +1917,15 @@ class HDFile(object):
 
     def flush(self):
         """ Send buffer to the data-node; actual write may happen later """
+        self._check_fork()
         _lib.hdfsFlush(self._fs, self._handle)
 
     def close(self):
         """ Flush and close file, ensuring the data is readable """
-        self.flush()
-        _lib.hdfsCloseFile(self._fs, self._handle)
+        if self._pid == os.getpid():
+            self.flush()
+            _lib.hdfsCloseFile(self._fs, self._handle)
+        # else: the file belongs to the parent process, which will close it
         self._handle = None  # _libhdfs releases memory
         self.mode = 'closed'
 
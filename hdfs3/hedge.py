@@ -0,0 +1,173 @@
+"Hedged reads: re-issue slow range reads on a second stream"
+from __future__ import absolute_import
+
+import math
+import os
+import threading
+import time
+from collections import deque
+
+try:
+    from queue import Queue, Empty
+except ImportError:
+    from Queue import Queue, Empty
+
+
+class HedgedReads(object):
+    """ Policy for hedging range reads against slow datanodes
+
+    A read which has not finished after a threshold is issued a second time,
+    and whichever attempt finishes first provides the result; the other is
+    left to finish in the background and its result discarded. Each attempt
+    must therefore open its own stream.
+
+    Only the whole-range reads of ``HDFileSystem.read_block`` and
+    ``HDFileSystem.cat_ranges`` are hedged; reads and seeks on an open
+    ``HDFile`` are not.
+
+    While there is no threshold, reads are made directly in the calling
+    thread. Otherwise they run on a set of background threads, which are
+    kept for later reads; with a threshold of 0, every read is issued twice
+    at once.
+
+    The threshold is either fixed, or a percentile of the latencies of
+    recent reads; in the adaptive case nothing is hedged until ``min_samples``
+    reads have been timed.
+
+    Parameters
+    ----------
+    delay : float or None
+        Fixed threshold in seconds; None for adaptive.
+    percentile : float (95)
+        Percentile of recent latencies used as adaptive threshold.
+    window : int (100)
+        Number of recent latencies remembered.
+    min_delay : float (0.01)
+        Lower bound in seconds for the adaptive threshold.
+    min_samples : int (10)
+        Number of latencies needed before adaptive hedging starts.
+
+    Examples
+    --------
+    >>> hdfs = HDFileSystem(hedge=HedgedReads(percentile=99))  # doctest: +SKIP
+    >>> data = hdfs.read_block('/data/file.csv', 0, 2**20)  # doctest: +SKIP
+    >>> hdfs.hedge.stats()  # doctest: +SKIP
+    {'reads': 1, 'hedged': 0, 'hedge_won': 0, 'threshold': None}
+    """
+
+    def __init__(self, delay=None, percentile=95, window=100, min_delay=0.01,
+                 min_samples=10):
+        self.delay = delay
+        self.percentile = percentile
+        self.window = window
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.hedged = 0
+        self.hedge_won = 0
+        self._reset_workers()
+
+    def _reset_workers(self):
+        self._pid = os.getpid()
+        self._tasks = Queue()
+        self._idle = 0
+
+    def __reduce__(self):
+        # counters and latencies are local to a process
+        return (HedgedReads, (self.delay, self.percentile, self.window,
+                              self.min_delay, self.min_samples))
+
+    def threshold(self):
+        """ Current delay in seconds before hedging, None for never """
+        if self.delay is not None:
+            return self.delay
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        i = int(math.ceil(self.percentile / 100. * len(ordered))) - 1
+        return max(self.min_delay, ordered[min(max(i, 0), len(ordered) - 1)])
+
+    def stats(self):
+        """ Counters of reads, hedged reads and reads won by the hedge """
+        with self._lock:
+            out = {'reads': self.reads, 'hedged': self.hedged,
+                   'hedge_won': self.hedge_won}
+        out['threshold'] = self.threshold()
+        return out
+
+    def _work(self):
+        while True:
+            func, i, results = self._tasks.get()
+            try:
+                out = (i, True, func())
+            except Exception as e:
+                out = (i, False, e)
+            # idle before the caller can see the result and submit again
+            with self._lock:
+                self._idle += 1
+            results.put(out)
+
+    def _submit(self, func, i, results):
+        """ Call ``func`` on an idle background thread, or a new one, putting
+        ``(i, success, result or exception)`` in ``results`` """
+        with self._lock:
+            if self._pid != os.getpid():
+                # the threads of the parent process do not exist here
+                self._reset_workers()
+            if self._idle:
+                self._idle -= 1
+            else:
+                t = threading.Thread(target=self._work)
+                t.daemon = True
+                t.start()
+        self._tasks.put((func, i, results))
+
+    def _record(self, latency, hedged, won):
+        with self._lock:
+            self.reads += 1
+            self.hedged += hedged
+            self.hedge_won += won
+            if latency is not None:
+                self._latencies.append(latency)
+
+    def read(self, func):
+        """ Call ``func()``, and call it again if the first takes too long
+
+        Returns the result of whichever call finishes first. If that call
+        raised, waits for the other one; if both raised, re-raises the
+        exception of the first.
+        """
+        threshold = self.threshold()
+        begin = time.time()
+        if threshold is None:
+            try:
+                out = func()
+            except Exception:
+                self._record(None, 0, 0)
+                raise
+            self._record(time.time() - begin, 0, 0)
+            return out
+
+        results = Queue()
+        self._submit(func, 0, results)
+        running = 1
+        try:
+            if threshold <= 0:
+                raise Empty
+            out = results.get(timeout=threshold)
+        except Empty:
+            self._submit(func, 1, results)
+            running = 2
+            out = results.get()
+        errors = []
+        while not out[1]:
+            errors.append(out[2])
+            if len(errors) == running:
+                self._record(None, running - 1, 0)
+                raise errors[0]
+            out = results.get()
+        self._record(time.time() - begin, running - 1, out[0])
+        return out[2]
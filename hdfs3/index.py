@@ -0,0 +1,361 @@
+"Local, persistent snapshot of (part of) an HDFS namespace"
+from __future__ import absolute_import
+
+import posixpath
+import re
+import sqlite3
+import time
+
+from .compatibility import FileNotFoundError
+from .core import DEFAULT_WORKERS
+from .utils import ensure_string, threaded_map
+
+_COLUMNS = ('path', 'parent', 'kind', 'size', 'last_mod', 'replication',
+            'block_size', 'owner', 'grp', 'permissions', 'last_access',
+            'listed_mod')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    kind TEXT,
+    size INTEGER,
+    last_mod INTEGER,
+    replication INTEGER,
+    block_size INTEGER,
+    owner TEXT,
+    grp TEXT,
+    permissions INTEGER,
+    last_access INTEGER,
+    listed_mod INTEGER
+);
+CREATE INDEX IF NOT EXISTS entries_parent ON entries (parent);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS recheck (path TEXT PRIMARY KEY);
+"""
+
+
+def _normpath(path):
+    path = ensure_string(path)
+    return path.rstrip('/') or '/'
+
+
+def _subtree_bounds(path):
+    """ Range of keys (lo, hi) that sort below path in the entries table """
+    prefix = path.rstrip('/') + '/'
+    return prefix, prefix[:-1] + '0'  # '0' sorts right after '/'
+
+
+def _glob_to_regex(pattern):
+    """ Same translation as ``HDFileSystem.glob`` """
+    return re.compile("^" + pattern.replace('//', '/')
+                      .rstrip('/')
+                      .replace('*', '[^/]*')
+                      .replace('?', '.') + "$")
+
+
+class HDFSIndex(object):
+    """ Local SQLite index of the entries below a root directory on HDFS
+
+    The index is built from a parallel, level-by-level listing of the tree
+    and then answers listing, glob, find and size queries without contacting
+    the namenode. ``refresh()`` re-lists only those directories whose
+    modification time changed since they were last listed, checking the
+    unchanged ones with a single ``info`` call each.
+
+    Note that HDFS only updates the modification time of a directory when
+    entries are added, removed or renamed within it, so a file that is
+    appended to in place will show stale size/mtime until its directory
+    changes or the index is rebuilt with ``refresh(full=True)``.
+
+    Parameters
+    ----------
+    hdfs : HDFileSystem
+    root : string
+        directory on HDFS to index
+    filename : string
+        location of the SQLite database on local disk; an existing index
+        for the same root is reused. Use ``':memory:'`` for a throw-away
+        index.
+    workers : int
+        number of concurrent listing requests
+    refresh : bool (True)
+        whether to bring the index up to date on creation
+
+    Examples
+    --------
+    >>> idx = HDFSIndex(hdfs, '/data', '/tmp/data-index.db')  # doctest: +SKIP
+    >>> idx.glob('/data/2017-*/*.csv')  # doctest: +SKIP
+    >>> idx.du('/data/2017-01', total=True)  # doctest: +SKIP
+    >>> idx.refresh()  # doctest: +SKIP
+    {'checked': 1283, 'listed': 3}
+    """
+
+    def __init__(self, hdfs, root, filename, workers=DEFAULT_WORKERS,
+                 refresh=True):
+        self.hdfs = hdfs
+        self.root = _normpath(root)
+        self.filename = filename
+        self.workers = workers
+        self.db = sqlite3.connect(filename)
+        self.db.create_function(
+            'regexp', 2, lambda pat, s: bool(re.match(pat, s)))
+        self.db.executescript(_SCHEMA)
+        stored = self._meta('root')
+        if stored is not None and stored != self.root:
+            raise ValueError('Index at %s is for root %s, not %s'
+                             % (filename, stored, self.root))
+        self._set_meta('root', self.root)
+        if refresh:
+            self.refresh()
+
+    def _meta(self, key):
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?',
+                              (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                            (key, value))
+
+    @property
+    def last_refresh(self):
+        """ Time (seconds since the epoch) of the last refresh, or None """
+        value = self._meta('last_refresh')
+        return None if value is None else float(value)
+
+    def _listed_mod(self, path):
+        row = self.db.execute('SELECT listed_mod FROM entries WHERE path = ?',
+                              (path,)).fetchone()
+        return row[0] if row else None
+
+    def _needs_listing(self, path, mtime):
+        if mtime != self._listed_mod(path):
+            return True
+        return self.db.execute('SELECT 1 FROM recheck WHERE path = ?',
+                               (path,)).fetchone() is not None
+
+    def _child_dirs(self, path):
+        return [row[0] for row in self.db.execute(
+            "SELECT path FROM entries WHERE parent = ? AND kind = 'directory'",
+            (path,))]
+
+    def _delete_subtree(self, path):
+        lo, hi = _subtree_bounds(path)
+        self.db.execute('DELETE FROM entries WHERE path = ? OR '
+                        '(path >= ? AND path < ?)', (path, lo, hi))
+
+    def _store_listing(self, path, mtime, entries, started):
+        """ Replace the children of path by a fresh listing
+
+        Modification times have a resolution of one second, so a directory
+        last changed in the second the listing started (``started``) is
+        listed once more on the next refresh, in case it changed again
+        within that second. Any later change of an older directory shows up
+        as a newer modification time.
+        """
+        if mtime >= started:
+            self.db.execute('INSERT OR IGNORE INTO recheck VALUES (?)',
+                            (path,))
+        else:
+            self.db.execute('DELETE FROM recheck WHERE path = ?', (path,))
+        new = dict((e.path, e) for e in entries)
+        old = set(row[0] for row in self.db.execute(
+            'SELECT path FROM entries WHERE parent = ?', (path,)))
+        for gone in old - set(new):
+            self._delete_subtree(gone)
+        for p, e in new.items():
+            if e.kind != 'directory':
+                # a directory replaced by a file loses its subtree
+                lo, hi = _subtree_bounds(p)
+                self.db.execute('DELETE FROM entries WHERE path >= ? AND '
+                                'path < ?', (lo, hi))
+        self.db.executemany(
+            'INSERT OR REPLACE INTO entries (%s) VALUES (%s, '
+            '(SELECT listed_mod FROM entries WHERE path = ?))'
+            % (', '.join(_COLUMNS), ', '.join('?' * (len(_COLUMNS) - 1))),
+            [(p, path, e.kind, e.size, e.last_mod, e.replication,
+              e.block_size, e.owner, e.group, e.permissions, e.last_access, p)
+             for p, e in new.items()])
+        self.db.execute('UPDATE entries SET listed_mod = ? WHERE path = ?',
+                        (mtime, path))
+
+    def refresh(self, full=False):
+        """ Bring the index up to date with HDFS
+
+        Directories are visited one level at a time. A directory whose
+        modification time is unchanged since it was listed keeps its stored
+        children; otherwise it is listed again. Listings and ``info`` calls
+        within a level run concurrently.
+
+        Parameters
+        ----------
+        full : bool (False)
+            re-list every directory, regardless of modification times
+
+        Returns
+        -------
+        dict with the number of directories ``listed`` and the number only
+        ``checked`` for changes.
+        """
+        stats = {'listed': 0, 'checked': 0}
+        info = self.hdfs.info(self.root)
+        if info['kind'] != 'directory':
+            raise ValueError('Index root must be a directory: %s' % self.root)
+        with self.db:
+            self.db.execute(
+                'INSERT OR IGNORE INTO entries (path, parent, kind) '
+                "VALUES (?, ?, 'directory')",
+                (self.root, posixpath.dirname(self.root)))
+            self.db.execute(
+                'UPDATE entries SET size = ?, last_mod = ?, replication = ?, '
+                'block_size = ?, owner = ?, grp = ?, permissions = ?, '
+                'last_access = ? WHERE path = ?',
+                (info['size'], info['last_mod'], info['replication'],
+                 info['block_size'], info['owner'], info['group'],
+                 info['permissions'], info['last_access'], self.root))
+        # (path, current mtime or None if not known yet)
+        level = [(self.root, info['last_mod'])]
+        while level:
+            unknown = [p for p, mtime in level if mtime is None]
+            infos = threaded_map(self.hdfs.info, unknown, self.workers,
+                                 return_exceptions=True)
+            current = dict(level)
+            stats['checked'] += len(unknown)
+            with self.db:
+                for p, res in zip(unknown, infos):
+                    if isinstance(res, FileNotFoundError):
+                        self._delete_subtree(p)
+                        del current[p]
+                    elif isinstance(res, Exception):
+                        raise res
+                    else:
+                        current[p] = res['last_mod']
+            stale = [p for p, mtime in current.items()
+                     if full or self._needs_listing(p, mtime)]
+            started = int(time.time())
+            listings = threaded_map(lambda p: list(self.hdfs.scandir(p)),
+                                    stale, self.workers,
+                                    return_exceptions=True)
+            stats['listed'] += len(stale)
+            level = []
+            with self.db:
+                for p, res in zip(stale, listings):
+                    if isinstance(res, FileNotFoundError):
+                        self._delete_subtree(p)
+                        continue
+                    elif isinstance(res, Exception):
+                        raise res
+                    self._store_listing(p, current[p], res, started)
+                    level.extend((e.path, e.last_mod) for e in res
+                                 if e.is_dir())
+                for p in set(current) - set(stale):
+                    level.extend((d, None) for d in self._child_dirs(p))
+        self._set_meta('last_refresh', repr(time.time()))
+        return stats
+
+    def _rows(self, where, args):
+        cur = self.db.execute(
+            'SELECT path, kind, last_mod, size, replication, block_size, '
+            'owner, grp, permissions, last_access FROM entries WHERE '
+            + where + ' ORDER BY path', args)
+        return [{'name': r[0], 'kind': r[1], 'last_mod': r[2], 'size': r[3],
+                 'replication': r[4], 'block_size': r[5], 'owner': r[6],
+                 'group': r[7], 'permissions': r[8], 'last_access': r[9]}
+                for r in cur]
+
+    def info(self, path):
+        """ Stored file information (as a dict), as ``HDFileSystem.info`` """
+        out = self._rows('path = ?', (_normpath(path),))
+        if not out:
+            raise FileNotFoundError(path)
+        return out[0]
+
+    def exists(self, path):
+        """ Is there an entry at path in the index? """
+        return self.db.execute('SELECT 1 FROM entries WHERE path = ?',
+                               (_normpath(path),)).fetchone() is not None
+
+    def ls(self, path, detail=False):
+        """ List stored entries at path, as ``HDFileSystem.ls`` """
+        path = _normpath(path)
+        if not self.exists(path):
+            raise FileNotFoundError(path)
+        out = self._rows('parent = ? AND path != ?', (path, path))
+        if detail:
+            return out
+        return [o['name'] for o in out]
+
+    def find(self, path=None, kind=None, min_size=None, max_size=None,
+             newer_than=None, older_than=None, detail=False):
+        """ Stored entries below path matching all of the given conditions
+
+        Parameters
+        ----------
+        path : string
+            directory to search below; defaults to the index root
+        kind : 'file' or 'directory'
+        min_size, max_size : int
+            bounds on the size in bytes (inclusive)
+        newer_than, older_than : int
+            bounds on ``last_mod``, in seconds since the epoch (exclusive)
+        detail : bool (False)
+            if True, return dicts as ``ls(path, True)``, else paths
+        """
+        lo, hi = _subtree_bounds(_normpath(path or self.root))
+        where, args = ['path >= ?', 'path < ?'], [lo, hi]
+        for cond, value in [('kind = ?', kind), ('size >= ?', min_size),
+                            ('size <= ?', max_size),
+                            ('last_mod > ?', newer_than),
+                            ('last_mod < ?', older_than)]:
+            if value is not None:
+                where.append(cond)
+                args.append(value)
+        out = self._rows(' AND '.join(where), args)
+        if detail:
+            return out
+        return [o['name'] for o in out]
+
+    def glob(self, pattern):
+        """ Stored paths matching glob-like pattern, as ``HDFileSystem.glob``
+        """
+        pattern = ensure_string(pattern)
+        if '*' not in pattern and '?' not in pattern:
+            if self.exists(pattern):
+                info = self.info(pattern)
+                if info['kind'] == 'directory':
+                    return self.ls(pattern)
+                return [info['name']]
+            return []
+        literal = re.split(r'[*?]', pattern, 1)[0]
+        base = literal[:literal.rindex('/') + 1] if '/' in literal else '/'
+        lo, hi = _subtree_bounds(base)
+        regex = _glob_to_regex(pattern).pattern
+        return [row[0] for row in self.db.execute(
+            'SELECT path FROM entries WHERE path >= ? AND path < ? AND '
+            'regexp(?, path) ORDER BY path', (lo, hi, regex))]
+
+    def du(self, path, total=False):
+        """ Stored sizes of entries at path, as ``HDFileSystem.du``
+
+        With ``total=True``, sums all files below path, at any depth.
+        """
+        path = _normpath(path)
+        if total:
+            lo, hi = _subtree_bounds(path)
+            size = self.db.execute(
+                "SELECT SUM(size) FROM entries WHERE kind = 'file' AND "
+                "(path = ? OR (path >= ? AND path < ?))",
+                (path, lo, hi)).fetchone()[0]
+            return {path: size or 0}
+        return dict((o['name'], o['size']) for o in self.ls(path, True))
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def __repr__(self):
+        return '<HDFSIndex of %s at %s>' % (self.root, self.filename)
@@ -1,30 +1,20 @@
 # -*- coding: utf-8 -*-
 """
 Low-level interface to libhdfs3
+
+Nothing is loaded on import: the shared library is opened, and each function
+given its signature from the ``_signatures`` table, on first use.
 """
 from __future__ import absolute_import
 
 import sys
+import threading
 import ctypes as ct
 from .utils import ensure_string
 
 
 PY3 = sys.version_info.major > 2
 
-_lib = None
-for name in ['libhdfs3.so', 'libhdfs3.dylib']:
-    try:
-        _lib = ct.cdll.LoadLibrary(name)
-        break
-    except OSError as e:
-        if not e.args or ("image not found" not in str(e.args[0]) and
-                          "No such file" not in str(e)):
-            raise
-if _lib is None:
-    raise ImportError("Can not find the shared library: libhdfs3.so\n"
-                      "See installation instructions at "
-                      "http://hdfs3.readthedocs.io/en/latest/install.html")
-
 tSize = ct.c_int32
 tTime = ct.c_int64
 tOffset = ct.c_int64
@@ -107,19 +97,6 @@ class FileInfo(ct.Structure):
                 'encryption_info': e_info}
 
 
-hdfsGetPathInfo = _lib.hdfsGetPathInfo
-hdfsGetPathInfo.argtypes = [ct.c_char_p]
-hdfsGetPathInfo.restype = ct.POINTER(FileInfo)
-hdfsGetPathInfo.__doc__ = """Get information about a path as a (dynamically
-allocated) single hdfsFileInfo struct. hdfsFreeFileInfo should be
-called when the pointer is no longer needed.
-
-param fs The configured filesystem handle.
-param path The path of the file.
-return Returns a dynamically-allocated hdfsFileInfo object;
-NULL on error."""
-
-
 class hdfsBuilder(ct.Structure):
     pass
 
@@ -132,80 +109,87 @@ class hdfsFS(ct.Structure):
     _fields_ = [('filesystem', ct.c_void_p)]  # TODO: expand this if needed
 
 
-hdfsGetFileBlockLocations = _lib.hdfsGetFileBlockLocations
-hdfsGetFileBlockLocations.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p,
-                                      tOffset, tOffset, ct.POINTER(ct.c_int)]
-hdfsGetFileBlockLocations.restype = ct.POINTER(BlockLocation)
-hdfsGetFileBlockLocations.__doc__ = """Get an array containing hostnames, offset and size of portions of the given file.
+def _load_library():
+    """ Open the libhdfs3 shared library """
+    for name in ['libhdfs3.so', 'libhdfs3.dylib']:
+        try:
+            return ct.cdll.LoadLibrary(name)
+        except OSError as e:
+            if not e.args or ("image not found" not in str(e.args[0]) and
+                              "No such file" not in str(e)):
+                raise
+    raise ImportError("Can not find the shared library: libhdfs3.so\n"
+                      "See installation instructions at "
+                      "http://hdfs3.readthedocs.io/en/latest/install.html")
+
+
+# function name: (argtypes, restype, docstring)
+_signatures = {
+    'hdfsGetFileBlockLocations': (
+        [ct.POINTER(hdfsFS), ct.c_char_p, tOffset, tOffset,
+         ct.POINTER(ct.c_int)],
+        ct.POINTER(BlockLocation),
+        """Get an array containing hostnames, offset and size of portions of the given file.
 
 param fs The file system
 param path The path to the file
 param start The start offset into the given file
 param length The length for which to get locations for
 param numOfBlock Output the number of elements in the returned array
-return An array of BlockLocation struct."""
-
-
-hdfsGetLastError = _lib.hdfsGetLastError
-hdfsGetLastError.argtypes = []
-hdfsGetLastError.restype = ct.c_char_p
-hdfsGetLastError.__doc__ = """Return error information of last failed operation.
+return An array of BlockLocation struct."""),
+    'hdfsGetLastError': (
+        [],
+        ct.c_char_p,
+        """Return error information of last failed operation.
 
 return A not NULL const string point of last error information.
 Caller can only read this message and keep it unchanged. No need to free it.
-If last operation finished successfully, the returned message is undefined."""
-
-hdfsFileIsOpenForRead = _lib.hdfsFileIsOpenForRead
-hdfsFileIsOpenForRead.argtypes = [ct.POINTER(hdfsFile)]
-hdfsFileIsOpenForRead.restype = ct.c_bool
-hdfsFileIsOpenForRead.__doc__ = """Determine if a file is open for read.
+If last operation finished successfully, the returned message is undefined."""),
+    'hdfsFileIsOpenForRead': (
+        [ct.POINTER(hdfsFile)],
+        ct.c_bool,
+        """Determine if a file is open for read.
 
 param file     The HDFS file
-return         1 if the file is open for read; 0 otherwise"""
-
-hdfsFileIsOpenForWrite = _lib.hdfsFileIsOpenForRead
-hdfsFileIsOpenForWrite.argtypes = [ct.POINTER(hdfsFile)]
-hdfsFileIsOpenForWrite.restype = ct.c_bool
-hdfsFileIsOpenForWrite.__doc__ = """Determine if a file is open for write.
+return         1 if the file is open for read; 0 otherwise"""),
+    'hdfsFileIsOpenForWrite': (
+        [ct.POINTER(hdfsFile)],
+        ct.c_bool,
+        """Determine if a file is open for write.
 
 param file     The HDFS file
-return         1 if the file is open for write; 0 otherwise"""
-
-hdfsConnectAsUser = _lib.hdfsConnectAsUser
-hdfsConnectAsUser.argtypes = [ct.c_char_p, tPort, ct.c_char_p]
-hdfsConnectAsUser.restype = ct.POINTER(hdfsFS)
-hdfsConnectAsUser.__doc__ = """Connect to a hdfs file system as a specific user
+return         1 if the file is open for write; 0 otherwise"""),
+    'hdfsConnectAsUser': (
+        [ct.c_char_p, tPort, ct.c_char_p],
+        ct.POINTER(hdfsFS),
+        """Connect to a hdfs file system as a specific user
 
 param nn   The NameNode.  See hdfsBuilderSetNameNode for details.
 param port The port on which the server is listening.
 param user the user name (this is hadoop domain user). Or NULL is equivelant to hhdfsConnect(host, port)
 return Returns a handle to the filesystem or NULL on error.
-deprecated Use hdfsBuilderConnect instead."""
-
-hdfsConnectAsUserNewInstance = _lib.hdfsConnectAsUserNewInstance
-hdfsConnectAsUserNewInstance.argtypes = [ct.c_char_p, tPort, ct.c_char_p]
-hdfsConnectAsUserNewInstance.restype = ct.POINTER(hdfsFS)
-hdfsConnectAsUserNewInstance.__doc__ = "Connect to a hdfs file system as a specific user, new instance"
-
-hdfsConnect = _lib.hdfsConnect
-hdfsConnect.argtypes = [ct.c_char_p, tPort]
-hdfsConnect.restype = ct.POINTER(hdfsFS)
-hdfsConnect.__doc__ = """Connect to a hdfs file system
+deprecated Use hdfsBuilderConnect instead."""),
+    'hdfsConnectAsUserNewInstance': (
+        [ct.c_char_p, tPort, ct.c_char_p],
+        ct.POINTER(hdfsFS),
+        "Connect to a hdfs file system as a specific user, new instance"),
+    'hdfsConnect': (
+        [ct.c_char_p, tPort],
+        ct.POINTER(hdfsFS),
+        """Connect to a hdfs file system
 
 param nn   The NameNode.  See hdfsBuilderSetNameNode for details.
 param port The port on which the server is listening.
 return Returns a handle to the filesystem or NULL on error.
-deprecated Use hdfsBuilderConnect instead."""
-
-hdfsConnectNewInstance = _lib.hdfsConnectNewInstance
-hdfsConnectNewInstance.argtypes = [ct.c_char_p, tPort]
-hdfsConnectNewInstance.restype = ct.POINTER(hdfsFS)
-hdfsConnectNewInstance.__doc__ = "New structure for connection information"
-
-hdfsBuilderConnect = _lib.hdfsBuilderConnect
-hdfsBuilderConnect.argtypes = [ct.POINTER(hdfsBuilder), ct.c_char_p]
-hdfsBuilderConnect.restype = ct.POINTER(hdfsFS)
-hdfsBuilderConnect.__doc__ = """Connect to HDFS using the parameters defined by the builder.
+deprecated Use hdfsBuilderConnect instead."""),
+    'hdfsConnectNewInstance': (
+        [ct.c_char_p, tPort],
+        ct.POINTER(hdfsFS),
+        "New structure for connection information"),
+    'hdfsBuilderConnect': (
+        [ct.POINTER(hdfsBuilder), ct.c_char_p],
+        ct.POINTER(hdfsFS),
+        """Connect to HDFS using the parameters defined by the builder.
 
 The HDFS builder will be freed, whether or not the connection was
 successful.
@@ -215,22 +199,19 @@ to hdfsDisconnect, when the hdfsFS is no longer needed.
 
 param bld    The HDFS builder
 return       Returns a handle to the filesystem, or NULL on error.
-"""
-
-hdfsNewBuilder = _lib.hdfsNewBuilder
-hdfsNewBuilder.argtypes = []
-hdfsNewBuilder.restype = ct.POINTER(hdfsBuilder)
-hdfsNewBuilder.__doc__ = "Create an HDFS builder."
-
-hdfsBuilderSetForceNewInstance = _lib.hdfsBuilderSetForceNewInstance
-hdfsBuilderSetForceNewInstance.argtypes = [ct.POINTER(hdfsBuilder)]
-hdfsBuilderSetForceNewInstance.restype = None
-hdfsBuilderSetForceNewInstance.__doc__ = "Do nothing, we always create a new instance"
-
-hdfsBuilderSetNameNode = _lib.hdfsBuilderSetNameNode
-hdfsBuilderSetNameNode.argtypes = [ct.POINTER(hdfsBuilder), ct.c_char_p]
-hdfsBuilderSetNameNode.restype = None
-hdfsBuilderSetNameNode.__doc__ = """Set the HDFS NameNode to connect to.
+"""),
+    'hdfsNewBuilder': (
+        [],
+        ct.POINTER(hdfsBuilder),
+        "Create an HDFS builder."),
+    'hdfsBuilderSetForceNewInstance': (
+        [ct.POINTER(hdfsBuilder)],
+        None,
+        "Do nothing, we always create a new instance"),
+    'hdfsBuilderSetNameNode': (
+        [ct.POINTER(hdfsBuilder), ct.c_char_p],
+        None,
+        """Set the HDFS NameNode to connect to.
 
 param bld  The HDFS builder
 param nn   The NameNode to use.
@@ -248,49 +229,44 @@ param nn   The NameNode to use.
              passing a string of the format hdfs://<hostname>:<port>.
              Alternately, you may set the port with
              hdfsBuilderSetNameNodePort.  However, you must not pass the
-             port in two different ways."""
-
-hdfsBuilderSetNameNodePort = _lib.hdfsBuilderSetNameNodePort
-hdfsBuilderSetNameNodePort.argtypes = [ct.POINTER(hdfsBuilder), tPort]
-hdfsBuilderSetNameNodePort.restype = None
-hdfsBuilderSetNameNodePort.__doc__ = """Set the port of the HDFS NameNode to connect to.
+             port in two different ways."""),
+    'hdfsBuilderSetNameNodePort': (
+        [ct.POINTER(hdfsBuilder), tPort],
+        None,
+        """Set the port of the HDFS NameNode to connect to.
 
 param bld The HDFS builder
-param port The port."""
-
-hdfsBuilderSetUserName = _lib.hdfsBuilderSetUserName
-hdfsBuilderSetUserName.argtypes = [ct.POINTER(hdfsBuilder), ct.c_char_p]
-hdfsBuilderSetUserName.restype = None
-hdfsBuilderSetUserName.__doc__ = """Set the username to use when connecting to the HDFS cluster.
+param port The port."""),
+    'hdfsBuilderSetUserName': (
+        [ct.POINTER(hdfsBuilder), ct.c_char_p],
+        None,
+        """Set the username to use when connecting to the HDFS cluster.
 
 param bld The HDFS builder
-param userName The user name.  The string will be shallow-copied."""
-
-hdfsBuilderSetKerbTicketCachePath = _lib.hdfsBuilderSetKerbTicketCachePath
-hdfsBuilderSetKerbTicketCachePath.argtypes = [ct.POINTER(hdfsBuilder), ct.c_char_p]
-hdfsBuilderSetKerbTicketCachePath.restype = None
-hdfsBuilderSetKerbTicketCachePath.__doc__ = """Set the path to the Kerberos ticket cache to use when connecting to the HDFS cluster.
+param userName The user name.  The string will be shallow-copied."""),
+    'hdfsBuilderSetKerbTicketCachePath': (
+        [ct.POINTER(hdfsBuilder), ct.c_char_p],
+        None,
+        """Set the path to the Kerberos ticket cache to use when connecting to the HDFS cluster.
 
 param bld The HDFS builder
 param kerbTicketCachePath The Kerberos ticket cache path.  The string
-                            will be shallow-copied."""
-
-hdfsBuilderSetToken = _lib.hdfsBuilderSetToken
-hdfsBuilderSetToken.argtypes = [ct.POINTER(hdfsBuilder), ct.c_char_p]
-hdfsBuilderSetToken.restype = None
-hdfsBuilderSetToken.__doc__ = """Set the token used to authenticate
+                            will be shallow-copied."""),
+    'hdfsBuilderSetToken': (
+        [ct.POINTER(hdfsBuilder), ct.c_char_p],
+        None,
+        """Set the token used to authenticate
 
 param bld The HDFS builder
-param token The token used to authenticate"""
-
-hdfsFreeBuilder = _lib.hdfsFreeBuilder
-hdfsFreeBuilder.argtypes = [ct.POINTER(hdfsBuilder)]
-hdfsFreeBuilder.restype = None
-hdfsFreeBuilder.__doc__ = "Free an HDFS builder."
-
-hdfsBuilderConfSetStr = _lib.hdfsBuilderConfSetStr
-hdfsBuilderConfSetStr.argtypes = [ct.POINTER(hdfsBuilder), ct.c_char_p, ct.c_char_p]
-hdfsBuilderConfSetStr.__doc__ = """Set a configuration string for an HdfsBuilder.
+param token The token used to authenticate"""),
+    'hdfsFreeBuilder': (
+        [ct.POINTER(hdfsBuilder)],
+        None,
+        "Free an HDFS builder."),
+    'hdfsBuilderConfSetStr': (
+        [ct.POINTER(hdfsBuilder), ct.c_char_p, ct.c_char_p],
+        ct.c_int,
+        """Set a configuration string for an HdfsBuilder.
 
 param key      The key to set.
 param val      The value, or NULL to set no value.
@@ -298,22 +274,21 @@ param val      The value, or NULL to set no value.
                ensuring that it remains valid until the builder is
                freed.
 
-return         0 on success; nonzero error code otherwise."""
-
-hdfsDisconnect = _lib.hdfsDisconnect
-hdfsDisconnect.argtypes = [ct.POINTER(hdfsFS)]
-hdfsDisconnect.__doc__ = """Disconnect from the hdfs file system.
+return         0 on success; nonzero error code otherwise."""),
+    'hdfsDisconnect': (
+        [ct.POINTER(hdfsFS)],
+        ct.c_int,
+        """Disconnect from the hdfs file system.
 
 param fs The configured filesystem handle.
 @return Returns 0 on success, -1 on error.
         Even if there is an error, the resources associated with the
-        hdfsFS will be freed."""
-
-hdfsOpenFile = _lib.hdfsOpenFile
-hdfsOpenFile.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p, ct.c_int, ct.c_int,
-                         ct.c_short, tOffset]
-hdfsOpenFile.restype = ct.POINTER(hdfsFile)
-hdfsOpenFile.__doc__ = """Open a hdfs file in given mode.
+        hdfsFS will be freed."""),
+    'hdfsOpenFile': (
+        [ct.POINTER(hdfsFS), ct.c_char_p, ct.c_int, ct.c_int, ct.c_short,
+         tOffset],
+        ct.POINTER(hdfsFile),
+        """Open a hdfs file in given mode.
 
 Open a hdfs file in given mode.
 param fs The configured filesystem handle.
@@ -329,11 +304,11 @@ param replication Block replication - pass 0 if you want to use
  the default configured values.
 param blocksize Size of block - pass 0 if you want to use the
  default configured values.
-return Returns the handle to the open file or NULL on error."""
-
-hdfsCloseFile = _lib.hdfsCloseFile
-hdfsCloseFile.argtypes = [ct.POINTER(hdfsFS), ct.POINTER(hdfsFile)]
-hdfsCloseFile.__doc__ = """Close an open file.
+return Returns the handle to the open file or NULL on error."""),
+    'hdfsCloseFile': (
+        [ct.POINTER(hdfsFS), ct.POINTER(hdfsFile)],
+        ct.c_int,
+        """Close an open file.
 
 param fs The configured filesystem handle.
 param file The file handle.
@@ -341,40 +316,37 @@ return Returns 0 on success, -1 on error.
        On error, errno will be set appropriately.
        If the hdfs file was valid, the memory associated with it will
        be freed at the end of this call, even if there was an I/O
-       error."""
-
-hdfsExists = _lib.hdfsExists
-hdfsExists.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p]
-hdfsExists.__doc__ = """Checks if a given path exsits on the filesystem
+       error."""),
+    'hdfsExists': (
+        [ct.POINTER(hdfsFS), ct.c_char_p],
+        ct.c_int,
+        """Checks if a given path exsits on the filesystem
 
 param fs The configured filesystem handle.
 param path The path to look for
-return Returns 0 on success, -1 on error."""
-
-hdfsSeek = _lib.hdfsSeek
-hdfsSeek.argtypes = [ct.POINTER(hdfsFS), ct.POINTER(hdfsFile), tOffset]
-hdfsSeek.__doc__ = """Seek to given offset in file.
+return Returns 0 on success, -1 on error."""),
+    'hdfsSeek': (
+        [ct.POINTER(hdfsFS), ct.POINTER(hdfsFile), tOffset],
+        ct.c_int,
+        """Seek to given offset in file.
 This works only for files opened in read-only mode.
 
 param fs The configured filesystem handle.
 param file The file handle.
 param desiredPos Offset into the file to seek into.
-return Returns 0 on success, -1 on error."""
-
-hdfsTell = _lib.hdfsTell
-hdfsTell.argtypes = [ct.POINTER(hdfsFS), ct.POINTER(hdfsFile)]
-hdfsTell.restype = tOffset
-hdfsTell.__doc__ = """Get the current offset in the file, in bytes.
+return Returns 0 on success, -1 on error."""),
+    'hdfsTell': (
+        [ct.POINTER(hdfsFS), ct.POINTER(hdfsFile)],
+        tOffset,
+        """Get the current offset in the file, in bytes.
 
 param fs The configured filesystem handle.
 param file The file handle.
-return Current offset, -1 on error."""
-
-hdfsRead = _lib.hdfsRead
-hdfsRead.argtypes = [ct.POINTER(hdfsFS), ct.POINTER(hdfsFile), ct.c_void_p,
-                     tSize]
-hdfsRead.restype = tSize
-hdfsRead.__doc__ = """Read data from an open file.
+return Current offset, -1 on error."""),
+    'hdfsRead': (
+        [ct.POINTER(hdfsFS), ct.POINTER(hdfsFile), ct.c_void_p, tSize],
+        tSize,
+        """Read data from an open file.
 
 param fs The configured filesystem handle.
 param file The file handle.
@@ -386,71 +358,66 @@ return      On success, a positive number indicating how many bytes
             On error, -1.  Errno will be set to the error code.
             Just like the POSIX read function, hdfsRead will return -1
             and set errno to EINTR if data is temporarily unavailable,
-            but we are not yet at the end of the file."""
-
-hdfsWrite = _lib.hdfsWrite
-hdfsWrite.argtypes = [ct.POINTER(hdfsFS), ct.POINTER(hdfsFile), ct.c_void_p,
-                      tSize]
-hdfsWrite.restype = tSize
-hdfsWrite.__doc__ = """Write data into an open file.
+            but we are not yet at the end of the file."""),
+    'hdfsWrite': (
+        [ct.POINTER(hdfsFS), ct.POINTER(hdfsFile), ct.c_void_p, tSize],
+        tSize,
+        """Write data into an open file.
 
 param fs The configured filesystem handle.
 param file The file handle.
 param buffer The data.
 param length The no. of bytes to write.
-return Returns the number of bytes written, -1 on error."""
-
-hdfsHFlush = _lib.hdfsHFlush
-hdfsHFlush.argtypes = [ct.POINTER(hdfsFS), ct.POINTER(hdfsFile)]
-hdfsHFlush.__doc__ = """Flush the data.
+return Returns the number of bytes written, -1 on error."""),
+    'hdfsHFlush': (
+        [ct.POINTER(hdfsFS), ct.POINTER(hdfsFile)],
+        ct.c_int,
+        """Flush the data.
 
 param fs The configured filesystem handle.
 param file The file handle.
-return Returns 0 on success, -1 on error."""
-
-hdfsSync = _lib.hdfsSync
-hdfsSync.argtypes = [ct.POINTER(hdfsFS), ct.POINTER(hdfsFile)]
-hdfsSync.__doc__ = """Flush out and sync the data in client's user buffer.
+return Returns 0 on success, -1 on error."""),
+    'hdfsSync': (
+        [ct.POINTER(hdfsFS), ct.POINTER(hdfsFile)],
+        ct.c_int,
+        """Flush out and sync the data in client's user buffer.
 After the return of this call, new readers will see the data.
 
 param fs configured filesystem handle
 param file file handle
-return 0 on success, -1 on error and sets errno"""
-
-hdfsAvailable = _lib.hdfsAvailable
-hdfsAvailable.argtypes = [ct.POINTER(hdfsFS), ct.POINTER(hdfsFile)]
-hdfsAvailable.__doc__ = """Number of bytes that can be read without blocking.
+return 0 on success, -1 on error and sets errno"""),
+    'hdfsAvailable': (
+        [ct.POINTER(hdfsFS), ct.POINTER(hdfsFile)],
+        ct.c_int,
+        """Number of bytes that can be read without blocking.
 
 param fs The configured filesystem handle.
 param file The file handle.
-return Returns available bytes; -1 on error."""
-
-hdfsCopy = _lib.hdfsCopy
-hdfsCopy.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p,
-                     ct.POINTER(hdfsFS), ct.c_char_p]
-hdfsCopy.__doc__ = """Copy file from one filesystem to another.
+return Returns available bytes; -1 on error."""),
+    'hdfsCopy': (
+        [ct.POINTER(hdfsFS), ct.c_char_p, ct.POINTER(hdfsFS), ct.c_char_p],
+        ct.c_int,
+        """Copy file from one filesystem to another.
 
 param srcFS The handle to source filesystem.
 param src The path of source file.
 param dstFS The handle to destination filesystem.
 param dst The path of destination file.
-return Returns 0 on success, -1 on error."""
-
-hdfsMove = _lib.hdfsMove
-hdfsMove.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p,
-                     ct.POINTER(hdfsFS), ct.c_char_p]
-hdfsMove.__doc__ = """Move file from one filesystem to another.
+return Returns 0 on success, -1 on error."""),
+    'hdfsMove': (
+        [ct.POINTER(hdfsFS), ct.c_char_p, ct.POINTER(hdfsFS), ct.c_char_p],
+        ct.c_int,
+        """Move file from one filesystem to another.
 
 param srcFS The handle to source filesystem.
 param src The path of source file.
 param dstFS The handle to destination filesystem.
 param dst The path of destination file.
-return Returns 0 on success, -1 on error."""
-
-hdfsConcat = _lib.hdfsConcat
-hdfsConcat.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p,
-                       ct.POINTER(ct.c_char_p)]
-hdfsConcat.__doc__ = """Concatenate (move) the blocks in a list of source
+return Returns 0 on success, -1 on error."""),
+    'hdfsConcat': (
+        [ct.POINTER(hdfsFS), ct.c_char_p, ct.POINTER(ct.c_char_p)],
+        ct.c_int,
+        """Concatenate (move) the blocks in a list of source
 files into a single file deleting the source files.
 
 Source files must all have the same block size and replication and all
@@ -462,245 +429,279 @@ param fs The configured filesystem handle.
 param trg The path of target (resulting) file
 param scrs A list of paths to source files
 return Returns 0 on success, -1 on error.
-"""
-
-hdfsDelete = _lib.hdfsDelete
-hdfsDelete.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p, ct.c_int]
-hdfsDelete.__doc__ = """Delete file.
+"""),
+    'hdfsDelete': (
+        [ct.POINTER(hdfsFS), ct.c_char_p, ct.c_int],
+        ct.c_int,
+        """Delete file.
 
 param fs The configured filesystem handle.
 param path The path of the file.
 param recursive if path is a directory and set to
  non-zero, the directory is deleted else throws an exception. In
  case of a file the recursive argument is irrelevant.
-return Returns 0 on success, -1 on error."""
-
-hdfsRename = _lib.hdfsRename
-hdfsRename.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p, ct.c_char_p]
-hdfsRename.__doc__ = """Rename file.
+return Returns 0 on success, -1 on error."""),
+    'hdfsRename': (
+        [ct.POINTER(hdfsFS), ct.c_char_p, ct.c_char_p],
+        ct.c_int,
+        """Rename file.
 
 param fs The configured filesystem handle.
 param oldPath The path of the source file.
 param newPath The path of the destination file.
 return Returns 0 on success, -1 on error.
-"""
-
-hdfsGetWorkingDirectory = _lib.hdfsGetWorkingDirectory
-hdfsGetWorkingDirectory.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p, tSize]
-hdfsGetWorkingDirectory.restype = ct.c_char_p
-hdfsGetWorkingDirectory.__doc__ = """Get the current working directory for
+"""),
+    'hdfsGetWorkingDirectory': (
+        [ct.POINTER(hdfsFS), ct.c_char_p, tSize],
+        ct.c_char_p,
+        """Get the current working directory for
 the given filesystem.
 
 param fs The configured filesystem handle.
 param buffer The user-buffer to copy path of cwd into.
 param bufferSize The length of user-buffer.
 return Returns buffer, NULL on error.
-"""
-
-hdfsSetWorkingDirectory = _lib.hdfsSetWorkingDirectory
-hdfsSetWorkingDirectory.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p]
-hdfsSetWorkingDirectory.__doc__ = """Set the working directory. All relative
+"""),
+    'hdfsSetWorkingDirectory': (
+        [ct.POINTER(hdfsFS), ct.c_char_p],
+        ct.c_int,
+        """Set the working directory. All relative
 paths will be resolved relative to it.
 
 param fs The configured filesystem handle.
 param path The path of the new 'cwd'.
-return Returns 0 on success, -1 on error."""
-
-hdfsCreateDirectory = _lib.hdfsCreateDirectory
-hdfsCreateDirectory.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p]
-hdfsCreateDirectory.__doc__ = """Make the given file and all non-existent
+return Returns 0 on success, -1 on error."""),
+    'hdfsCreateDirectory': (
+        [ct.POINTER(hdfsFS), ct.c_char_p],
+        ct.c_int,
+        """Make the given file and all non-existent
 parents into directories.
 
 param fs The configured filesystem handle.
 param path The path of the directory.
-return Returns 0 on success, -1 on error."""
-
-hdfsCreateDirectoryEx = _lib.hdfsCreateDirectoryEx
-hdfsCreateDirectoryEx.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p,
-                                  ct.c_short, ct.c_int]
-hdfsCreateDirectoryEx.restype = ct.c_int
-hdfsCreateDirectoryEx.__doc__ = """Make the given file with extended options
+return Returns 0 on success, -1 on error."""),
+    'hdfsCreateDirectoryEx': (
+        [ct.POINTER(hdfsFS), ct.c_char_p, ct.c_short, ct.c_int],
+        ct.c_int,
+        """Make the given file with extended options
 
 param fs The configured filesystem handle.
 param path The path of the directory.
 param mode The permissions for created file and directories.
 param createParents Controls whether to create all non-existent parent directories or not
-return Returns 0 on success, -1 on error."""
-
-
-hdfsSetReplication = _lib.hdfsSetReplication
-hdfsSetReplication.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p, ct.c_int16]
-hdfsSetReplication.__doc__ = """Set the replication of the specified
+return Returns 0 on success, -1 on error."""),
+    'hdfsSetReplication': (
+        [ct.POINTER(hdfsFS), ct.c_char_p, ct.c_int16],
+        ct.c_int,
+        """Set the replication of the specified
 file to the supplied value
 
 param fs The configured filesystem handle.
 param path The path of the file.
-return Returns 0 on success, -1 on error."""
-
-hdfsListDirectory = _lib.hdfsListDirectory
-hdfsListDirectory.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p,
-                              ct.POINTER(ct.c_int)]
-hdfsListDirectory.restype = ct.POINTER(FileInfo)
-hdfsListDirectory.__doc__ = """Get list of files/directories for a given
+return Returns 0 on success, -1 on error."""),
+    'hdfsListDirectory': (
+        [ct.POINTER(hdfsFS), ct.c_char_p, ct.POINTER(ct.c_int)],
+        ct.POINTER(FileInfo),
+        """Get list of files/directories for a given
 directory-path. hdfsFreeFileInfo should be called to deallocate memory.
 
 param fs The configured filesystem handle.
 param path The path of the directory.
 param numEntries Set to the number of files/directories in path.
 return Returns a dynamically-allocated array of hdfsFileInfo
-objects; NULL on error."""
-
-hdfsGetPathInfo = _lib.hdfsGetPathInfo
-hdfsGetPathInfo.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p]
-hdfsGetPathInfo.restype = ct.POINTER(FileInfo)
-hdfsGetPathInfo.__doc__ = """Get information about a path as a (dynamically
+objects; NULL on error."""),
+    'hdfsGetPathInfo': (
+        [ct.POINTER(hdfsFS), ct.c_char_p],
+        ct.POINTER(FileInfo),
+        """Get information about a path as a (dynamically
 allocated) single hdfsFileInfo struct. hdfsFreeFileInfo should be
 called when the pointer is no longer needed.
 
 param fs The configured filesystem handle.
 param path The path of the file.
 return Returns a dynamically-allocated hdfsFileInfo object;
-NULL on error."""
-
-hdfsFreeEncryptionZoneInfo = _lib.hdfsFreeEncryptionZoneInfo
-hdfsFreeEncryptionZoneInfo.argtypes = [ct.POINTER(EncryptionZoneInfo), ct.c_int]
-hdfsFreeEncryptionZoneInfo.restype = None
-hdfsFreeEncryptionZoneInfo.__doc__ = """Free up the hdfsEncryptionZoneInfo array
+NULL on error."""),
+    'hdfsFreeEncryptionZoneInfo': (
+        [ct.POINTER(EncryptionZoneInfo), ct.c_int],
+        None,
+        """Free up the hdfsEncryptionZoneInfo array
 
 param infos The array of dynamically-allocated hdfsEncryptionZoneInfo objects.
 param numEntries The size of the array.
-"""
-
-
-hdfsFreeFileInfo = _lib.hdfsFreeFileInfo
-hdfsFreeFileInfo.argtypes = [ct.POINTER(FileInfo), ct.c_int]
-hdfsFreeFileInfo.restype = None
-hdfsFreeFileInfo.__doc__ = """Free up the hdfsFileInfo array (including fields)
+"""),
+    'hdfsFreeFileInfo': (
+        [ct.POINTER(FileInfo), ct.c_int],
+        None,
+        """Free up the hdfsFileInfo array (including fields)
 param infos The array of dynamically-allocated hdfsFileInfo
 objects.
 
-param numEntries The size of the arr"""
-
-hdfsGetDefaultBlockSize = _lib.hdfsGetDefaultBlockSize
-hdfsGetDefaultBlockSize.argtypes = [ct.POINTER(hdfsFS)]
-hdfsGetDefaultBlockSize.restype = tOffset
-hdfsGetDefaultBlockSize.__doc__ = """Get the default blocksize.
+param numEntries The size of the arr"""),
+    'hdfsGetDefaultBlockSize': (
+        [ct.POINTER(hdfsFS)],
+        tOffset,
+        """Get the default blocksize.
 
 param fs            The configured filesystem handle.
 deprecated          Use hdfsGetDefaultBlockSizeAtPath instead.
-return              Returns the default blocksize, or -1 on error."""
-
-hdfsGetCapacity = _lib.hdfsGetCapacity
-hdfsGetCapacity.argtypes = [ct.POINTER(hdfsFS)]
-hdfsGetCapacity.restype = tOffset
-hdfsGetCapacity.__doc__ = """Return the raw capacity of the filesystem.
+return              Returns the default blocksize, or -1 on error."""),
+    'hdfsGetCapacity': (
+        [ct.POINTER(hdfsFS)],
+        tOffset,
+        """Return the raw capacity of the filesystem.
 
 param fs The configured filesystem handle.
-return Returns the raw-capacity; -1 on error."""
-
-hdfsGetUsed = _lib.hdfsGetUsed
-hdfsGetUsed.argtypes = [ct.POINTER(hdfsFS)]
-hdfsGetUsed.restype = tOffset
-hdfsGetUsed.__doc__ = """Return the total raw size of all files in the filesystem.
+return Returns the raw-capacity; -1 on error."""),
+    'hdfsGetUsed': (
+        [ct.POINTER(hdfsFS)],
+        tOffset,
+        """Return the total raw size of all files in the filesystem.
 
 param fs The configured filesystem handle.
-return Returns the total-size; -1 on error."""
-
-hdfsChown = _lib.hdfsChown
-hdfsChown.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p, ct.c_char_p, ct.c_char_p]
-hdfsChown.__doc__ = """Change the user and/or group of a file or directory.
+return Returns the total-size; -1 on error."""),
+    'hdfsChown': (
+        [ct.POINTER(hdfsFS), ct.c_char_p, ct.c_char_p, ct.c_char_p],
+        ct.c_int,
+        """Change the user and/or group of a file or directory.
 
 param fs            The configured filesystem handle.
 param path          the path to the file or directory
 param owner         User string.  Set to NULL for 'no change'
 param group         Group string.  Set to NULL for 'no change'
-return              0 on success else -1"""
-
-hdfsChmod = _lib.hdfsChmod
-hdfsChmod.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p, ct.c_short]
-hdfsChmod.__doc__ = """param fs The configured filesystem handle.
+return              0 on success else -1"""),
+    'hdfsChmod': (
+        [ct.POINTER(hdfsFS), ct.c_char_p, ct.c_short],
+        ct.c_int,
+        """param fs The configured filesystem handle.
 
 param path the path to the file or directory
 param mode the bitmask to set it to
-return 0 on success else -1"""
-
-hdfsUtime = _lib.hdfsUtime
-hdfsUtime.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p, tTime, tTime]
-hdfsUtime.__doc__ = """@param fs The configured filesystem handle.
+return 0 on success else -1"""),
+    'hdfsUtime': (
+        [ct.POINTER(hdfsFS), ct.c_char_p, tTime, tTime],
+        ct.c_int,
+        """@param fs The configured filesystem handle.
 
 param path the path to the file or directory
 param mtime new modification time or -1 for no change
 param atime new access time or -1 for no change
-return 0 on success else -1"""
-
-hdfsTruncate = _lib.hdfsTruncate
-hdfsTruncate.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p, tOffset, ct.c_int]
-hdfsTruncate.__doc__ = """Truncate the file in the indicated path to the indicated size.
+return 0 on success else -1"""),
+    'hdfsTruncate': (
+        [ct.POINTER(hdfsFS), ct.c_char_p, tOffset, ct.c_int],
+        ct.c_int,
+        """Truncate the file in the indicated path to the indicated size.
 
 param fs The configured filesystem handle.
 param path the path to the file.
 param pos the position the file will be truncated to.
 param shouldWait output value, true if and client does not need to wait for block recovery,
-false if client needs to wait for block recovery."""
-
-hdfsGetDelegationToken = _lib.hdfsGetDelegationToken
-hdfsGetDelegationToken.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p]
-hdfsGetDelegationToken.restype = ct.c_char_p
-hdfsGetDelegationToken.__doc__ = """Get a delegation token from namenode.
+false if client needs to wait for block recovery."""),
+    'hdfsGetDelegationToken': (
+        [ct.POINTER(hdfsFS), ct.c_char_p],
+        ct.c_char_p,
+        """Get a delegation token from namenode.
 The token should be freed using hdfsFreeDelegationToken after canceling the token or token expired.
 
 param fs The file system
 param renewer The user who will renew the token
-return Return a delegation token, NULL on error."""
-
-hdfsFreeDelegationToken = _lib.hdfsFreeDelegationToken
-hdfsFreeDelegationToken.argtypes = [ct.c_char_p]
-hdfsFreeDelegationToken.restype = None
-hdfsFreeDelegationToken.__doc__ = """Free a delegation token.
-
-param token The token to be freed."""
-
-hdfsRenewDelegationToken = _lib.hdfsRenewDelegationToken
-hdfsRenewDelegationToken.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p]
-hdfsRenewDelegationToken.restype = ct.c_int64
-hdfsRenewDelegationToken.__doc__ = """Renew a delegation token.
+return Return a delegation token, NULL on error."""),
+    'hdfsFreeDelegationToken': (
+        [ct.c_char_p],
+        None,
+        """Free a delegation token.
+
+param token The token to be freed."""),
+    'hdfsRenewDelegationToken': (
+        [ct.POINTER(hdfsFS), ct.c_char_p],
+        ct.c_int64,
+        """Renew a delegation token.
 
 param fs The file system.
 param token The token to be renewed.
-return the new expiration time"""
-
-hdfsCancelDelegationToken = _lib.hdfsCancelDelegationToken
-hdfsCancelDelegationToken.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p]
-hdfsCancelDelegationToken.restype = ct.c_int
-hdfsCancelDelegationToken.__doc__ = """Cancel a delegation token.
+return the new expiration time"""),
+    'hdfsCancelDelegationToken': (
+        [ct.POINTER(hdfsFS), ct.c_char_p],
+        ct.c_int,
+        """Cancel a delegation token.
 
 param fs The file system.
 param token The token to be canceled.
-return return 0 on success, -1 on error."""
-
-hdfsFreeFileBlockLocations = _lib.hdfsFreeFileBlockLocations
-hdfsFreeFileBlockLocations.argtypes = [ct.POINTER(BlockLocation), ct.c_int]
-hdfsFreeFileBlockLocations.restype = None
-hdfsFreeFileBlockLocations.__doc__ = """Free the BlockLocation array returned by hdfsGetFileBlockLocations
+return return 0 on success, -1 on error."""),
+    'hdfsFreeFileBlockLocations': (
+        [ct.POINTER(BlockLocation), ct.c_int],
+        None,
+        """Free the BlockLocation array returned by hdfsGetFileBlockLocations
 
 param locations The array returned by hdfsGetFileBlockLocations
-param numOfBlock The number of elements in the locations"""
-
-hdfsListEncryptionZones = _lib.hdfsListEncryptionZones
-hdfsListEncryptionZones.argtypes = [ct.POINTER(hdfsFS), ct.POINTER(ct.c_int)]
-hdfsListEncryptionZones.restype = ct.POINTER(EncryptionZoneInfo)
-hdfsListEncryptionZones.__doc__ = """Get list of all the encryption zones.
+param numOfBlock The number of elements in the locations"""),
+    'hdfsListEncryptionZones': (
+        [ct.POINTER(hdfsFS), ct.POINTER(ct.c_int)],
+        ct.POINTER(EncryptionZoneInfo),
+        """Get list of all the encryption zones.
 
 param fs The configured filesystem handle.
 return Returns a dynamically-allocated array of hdfsEncryptionZoneInfo objects;
-NULL on error."""
-
-hdfsCreateEncryptionZone = _lib.hdfsCreateEncryptionZone
-hdfsCreateEncryptionZone.argtypes = [ct.POINTER(hdfsFS), ct.c_char_p, ct.c_char_p]
-hdfsCreateEncryptionZone.restype = ct.c_int
-hdfsCreateEncryptionZone.__doc__ = """Create encryption zone for the directory
+NULL on error."""),
+    'hdfsCreateEncryptionZone': (
+        [ct.POINTER(hdfsFS), ct.c_char_p, ct.c_char_p],
+        ct.c_int,
+        """Create encryption zone for the directory
 
 param fs The configured filesystem handle.
 param path The path of the directory.
 param keyname The key name of the encryption zone
-return Returns 0 on success, -1 on error."""
+return Returns 0 on success, -1 on error."""),
+}
+
+
+class _Bindings(object):
+    """ Functions of libhdfs3, configured from ``_signatures`` on first access
+
+    The library itself is loaded on first access to any function. Resolved
+    functions are stored as attributes, so later lookups cost nothing extra.
+    Functions not in the table are returned with ctypes' default signature.
+    """
+
+    def __init__(self):
+        self._dll = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._dll is None:
+                self._dll = _load_library()
+        return self._dll
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        func = getattr(self._load(), name)
+        if name in _signatures:
+            func.argtypes, func.restype, func.__doc__ = _signatures[name]
+        setattr(self, name, func)
+        return func
+
+
+_lib = _Bindings()
+
+
+class _Function(object):
+    """ Module-level name of a libhdfs3 function, e.g. ``hdfsGetLastError`` """
+
+    def __init__(self, name):
+        self.__name__ = name
+        self.__doc__ = _signatures[name][2]
+
+    def __call__(self, *args):
+        return getattr(_lib, self.__name__)(*args)
+
+    def __getattr__(self, attr):
+        return getattr(getattr(_lib, self.__name__), attr)
+
+    def __repr__(self):
+        return '<libhdfs3 function %s>' % self.__name__
+
+
+for _name in _signatures:
+    globals()[_name] = _Function(_name)
+del _name
@@ -1,12 +1,45 @@
+import hashlib
 import posixpath
+import re
+import struct
+import threading
+import time
 from collections import MutableMapping
 
+from .compatibility import FileNotFoundError, unicode
+from .compression import check_codec, compress, decompress
+from .core import DEFAULT_WORKERS
+from .utils import threaded_map, LRUCache, ensure_bytes
+
+try:
+    from queue import Queue, Empty
+except ImportError:
+    from Queue import Queue, Empty
+
+# record of a pack index file, followed by the utf-8 key:
+# offset and length of the value in the pack (length -1: key deleted)
+_PACK_RECORD = struct.Struct('<qqI')
+_PACK_FILE = re.compile(r'^(\d+)\.(pack|idx)$')
+# ranges of a pack closer than this are fetched with a single read
+_PACK_GAP = 2 ** 16
+# values queued by a write-behind map when not given a number
+DEFAULT_WRITE_BEHIND = 64
+# file below the root of a sharded map, holding the number of shards
+SHARDS_FILE = '.shards'
+
+
+def _entry_size(entry):
+    """ Size of a cached ``(value, stamp)`` entry """
+    return len(entry[0])
+
 
 class HDFSMap(MutableMapping):
     """Wrap a HDFileSystem as a mutable mapping.
 
     The keys of the mapping become files under the given root, and the
-    values (which must be bytes) the contents of those files.
+    values (which must be bytes) the contents of those files. Unless the map
+    is sharded, keys may contain '/', to store values in subdirectories,
+    which ``listdir`` lists like a directory tree.
 
     Parameters
     ----------
@@ -16,6 +49,43 @@ class HDFSMap(MutableMapping):
         doesn't exist)
     check : bool (=True)
         performs a touch at the location, to check writeability.
+    workers : int
+        number of concurrent requests in ``getitems``, ``setitems`` and
+        ``delitems``
+    cache_bytes : int (=0)
+        if non-zero, keep up to this many bytes of recently used values in
+        memory. Writes and deletes through this map update the cache.
+    validate : bool (=False)
+        when caching, check each cached value's modification time and size
+        with the name-node before using it, for stores also written by others.
+        Values modified within the current second are not cached.
+    snapshot : bool (=False)
+        answer ``len``, ``in``, iteration and ``listdir`` from an in-memory
+        set of keys, listed once on first use (or by ``refresh``) and kept up
+        to date by writes and deletes through this map. Keys written by
+        others are not seen until the next ``refresh``.
+    write_behind : bool or int (=False)
+        if true, assignments return once the value is queued, and ``workers``
+        background threads write the queued values; reads of queued keys
+        give the queued value. An int bounds the number of queued values
+        (default 64), beyond which assignments wait. ``flush()``, also
+        called on leaving a ``with`` block without an exception, waits for
+        the writes and raises the first error; deletions, listings and
+        pickling wait for queued writes too.
+    compression : None, 'gzip', 'zstd' or 'lz4'
+        compress values as they are stored (zstd and lz4 need the
+        ``zstandard`` and ``lz4`` packages). Compressed values start with a
+        header naming the codec, so that values stored with any compression
+        or none are read back correctly (uncompressed values which happen to
+        start like a header get one too). In ``getitems``, ``setitems`` and
+        write-behind, the values are (de)compressed concurrently.
+    shards : int or None
+        if given, store each key in one of this many subdirectories of root,
+        chosen by a hash of the key, to keep directories small. The number
+        is recorded below root, and read from there when the map is opened
+        with None; a different number is refused, as is a root holding
+        keys stored without shards. Subdirectories are made on first use,
+        and their listings are fetched concurrently by ``keys()``.
 
     Examples
     --------
@@ -26,64 +96,850 @@ class HDFSMap(MutableMapping):
     ['loc1']
     >>> mw['loc1'] # doctest: +SKIP
     b'Hello World'
+    >>> mw.getitems(['loc1', 'loc2']) # doctest: +SKIP
+    {'loc1': b'Hello World'}
+    >>> with HDFSMap(hdfs, '/path/', write_behind=True) as mw:  # doctest: +SKIP
+    ...     for i, chunk in enumerate(chunks):
+    ...         mw['chunk-%d' % i] = chunk
     """
 
-    def __init__(self, hdfs, root, check=False):
+    def __init__(self, hdfs, root, check=False, workers=DEFAULT_WORKERS,
+                 cache_bytes=0, validate=False, snapshot=False,
+                 write_behind=False, compression=None, shards=None):
+        if compression is not None:
+            check_codec(compression)
         self.hdfs = hdfs
         self.root = root
+        self.workers = workers
+        self.validate = validate
+        self.snapshot = snapshot
+        self.write_behind = write_behind
+        self.compression = compression
+        self.shards = shards
+        self._known_dirs = set()
+        self._keyset = None
+        self._cache = (LRUCache(cache_bytes, sizeof=_entry_size)
+                       if cache_bytes else None)
+        self._reset_stats()
+        self._reset_writers()
         if not hdfs.exists(root):
             hdfs.mkdir(root)
+        self._check_shards()
         if check:
             hdfs.ls(root)
             hdfs.touch(root + '/a')
             hdfs.rm(root + '/a')
 
+    def __getstate__(self):
+        self._wait()
+        d = self.__dict__.copy()
+        for k in ['_lock', '_stale', '_loading', '_pending', '_queues',
+                  '_threads', '_errors', '_seq']:
+            del d[k]
+        d['_keyset'] = None  # listed again where it is used
+        d['_known_dirs'] = set()
+        return d
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset_stats()
+        self._reset_writers()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        if args[0] is None:
+            self.flush()
+        else:
+            # the queued writes finish, but their errors are left for a
+            # later flush rather than replacing the exception raised
+            self._wait()
+
+    def _reset_stats(self):
+        self._lock = threading.Lock()
+        self._stale = 0
+        self._loading = {}  # path -> token of the read to be cached
+
+    def _reset_writers(self):
+        self._pending = {}  # path -> (sequence number, value) being written
+        self._queues = None
+        self._threads = None
+        self._errors = []
+        self._seq = 0
+
+    def _check_shards(self):
+        """ Take the number of shards from the record, or check it against
+        the record, or make the record for an empty root """
+        path = posixpath.join(self.root, SHARDS_FILE)
+        if self.hdfs.exists(path):
+            found = int(self.hdfs.cat(path))
+            if self.shards is None:
+                self.shards = found
+            elif found != self.shards:
+                raise ValueError("Map at %s has %d shards, not %d"
+                                 % (self.root, found, self.shards))
+        elif self.shards:
+            if self.hdfs.ls(self.root, detail=False):
+                raise ValueError("Map at %s holds keys without shards, "
+                                 "cannot open it with %d shards"
+                                 % (self.root, self.shards))
+            with self.hdfs.open(path, 'wb') as f:
+                f.write(str(self.shards).encode())
+
+    def _shard(self, key):
+        """ Name of the subdirectory holding key """
+        h = int(hashlib.md5(ensure_bytes(key)).hexdigest()[:8], 16)
+        width = len('%x' % (self.shards - 1))
+        return '%0*x' % (width, h % self.shards)
+
+    def cache_info(self):
+        """ Statistics of the value cache, or None if not caching
+
+        ``hits`` and ``misses`` count lookups, ``stale`` the cached values
+        found out of date by ``validate``; ``count`` and ``size`` give the
+        number and total bytes of values held, up to ``maxsize``.
+        """
+        if self._cache is None:
+            return None
+        out = self._cache.info()
+        # stale values were found in the cache, but not used
+        out['hits'] -= self._stale
+        out['stale'] = self._stale
+        return out
+
     def clear(self):
         """Remove all keys below root - empties out mapping
         """
+        self._wait()
         self.hdfs.rm(self.root, recursive=True)
         self.hdfs.mkdir(self.root)
+        self._known_dirs.clear()
+        if self.shards:
+            self._check_shards()
+        if self._cache is not None:
+            self._cache.clear()
+        if self.snapshot:
+            self._keyset = set()
 
     def _key_to_str(self, key):
         if isinstance(key, (tuple, list)):
             key = str(tuple(key))
         else:
             key = str(key)
-        if '/' in key:
-            raise ValueError("Keys containing '/' disallowed")
+        if key == SHARDS_FILE:
+            raise ValueError("Key %r is reserved" % key)
+        if self.shards:
+            if '/' in key:
+                raise ValueError("Keys of a sharded map cannot contain '/'")
+        elif any(part in ('', '.', '..') for part in key.split('/')):
+            raise ValueError("Invalid key %r: its parts between '/' cannot "
+                             "be empty, '.' or '..'" % key)
+        if self.shards:
+            return '/'.join([self.root, self._shard(key), key])
         return '/'.join([self.root, key])
 
-    def __getitem__(self, key):
-        key = self._key_to_str(key)
+    def _get(self, path):
+        """ Contents of the file at path, or KeyError, using the cache """
+        if self._pending:
+            with self._lock:
+                entry = self._pending.get(path)
+            if entry is not None:
+                return entry[1]
+        if self._cache is None:
+            return self._read(path)
+        stamp = None
+        settled = True
+        if self.validate:
+            # look up the stamp before reading, so that a change made during
+            # the read shows up as a different stamp next time
+            now = int(time.time())
+            try:
+                info = self.hdfs.info(path)
+            except FileNotFoundError:
+                self._cache.discard(path)
+                raise KeyError(path)
+            stamp = (info['last_mod'], info['size'])
+            # modification times are in seconds: a rewrite of the same size
+            # later within the second of last_mod would keep the stamp
+            settled = info['last_mod'] < now
+        entry = self._cache.get(path)
+        if entry is not None and entry[1] == stamp:
+            return entry[0]
+        if entry is not None:
+            with self._lock:
+                self._stale += 1
+        # a write of path meanwhile withdraws the token, so that the value
+        # read, which may be the old one, is not cached
+        token = object()
+        with self._lock:
+            self._loading[path] = token
+        try:
+            value = self._read(path)
+        except Exception:
+            with self._lock:
+                if self._loading.get(path) is token:
+                    del self._loading[path]
+            raise
+        with self._lock:
+            if self._loading.get(path) is token:
+                del self._loading[path]
+                if settled:
+                    self._cache.put(path, (value, stamp))
+                else:
+                    self._cache.discard(path)
+        return value
+
+    def _read(self, path):
+        """ Contents of the file at path, or KeyError
+
+        Costs one request to the name-node: the size is not looked up. Other
+        errors than the file being missing are raised as they are.
+        """
+        try:
+            with self.hdfs.open(path, 'rb') as f:
+                data = f.readall()
+        except (IOError, OSError) as e:
+            if self.hdfs.isfile(path):
+                raise e
+            raise KeyError(path)
+        return decompress(data)
+
+    def _set(self, path, value):
+        # uncompressed too, as raw values may look compressed
+        value = compress(value, self.compression)
+        parent = posixpath.dirname(path)
+        if parent != self.root and parent not in self._known_dirs:
+            self.hdfs.mkdir(parent)
+            self._known_dirs.add(parent)
+        # invalidated before, so that reads made meanwhile are not cached,
+        # and after, for reads cached before the write began
+        self._invalidate(path)
+        try:
+            with self.hdfs.open(path, 'wb') as f:
+                f.write(value)
+        finally:
+            self._invalidate(path)
+        if self._keyset is not None:
+            self._keyset.add(self._path_to_key(path))
+
+    def _del(self, path, missing_ok=False):
+        self._invalidate(path)
         try:
-            with self.hdfs.open(key, 'rb') as f:
-                result = f.read()
+            self.hdfs.rm(path)
         except (IOError, OSError):
-            raise KeyError(key)
-        return result
+            if missing_ok and not self.hdfs.exists(path):
+                self._discard_key(path)
+                return
+            raise
+        finally:
+            self._invalidate(path)
+        self._discard_key(path)
+
+    def _enqueue(self, path, value):
+        """ Queue a write for a background thread
+
+        All writes of a path go through the same queue, so they happen in
+        the order they were made.
+        """
+        value = ensure_bytes(value)
+        with self._lock:
+            if self._queues is None:
+                limit = (DEFAULT_WRITE_BEHIND if self.write_behind is True
+                         else self.write_behind)
+                size = max(1, limit // self.workers)
+                self._queues = [Queue(size) for _ in range(self.workers)]
+                self._threads = [None] * self.workers
+            self._seq += 1
+            seq = self._seq
+            self._pending[path] = (seq, value)
+        i = hash(path) % len(self._queues)
+        self._queues[i].put((path, seq, value))
+        with self._lock:
+            if self._threads[i] is None:
+                t = threading.Thread(target=self._drain, args=(i,))
+                t.daemon = True
+                t.start()
+                self._threads[i] = t
+
+    def _drain(self, i):
+        """ Write the values of queue i, exiting once it stays empty """
+        queue = self._queues[i]
+        while True:
+            try:
+                path, seq, value = queue.get(timeout=1)
+            except Empty:
+                with self._lock:
+                    # _enqueue starts a new thread after its put, if needed
+                    if queue.empty():
+                        self._threads[i] = None
+                        return
+                continue
+            try:
+                self._set(path, value)
+            except Exception as e:
+                with self._lock:
+                    self._errors.append(e)
+            finally:
+                with self._lock:
+                    if self._pending.get(path, (None,))[0] == seq:
+                        del self._pending[path]
+                queue.task_done()
+
+    def _wait(self):
+        """ Wait for the queued writes to finish """
+        for queue in self._queues or []:
+            queue.join()
+
+    def flush(self):
+        """ Wait for queued writes to finish; raise the first error, if any
+
+        Does nothing unless ``write_behind`` is set.
+        """
+        self._wait()
+        with self._lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise errors[0]
+
+    def _discard_key(self, path):
+        if self._keyset is not None:
+            self._keyset.discard(self._path_to_key(path))
+
+    def _path_to_key(self, path):
+        # inverse of _key_to_str, as yielded by keys()
+        key = path[len(self.root) + 1:]
+        return key.split('/', 1)[1] if self.shards else key
+
+    def _invalidate(self, path):
+        if self._cache is not None:
+            with self._lock:
+                self._loading.pop(path, None)
+                self._cache.discard(path)
+
+    def __getitem__(self, key):
+        return self._get(self._key_to_str(key))
 
     def __setitem__(self, key, value):
-        key = self._key_to_str(key)
-        with self.hdfs.open(key, 'wb') as f:
-            f.write(value)
+        if self.write_behind:
+            self._enqueue(self._key_to_str(key), value)
+        else:
+            self._set(self._key_to_str(key), value)
+
+    def getitems(self, keys):
+        """ Fetch the values of many keys concurrently
+
+        Returns
+        -------
+        dict of key to value; keys which are not present are left out, and
+        any other error reading a value is raised.
+        """
+        keys = list(keys)
+        paths = [self._key_to_str(k) for k in keys]
+        values = threaded_map(self._get, paths, self.workers,
+                              return_exceptions=True)
+        out = {}
+        for key, value in zip(keys, values):
+            if isinstance(value, KeyError):
+                continue
+            elif isinstance(value, Exception):
+                raise value
+            out[key] = value
+        return out
+
+    def setitems(self, mapping):
+        """ Store many key/value pairs concurrently
+
+        All writes are attempted; the first error, if any, is raised at the
+        end. With ``write_behind``, the pairs are queued instead, and errors
+        are raised by ``flush``.
+        """
+        items = list(mapping.items() if hasattr(mapping, 'items')
+                     else mapping)
+        paths = [(self._key_to_str(k), v) for k, v in items]
+        if self.write_behind:
+            for path, value in paths:
+                self._enqueue(path, value)
+            return
+        self._raise_first(threaded_map(lambda pv: self._set(*pv), paths,
+                                       self.workers, return_exceptions=True))
+
+    def delitems(self, keys):
+        """ Remove many keys concurrently; keys not present are ignored """
+        paths = [self._key_to_str(k) for k in keys]
+        self._wait()
+        self._raise_first(threaded_map(lambda p: self._del(p, True), paths,
+                                       self.workers, return_exceptions=True))
+
+    @staticmethod
+    def _raise_first(results):
+        for res in results:
+            if isinstance(res, Exception):
+                raise res
+
+    def _list_keys(self):
+        """ Keys below root, listing each level of the tree concurrently """
+        maxdepth = 2 if self.shards else None
+        for entry in self.hdfs._walk_entries(self.root, self.workers,
+                                             maxdepth=maxdepth):
+            if entry.is_dir():
+                continue
+            key = posixpath.relpath(entry.path, self.root)
+            if key == SHARDS_FILE:
+                continue
+            if self.shards and '/' in key:
+                key = key.split('/', 1)[1]
+            yield key
+
+    def _snapshot(self):
+        keyset = self._keyset
+        if keyset is None:
+            keyset = self.refresh()
+        return keyset
+
+    def refresh(self):
+        """ List the keys below root again into the snapshot
+
+        Returns the set of keys; used automatically the first time the
+        snapshot is needed.
+        """
+        keyset = set(self._list_keys())
+        if self.snapshot:
+            self._keyset = keyset
+        return keyset
+
+    def listdir(self, prefix=''):
+        """ Sorted names directly below prefix, for hierarchical keys
+
+        Keys with more path components below prefix contribute their next
+        component, like a directory listing.
+
+        Examples
+        --------
+        >>> sorted(mw)  # doctest: +SKIP
+        ['a/0', 'a/1', 'b/x/0', 'c']
+        >>> mw.listdir()  # doctest: +SKIP
+        ['a', 'b', 'c']
+        >>> mw.listdir('b')  # doctest: +SKIP
+        ['x']
+        """
+        prefix = prefix.strip('/')
+        if self.shards and not self.snapshot:
+            # keys of a sharded map have a single component
+            return [] if prefix else sorted(self._list_keys())
+        if self.snapshot:
+            start = prefix + '/' if prefix else ''
+            return sorted(set(k[len(start):].split('/', 1)[0]
+                              for k in self._snapshot() if k.startswith(start)
+                              and len(k) > len(start)))
+        path = posixpath.join(self.root, prefix) if prefix else self.root
+        try:
+            return sorted(entry.name for entry in self.hdfs.scandir(path))
+        except FileNotFoundError:
+            return []
 
     def keys(self):
-        for dirname, _, files in self.hdfs.walk(self.root):
-            if dirname == self.root:
-                base = ''
-            else:
-                base = posixpath.relpath(dirname, self.root)
-            for fn in files:
-                yield posixpath.join(base, fn)
+        self._wait()
+        if self.snapshot:
+            return iter(list(self._snapshot()))
+        return self._list_keys()
 
     def __iter__(self):
         return self.keys()
 
     def __delitem__(self, key):
-        self.hdfs.rm(self._key_to_str(key))
+        self._wait()
+        self._del(self._key_to_str(key))
 
     def __contains__(self, key):
-        return self.hdfs.exists(self._key_to_str(key))
+        path = self._key_to_str(key)
+        if path in self._pending:
+            return True
+        if self.snapshot:
+            return self._path_to_key(path) in self._snapshot()
+        return self.hdfs.isfile(path)
 
     def __len__(self):
+        self._wait()
+        if self.snapshot:
+            return len(self._snapshot())
         return sum(1 for _ in self.keys())
+
+
+def _parse_pack_index(raw):
+    """ Records (key, offset, length) of a pack index file
+
+    A truncated final record, as left by an interrupted write, is ignored.
+    """
+    pos = 0
+    while pos + _PACK_RECORD.size <= len(raw):
+        offset, length, nkey = _PACK_RECORD.unpack_from(raw, pos)
+        pos += _PACK_RECORD.size
+        if pos + nkey > len(raw):
+            break
+        yield raw[pos:pos + nkey].decode('utf-8'), offset, length
+        pos += nkey
+
+
+class HDFSPackedMap(MutableMapping):
+    """Mutable mapping which packs many small values into a few large files
+
+    ``HDFSMap`` stores each value in its own file, which costs name-node
+    memory and an open for every value. Here, values are buffered in memory
+    and written out together as a numbered pack file ``<n>.pack`` below root,
+    next to an index file ``<n>.idx`` giving the offset and length in the
+    pack of each key, or recording that the key was deleted. The index files
+    are read (concurrently) when the map is created, and values are read
+    from the packs by position.
+
+    Keys must be strings. Writes are held in memory until ``pack_bytes`` of them have accumulated
+    or ``flush()`` is called, as on leaving a ``with`` block, and other
+    readers only see them after their next ``refresh()``. Overwritten and
+    deleted values keep taking space in their packs until ``compact()``.
+    Only one process should write to a given root at a time. Pickling the
+    map flushes it first.
+
+    Parameters
+    ----------
+    hdfs : HDFileSystem
+    root : string
+        directory to contain the pack and index files (created if it
+        doesn't exist)
+    pack_bytes : int (=128MB)
+        amount of buffered values at which a pack is written
+    workers : int
+        number of packs read concurrently in ``getitems``, and of index
+        files in ``refresh``
+
+    Examples
+    --------
+    >>> with HDFSPackedMap(hdfs, '/data/chunks') as m:  # doctest: +SKIP
+    ...     for i, chunk in enumerate(chunks):
+    ...         m['chunk-%d' % i] = chunk
+    >>> m.getitems(['chunk-1', 'chunk-2'])  # doctest: +SKIP
+    {'chunk-1': b'...', 'chunk-2': b'...'}
+    >>> m.pack_info()  # doctest: +SKIP
+    {'packs': 1, 'bytes': 104857600, 'live_bytes': 104857600, 'pending': 0}
+    """
+
+    def __init__(self, hdfs, root, pack_bytes=2 ** 27,
+                 workers=DEFAULT_WORKERS):
+        self.hdfs = hdfs
+        self.root = root
+        self.pack_bytes = pack_bytes
+        self.workers = workers
+        self._reset()
+        if not hdfs.exists(root):
+            hdfs.mkdir(root)
+        self.refresh()
+
+    def __getstate__(self):
+        # buffered values are written out, so that the copy can read them
+        self.flush()
+        return {'hdfs': self.hdfs, 'root': self.root,
+                'pack_bytes': self.pack_bytes, 'workers': self.workers}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+        self.refresh()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
+
+    def _reset(self):
+        self._lock = threading.RLock()
+        self._index = {}    # key -> (pack, offset, length)
+        self._packs = {}    # pack -> [size, live bytes]
+        self._indexes = set()  # numbers of the index files
+        self._pending = {}  # key -> value, or None if deleted
+        self._pending_bytes = 0
+        self._next = 0
+
+    def _path(self, n, ext):
+        return posixpath.join(self.root, '%08d.%s' % (n, ext))
+
+    def _key(self, key):
+        # stored as text in the index, so other types would not come back
+        # from iteration as they were given
+        if not isinstance(key, (str, unicode)):
+            raise TypeError('Keys of a packed map must be strings, not %s'
+                            % type(key).__name__)
+        return key
+
+    def refresh(self):
+        """ Read the index files again, to see packs written by others
+
+        Values not yet written are flushed first.
+        """
+        with self._lock:
+            self.flush()
+            found = [_PACK_FILE.match(e.name)
+                     for e in self.hdfs.scandir(self.root)]
+            found = [(int(m.group(1)), m.group(2)) for m in found if m]
+            indexes = sorted(n for n, ext in found if ext == 'idx')
+            raw = threaded_map(lambda n: self._read_file(self._path(n, 'idx')),
+                               indexes, self.workers)
+            self._index, self._packs = {}, {}
+            self._indexes = set(indexes)
+            for n, data in zip(indexes, raw):
+                for key, offset, length in _parse_pack_index(data):
+                    self._apply(n, key, offset, length)
+            self._next = max([n for n, _ in found] or [-1]) + 1
+
+    def _read_file(self, path):
+        with self.hdfs.open(path, 'rb') as f:
+            return f.readall()
+
+    def _apply(self, n, key, offset, length):
+        """ Record in memory the location of key, or its deletion """
+        old = self._index.pop(key, None)
+        if old is not None:
+            self._packs[old[0]][1] -= old[2]
+        if length >= 0:
+            pack = self._packs.setdefault(n, [0, 0])
+            self._index[key] = (n, offset, length)
+            pack[0] = max(pack[0], offset + length)
+            pack[1] += length
+
+    def flush(self):
+        """ Write the values (and deletions) buffered so far as a new pack """
+        with self._lock:
+            if not self._pending:
+                return
+            n = self._next
+            self._next += 1
+            self._write_pack(n, list(self._pending.items()))
+            self._pending = {}
+            self._pending_bytes = 0
+
+    def _write_pack(self, n, items):
+        """ Write pack n holding the (key, value or None) items
+
+        The index is written after the pack, so that a pack is never
+        referenced before it is complete. With deletions only, there is no
+        pack, just the index.
+        """
+        records, values, offset = [], [], 0
+        for key, value in items:
+            if value is None:
+                records.append((key, 0, -1))
+            else:
+                records.append((key, offset, len(value)))
+                values.append(value)
+                offset += len(value)
+        if values:
+            with self.hdfs.open(self._path(n, 'pack'), 'wb') as f:
+                f.write(b''.join(values))
+        index = []
+        for key, offset, length in records:
+            bkey = key.encode('utf-8')
+            index.append(_PACK_RECORD.pack(offset, length, len(bkey)) + bkey)
+        with self.hdfs.open(self._path(n, 'idx'), 'wb') as f:
+            f.write(b''.join(index))
+        self._indexes.add(n)
+        for record in records:
+            self._apply(n, *record)
+
+    def _read_ranges(self, n, size, ranges):
+        """ Values at the (offset, length) ranges of pack n, in order
+
+        The pack is opened once, and nearby ranges are fetched together.
+        """
+        order = sorted(range(len(ranges)), key=lambda i: ranges[i][0])
+        out = [None] * len(ranges)
+        with self.hdfs.open(self._path(n, 'pack'), 'rb', size=size) as f:
+            i = 0
+            while i < len(order):
+                start, length = ranges[order[i]]
+                end = start + length
+                j = i + 1
+                while j < len(order) and ranges[order[j]][0] - end <= _PACK_GAP:
+                    end = max(end, sum(ranges[order[j]]))
+                    j += 1
+                f.seek(start)
+                data = f.read(end - start)
+                for k in order[i:j]:
+                    offset, length = ranges[k]
+                    out[k] = data[offset - start:offset - start + length]
+                i = j
+        return out
+
+    def _lookup(self, key):
+        """ Pending value, or (pack, pack size, offset, length); KeyError """
+        if key in self._pending:
+            value = self._pending[key]
+            if value is None:
+                raise KeyError(key)
+            return value
+        n, offset, length = self._index[key]
+        return n, self._packs[n][0], offset, length
+
+    def __getitem__(self, key):
+        with self._lock:
+            loc = self._lookup(self._key(key))
+        if isinstance(loc, bytes):
+            return loc
+        n, size, offset, length = loc
+        return self._read_ranges(n, size, [(offset, length)])[0]
+
+    def getitems(self, keys):
+        """ Fetch the values of many keys, reading the packs concurrently
+
+        Returns
+        -------
+        dict of key to value; keys which are not present are left out, and
+        any other error reading a value is raised.
+        """
+        out, groups = {}, {}
+        with self._lock:
+            for key in keys:
+                try:
+                    loc = self._lookup(self._key(key))
+                except KeyError:
+                    continue
+                if isinstance(loc, bytes):
+                    out[key] = loc
+                else:
+                    groups.setdefault(loc[:2], []).append((key, loc[2:]))
+        groups = list(groups.items())
+        values = threaded_map(
+            lambda g: self._read_ranges(g[0][0], g[0][1], [r for _, r in g[1]]),
+            groups, self.workers)
+        for (_, group), vals in zip(groups, values):
+            out.update(zip([k for k, _ in group], vals))
+        return out
+
+    def __setitem__(self, key, value):
+        self.setitems([(key, value)])
+
+    def setitems(self, mapping):
+        """ Store many key/value pairs, writing packs as the buffer fills """
+        items = mapping.items() if hasattr(mapping, 'items') else mapping
+        with self._lock:
+            for key, value in items:
+                key, value = self._key(key), ensure_bytes(value)
+                old = self._pending.get(key)
+                self._pending_bytes += len(value) - len(old or b'')
+                self._pending[key] = value
+                if self._pending_bytes >= self.pack_bytes:
+                    self.flush()
+
+    def __delitem__(self, key):
+        key = self._key(key)
+        with self._lock:
+            if not self._contains(key):
+                raise KeyError(key)
+            self._discard(key)
+
+    def delitems(self, keys):
+        """ Remove many keys; keys not present are ignored """
+        with self._lock:
+            for key in keys:
+                self._discard(self._key(key))
+
+    def _discard(self, key):
+        old = self._pending.pop(key, None)
+        self._pending_bytes -= len(old or b'')
+        if key in self._index:
+            self._pending[key] = None
+
+    def _contains(self, key):
+        if key in self._pending:
+            return self._pending[key] is not None
+        return key in self._index
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._contains(self._key(key))
+
+    def _keys(self):
+        with self._lock:
+            keys = set(self._index)
+            for key, value in self._pending.items():
+                if value is None:
+                    keys.discard(key)
+                else:
+                    keys.add(key)
+        return keys
+
+    def keys(self):
+        return iter(self._keys())
+
+    def __iter__(self):
+        return self.keys()
+
+    def __len__(self):
+        return len(self._keys())
+
+    def clear(self):
+        """ Remove all packs and indexes - empties out mapping """
+        with self._lock:
+            self.hdfs.rm(self.root, recursive=True)
+            self.hdfs.mkdir(self.root)
+            lock = self._lock
+            self._reset()
+            self._lock = lock
+
+    def pack_info(self):
+        """ Number and total size of the packs, and the bytes still in use
+
+        ``bytes - live_bytes`` is the space that ``compact`` would reclaim;
+        ``pending`` counts the bytes buffered in memory.
+        """
+        with self._lock:
+            return {'packs': len(self._packs),
+                    'bytes': sum(p[0] for p in self._packs.values()),
+                    'live_bytes': sum(p[1] for p in self._packs.values()),
+                    'pending': self._pending_bytes}
+
+    def compact(self):
+        """ Rewrite the values in use into new packs and remove the old ones
+
+        The old packs are read one at a time, and removed only once all the
+        new ones are written, so an interrupted compaction loses nothing.
+        Reads from other threads or processes must not run at the same time.
+
+        Returns
+        -------
+        Number of bytes reclaimed.
+        """
+        with self._lock:
+            self.flush()
+            old = sorted(self._packs)
+            old_indexes = sorted(self._indexes)
+            before = sum(p[0] for p in self._packs.values())
+            live = {}
+            for key, (n, offset, length) in self._index.items():
+                live.setdefault(n, []).append((key, (offset, length)))
+            batch, nbytes = [], 0
+            for n in sorted(live):
+                group = live[n]
+                values = self._read_ranges(n, self._packs[n][0],
+                                           [r for _, r in group])
+                for (key, _), value in zip(group, values):
+                    batch.append((key, value))
+                    nbytes += len(value)
+                    if nbytes >= self.pack_bytes:
+                        self._write_pack(self._next, batch)
+                        self._next += 1
+                        batch, nbytes = [], 0
+            if batch:
+                self._write_pack(self._next, batch)
+                self._next += 1
+            # packs first; then indexes in order, so that no deletion is
+            # forgotten while an older index that it overrides remains
+            errors = self.hdfs.rm_many([self._path(n, 'pack') for n in old],
+                                       recursive=False, workers=self.workers)
+            for err in errors.values():
+                if err is not None and not isinstance(err, FileNotFoundError):
+                    raise err
+            for n in old_indexes:
+                self.hdfs.rm(self._path(n, 'idx'), recursive=False)
+                self._indexes.discard(n)
+            for n in old:
+                del self._packs[n]
+            return before - sum(p[0] for p in self._packs.values())
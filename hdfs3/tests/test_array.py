@@ -0,0 +1,68 @@
+import pytest
+
+from hdfs3.tests.test_hdfs3 import hdfs
+
+np = pytest.importorskip('numpy')
+hdfs = hdfs  # squash flake8 errors
+
+fn = '/tmp/test/array.bin'
+keys = [(), 3, -1, (slice(None), 2), (slice(1, 4), slice(None, None, 3)),
+        (Ellipsis, slice(None, None, -2)), (slice(None, None, -1), 0),
+        (2, slice(3, 1)), (slice(5, 6), Ellipsis), (1, 2)]
+
+
+@pytest.mark.parametrize('order', ['C', 'F'])
+@pytest.mark.parametrize('cache_bytes', [0, 100])
+def test_open_array(hdfs, order, cache_bytes):
+    x = np.arange(7 * 11, dtype='>i4').reshape((7, 11), order=order)
+    with hdfs.open(fn, 'wb', replication=1) as f:
+        f.write(b'header')
+        f.write(x.tobytes(order=order))
+
+    arr = hdfs.open_array(fn, '>i4', (7, 11), offset=6, order=order,
+                          chunk_bytes=16, cache_bytes=cache_bytes, workers=3)
+    assert (len(arr), arr.ndim, arr.size, arr.nbytes) == (7, 2, 77, 308)
+    for key in keys:
+        assert np.array_equal(arr[key], x[key])
+    assert np.array_equal(np.asarray(arr), x)
+
+    if cache_bytes:
+        arr[0]
+        hits = arr.cache_info()['hits']
+        out = arr[0]
+        assert arr.cache_info()['hits'] > hits
+        out[:] = -1  # results do not share memory with the cache
+        assert np.array_equal(arr[0], x[0])
+        assert arr.cache_info()['size'] <= 100
+    else:
+        assert arr.cache_info() is None
+
+    with pytest.raises(IndexError):
+        arr[7]
+    with pytest.raises(IndexError):
+        arr[0, 0, 0]
+    with pytest.raises(TypeError):
+        arr[[0, 1]]
+    with pytest.raises(ValueError):
+        hdfs.open_array(fn, '>i4', (7, 12), offset=6)
+
+
+@pytest.mark.parametrize('cache_bytes', [0, 2 ** 19])
+def test_strided_read_memory(hdfs, cache_bytes):
+    tracemalloc = pytest.importorskip('tracemalloc')
+    x = np.arange(2000 * 1000, dtype='f8').reshape((2000, 1000))
+    with hdfs.open(fn, 'wb', replication=1) as f:
+        f.write(x.tobytes())
+    arr = hdfs.open_array(fn, 'f8', x.shape, chunk_bytes=2 ** 16,
+                          cache_bytes=cache_bytes, workers=4)
+
+    # a column of 16kB is spread over the whole 16MB file: only a few
+    # chunks are held at a time, besides the cache
+    tracemalloc.start()
+    try:
+        out = arr[:, 0]
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert np.array_equal(out, x[:, 0])
+    assert peak < cache_bytes + 2 ** 20
@@ -0,0 +1,33 @@
+import pytest
+
+from hdfs3.compression import MAGIC, check_codec, compress, decompress
+
+
+@pytest.mark.parametrize('codec', ['gzip', 'zstd', 'lz4'])
+def test_roundtrip(codec):
+    try:
+        check_codec(codec)
+    except ImportError:
+        pytest.skip('no library for %s' % codec)
+    data = b'0123456789' * 1000
+    out = compress(data, codec)
+    assert out.startswith(MAGIC)
+    assert len(out) < len(data)
+    assert decompress(out) == data
+    assert decompress(compress(b'', codec)) == b''
+    assert decompress(compress(bytearray(b'abc'), codec)) == b'abc'
+
+
+def test_uncompressed_and_unknown():
+    assert decompress(b'') == b''
+    assert decompress(b'raw value') == b'raw value'
+    with pytest.raises(ValueError):
+        check_codec('rar')
+    with pytest.raises(ValueError):
+        decompress(MAGIC + b'\xff' + b'data')
+
+
+def test_raw_values_like_compressed():
+    assert compress(b'raw value', None) == b'raw value'
+    for data in [MAGIC, MAGIC + b'\xff' + b'data', MAGIC + b'\x01']:
+        assert decompress(compress(data, None)) == data
@@ -3,7 +3,9 @@ import os
 import pytest
 import shutil
 import tempfile
-from hdfs3.conf import conf, guess_config, conf_defaults, hdfs_conf
+from hdfs3.conf import (conf, guess_config, conf_defaults, hdfs_conf,
+                        conf_to_dict, ha_namenodes, set_active_namenode,
+                        conf_fingerprint)
 from hdfs3 import HDFileSystem
 
 
@@ -113,6 +115,111 @@ def test_token_and_ticket_cache_in_same_time():
     assert msg in str(ctx.value)
 
 
+def test_pickle_sends_overrides_only(simple_conf_file, monkeypatch):
+    import pickle
+    hdfs_conf(os.path.dirname(simple_conf_file))
+    fingerprint = conf_fingerprint(conf)
+    assert conf_fingerprint(dict(conf)) == fingerprint
+    hdfs = HDFileSystem(connect=False, pars={'dfs.replication': '3'},
+                        user='someone')
+    del hdfs.conf['dfs.permissions']
+
+    state = hdfs.__getstate__()
+    _, overrides, removed = state['conf']
+    assert overrides == {'dfs.replication': '3', 'user': 'someone'}
+    assert removed == ['dfs.permissions']
+
+    hdfs2 = pickle.loads(pickle.dumps(hdfs))
+    assert hdfs2.conf == hdfs.conf
+
+    pickled = pickle.dumps(hdfs)
+    monkeypatch.setitem(conf, 'dfs.blocksize', '1')
+    assert conf_fingerprint(conf) != fingerprint
+    with pytest.warns(RuntimeWarning):
+        hdfs3 = pickle.loads(pickled)
+    assert hdfs3.conf['dfs.blocksize'] == '1'
+    assert hdfs3.conf['user'] == 'someone'
+
+
+def test_multiline_properties(tmpdir):
+    fn = str(tmpdir.join('hdfs-site.xml'))
+    with open(fn, 'w') as f:
+        f.write("""<?xml version="1.0"?>
+<configuration>
+  <property>
+    <name>
+      dfs.replication
+    </name>
+    <value>2</value>
+    <final>true</final>
+  </property>
+  <property><name>a</name><value>1</value></property><property>
+    <name>b</name><value>2</value></property>
+  <!-- <property><name>c</name><value>3</value></property> -->
+</configuration>
+""")
+    assert conf_to_dict(fn) == {'dfs.replication': '2', 'a': '1', 'b': '2'}
+
+    # cached until the file changes
+    out = conf_to_dict(fn)
+    out['a'] = 'changed'
+    assert conf_to_dict(fn)['a'] == '1'
+    with open(fn, 'w') as f:
+        f.write("<configuration><property><name>a</name><value>10</value>"
+                "</property></configuration>")
+    os.utime(fn, (0, 0))
+    assert conf_to_dict(fn) == {'a': '10'}
+
+
+def test_ha_conf(tmpdir):
+    with open(str(tmpdir.join('core-site.xml')), 'w') as f:
+        f.write(ha_core_conf)
+    with open(str(tmpdir.join('hdfs-site.xml')), 'w') as f:
+        f.write(ha_hdfs_conf)
+    hdfs_conf(str(tmpdir))
+    # the nameservice of fs.defaultFS is used, not the first one listed
+    assert conf['host'] == 'ns2'
+    assert conf['port'] is None
+    assert ha_namenodes(conf, 'ns2') == [('nn1', 'first.host:8020'),
+                                         ('nn2', 'second.host:8020')]
+    assert ha_namenodes(conf, 'ns3') == []
+
+    set_active_namenode(conf, 'ns2', 'nn2')
+    assert ha_namenodes(conf, 'ns2')[0] == ('nn2', 'second.host:8020')
+    other = dict(conf)
+    other['dfs.namenode.rpc-address.ns2.nn2'] = 'other.host:8020'
+    assert ha_namenodes(other, 'ns2')[0][0] == 'nn1'
+
+
+ha_core_conf = """<configuration>
+  <property>
+    <name>fs.defaultFS</name>
+    <value>hdfs://ns2</value>
+  </property>
+</configuration>
+"""
+
+ha_hdfs_conf = """<configuration>
+  <property>
+    <name>dfs.nameservices</name>
+    <value>ns1,ns2</value>
+  </property>
+  <property>
+    <name>dfs.ha.namenodes.ns2</name>
+    <value>nn1, nn2</value>
+  </property>
+  <property>
+    <name>dfs.namenode.rpc-address.ns2.nn1</name>
+    <value>first.host:8020</value>
+  </property>
+  <property>
+    <name>dfs.namenode.rpc-address.ns2.nn2</name>
+    <value>second.host:8020</value>
+  </property>
+</configuration>
+"""
+
+
 example_conf = """
 <?xml version="1.0"?>
 <?xml-stylesheet type="text/xsl" href="configuration.xsl"?>
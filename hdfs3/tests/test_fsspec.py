@@ -0,0 +1,73 @@
+import pytest
+
+fsspec = pytest.importorskip('fsspec')
+
+from hdfs3._fsspec import FsspecHDFileSystem  # noqa
+from hdfs3.tests.test_hdfs3 import hdfs, a, b  # noqa: E402
+hdfs = hdfs  # squash flake8 errors
+
+
+@pytest.fixture
+def fs(hdfs):
+    return FsspecHDFileSystem(hdfs=hdfs)
+
+
+def test_url(hdfs):
+    fs = fsspec.filesystem('hdfs3', hdfs=hdfs)
+    assert isinstance(fs, FsspecHDFileSystem)
+    assert fs._strip_protocol('hdfs3://host:8020/tmp/test/') == '/tmp/test'
+    assert fs._strip_protocol('hdfs://host/') == '/'
+    assert fs._get_kwargs_from_urls('hdfs3://host:8020/x') == {
+        'host': 'host', 'port': 8020}
+
+
+def test_metadata(fs):
+    fs.pipe_file(a, b'0123456789')
+    assert fs.exists(a)
+    assert fs.info(a)['type'] == 'file'
+    assert fs.info(a)['size'] == 10
+    assert fs.ls('/tmp/test', detail=False) == [a]
+    assert fs.ls(a)[0]['name'] == a
+    assert fs.ukey(a) == fs.ukey(a)
+    fs.mkdir('/tmp/test/x/y')
+    assert fs.isdir('/tmp/test/x/y')
+    assert set(fs.find('/tmp/test')) == {a}
+    fs.mv(a, b)
+    assert not fs.exists(a)
+    fs.rm('/tmp/test/x', recursive=True)
+    assert fs.ls('/tmp/test', detail=False) == [b]
+
+
+def test_cat(fs):
+    fs.pipe_file(a, b'0123456789')
+    fs.pipe_file(b, b'abcdefghij')
+    assert fs.cat_file(a) == b'0123456789'
+    assert fs.cat_file(a, 2, 5) == b'234'
+    assert fs.cat_file(a, -3) == b'789'
+    assert fs.cat_file(a, 8, 100) == b'89'
+    assert fs.cat([a, b]) == {a: b'0123456789', b: b'abcdefghij'}
+    assert fs.cat('/tmp/test/*') == {a: b'0123456789', b: b'abcdefghij'}
+
+    out = fs.cat_ranges([a, b, a, '/tmp/test/missing'], [0, -2, 5, 0],
+                        [2, None, 6, 1])
+    assert out[:3] == [b'01', b'ij', b'5']
+    assert isinstance(out[3], Exception)
+    with pytest.raises(Exception):
+        fs.cat_ranges(['/tmp/test/missing'], 0, 1, on_error='raise')
+
+
+def test_files(fs):
+    data = b'0123456789' * 1000
+    with fs.open(a, 'wb', block_size=1000) as f:
+        f.write(data[:5000])
+        f.write(data[5000:])
+    with fs.open(a, 'ab') as f:
+        f.write(b'end')
+    with fs.open(a, 'rb', block_size=100) as f:
+        assert f.size == 10003
+        f.seek(5000)
+        assert f.read(10) == data[5000:5010]
+        f.seek(-3, 2)
+        assert f.read() == b'end'
+    with pytest.raises(FileExistsError):
+        fs.open(a, 'xb').close()
@@ -4,8 +4,10 @@ import io
 import multiprocessing
 import os
 import posixpath
+import subprocess
 import tempfile
 import sys
+import time
 from random import randint
 try:
     from queue import Queue
@@ -19,7 +21,8 @@ import pytest
 from hdfs3 import HDFileSystem, lib
 from hdfs3.utils import ensure_bytes, ensure_string
 from hdfs3.conf import conf_to_dict
-from hdfs3.compatibility import bytes, unicode, ConnectionError
+from hdfs3.compatibility import (bytes, unicode, ConnectionError,
+                                 FileNotFoundError)
 from hdfs3.utils import tmpfile
 
 
@@ -88,6 +91,67 @@ def test_ls_touch(hdfs):
     assert set(L) == set([a, b])
 
 
+def test_ls_arrays(hdfs):
+    pytest.importorskip('numpy')
+    hdfs.mkdir(c)
+    with hdfs.open(a, 'wb', replication=1) as f:
+        f.write(b'123')
+    hdfs.touch(b)
+
+    expected = sorted(hdfs.ls('/tmp/test', True), key=lambda d: d['name'])
+    cols = hdfs.ls_arrays('/tmp/test')
+    order = sorted(range(len(cols['name'])), key=lambda i: cols['name'][i])
+    for i, info in zip(order, expected):
+        for field in ['name', 'kind', 'size', 'owner', 'group',
+                      'replication', 'permissions', 'last_mod']:
+            assert cols[field][i] == info[field]
+
+    pytest.importorskip('pyarrow')
+    table = hdfs.ls_arrays('/tmp/test', format='arrow')
+    assert table.num_rows == 3
+    assert set(table.column('name').to_pylist()) == {a, b, c}
+
+    with pytest.raises(ValueError):
+        hdfs.ls_arrays('/tmp/test', format='pandas')
+
+
+def test_scandir(hdfs):
+    hdfs.mkdir(c)
+    with hdfs.open(a, 'wb', replication=1) as f:
+        f.write(b'123')
+
+    entries = {e.path: e for e in hdfs.scandir('/tmp/test')}
+    assert set(entries) == {a, c}
+    assert entries[a].name == 'a'
+    assert entries[a].is_file() and not entries[a].is_dir()
+    assert entries[c].is_dir()
+    assert entries[a].size == 3
+    assert entries[a].to_dict() == hdfs.info(a)
+
+    # stopping early releases the listing without error
+    it = hdfs.scandir('/tmp/test')
+    next(it)
+    it.close()
+
+    with pytest.raises(IOError):
+        list(hdfs.scandir('/tmp/test/nonexistent'))
+
+
+def test_readall(hdfs):
+    data = b'0123456789' * 20000
+    with hdfs.open(a, 'wb', replication=1) as f:
+        f.write(data)
+
+    with hdfs.open(a, 'rb') as f:
+        assert f.readall() == data
+        assert f.readall() == b''
+    with hdfs.open(a, 'rb', size=len(data)) as f:
+        f.seek(10)
+        assert f.readall() == data[10:]
+    with hdfs.open(a, 'rb') as f:
+        assert f.size == len(data)
+
+
 def test_rm(hdfs):
     assert not hdfs.exists(a)
     hdfs.touch(a)
@@ -150,6 +214,46 @@ def test_seek(hdfs):
         for i in range(4):
             assert f.seek(i) == i
 
+    # the same bounds whether or not the size is known
+    for size in [None, 3]:
+        with hdfs.open(a, size=size) as f:
+            with pytest.raises(ValueError):
+                f.seek(4)
+            assert f.seek(3) == 3
+            assert f.read(1) == b''
+
+
+def test_read_lengths(hdfs):
+    with hdfs.open(a, 'wb', replication=1) as f:
+        f.write(b'0123456789')
+
+    for size in [None, 10]:
+        with hdfs.open(a, size=size) as f:
+            assert f.read(100) == b'0123456789'
+            assert f.read(100) == b''
+            f.seek(2)
+            assert f.read(0) == b''
+            assert f.read(-1) == b'23456789'
+            f.seek(5)
+            assert f.read(-5) == b'56789'
+            f.seek(8)
+            assert f.read(None) == b'89'
+            f.seek(8)
+            assert f.tell() == 8
+            assert bytes(f.read(100, out_buffer=True)) == b'89'
+
+
+def test_read_into_numpy_array(hdfs):
+    np = pytest.importorskip('numpy')
+    with hdfs.open(a, 'wb', replication=1) as f:
+        f.write(b'0123456789')
+
+    # before the size of the file is known
+    with hdfs.open(a) as f:
+        out = np.zeros(5, dtype='u1')
+        assert bytes(f.read(5, out_buffer=out)) == b'01234'
+        assert out.tobytes() == b'01234'
+
 
 def test_libload():
     assert lib.hdfsGetLastError()
@@ -157,6 +261,17 @@ def test_libload():
     assert lib.hdfsFileIsOpenForRead(lib.hdfsFile()) is False
 
 
+def test_import_does_no_io():
+    code = ("import ctypes\n"
+            "def fail(*args):\n"
+            "    raise AssertionError('library loaded on import')\n"
+            "ctypes.cdll.LoadLibrary = fail\n"
+            "import sys, hdfs3, hdfs3.lib\n"
+            "assert not sys.modules['hdfs3.conf']._loaded\n"
+            "assert hdfs3.lib.hdfsGetLastError.__doc__\n")
+    subprocess.check_call([sys.executable, '-c', code])
+
+
 def test_bad_open(hdfs):
     with pytest.raises(IOError):
         hdfs.open('')
@@ -232,6 +347,39 @@ def test_errors(hdfs):
         hdfs.rm('/unknown')
 
 
+def test_bulk_operations(hdfs):
+    dirs = ['/tmp/test/d%d' % i for i in range(5)]
+    assert hdfs.mkdir_many(dirs) == dict.fromkeys(dirs)
+    files = [posixpath.join(d, 'x') for d in dirs]
+    for fn in files:
+        hdfs.touch(fn)
+
+    out = hdfs.chmod_many('/tmp/test/d*/x', 0o700)
+    assert out == dict.fromkeys(files)
+    assert all(hdfs.info(fn)['permissions'] == 0o700 for fn in files)
+
+    out = hdfs.set_replication_many(files + ['/tmp/test/missing'], 2)
+    assert all(out[fn] is None for fn in files)
+    assert isinstance(out['/tmp/test/missing'], IOError)
+    assert all(hdfs.info(fn)['replication'] == 2 for fn in files)
+
+    moves = dict((fn, fn + 'y') for fn in files)
+    assert hdfs.mv_many(moves) == dict.fromkeys(files)
+    assert all(hdfs.exists(fn + 'y') for fn in files)
+
+    with pytest.raises(ValueError):
+        hdfs.rm_many([dirs[0], dirs[1], dirs[0]])
+    with pytest.raises(ValueError):
+        hdfs.mv_many([(files[0] + 'y', files[0]), (files[0] + 'y', 'z')])
+    assert all(hdfs.exists(d) for d in dirs)
+
+    out = hdfs.rm_many(dirs + ['/tmp/test/missing'])
+    assert list(out) == dirs + ['/tmp/test/missing']
+    assert all(out[d] is None for d in dirs)
+    assert out['/tmp/test/missing'] is not None
+    assert not any(hdfs.exists(d) for d in dirs)
+
+
 def test_makedirs(hdfs):
     hdfs.makedirs('/tmp/test/a/b/c/d/e')
     hdfs.info('/tmp/test/a/b/c/d/e')
@@ -295,6 +443,88 @@ def test_walk(hdfs):
     check('/tmp/test/c/d', {'/tmp', '/tmp/test', '/tmp/test/c'})
 
 
+def test_find(hdfs):
+    hdfs.mkdir('/tmp/test/c/')
+    hdfs.mkdir('/tmp/test/c/d/')
+    for fn in (posixpath.join(dirname, f)
+               for (dirname, (_, fils)) in tree.items()
+               for f in fils):
+        hdfs.touch(fn)
+    with hdfs.open('/tmp/test/c/x1', 'wb', replication=1) as f:
+        f.write(b'123')
+
+    everything = set(posixpath.join(dirname, f)
+                     for (dirname, (dirs, fils)) in tree.items()
+                     for f in dirs + fils)
+    assert set(hdfs.find('/tmp/test')) == everything
+    assert set(hdfs.find('/tmp/test', kind='directory')) == {'/tmp/test/c',
+                                                             '/tmp/test/c/d'}
+    assert hdfs.find('/tmp/test', min_size=1) == ['/tmp/test/c/x1']
+    assert set(hdfs.find('/tmp/test', name='^x')) == {'/tmp/test/c/x1',
+                                                      '/tmp/test/c/x2',
+                                                      '/tmp/test/c/d/x3'}
+    assert set(hdfs.find('/tmp/test', name='^x', maxdepth=2)) == {
+        '/tmp/test/c/x1', '/tmp/test/c/x2'}
+    assert set(hdfs.find('/tmp/test', name='^x',
+                         prune=lambda d: d.name == 'd')) == {'/tmp/test/c/x1',
+                                                             '/tmp/test/c/x2'}
+    out = hdfs.find('/tmp/test', name='x1', detail=True)
+    assert out == [hdfs.info('/tmp/test/c/x1')]
+
+    with pytest.raises(FileNotFoundError):
+        hdfs.find('/tmp/test/missing')
+
+    def vanish(d):
+        # a directory removed once found is skipped when its level is listed
+        if d.name == 'd':
+            hdfs.rm(d.path)
+        return False
+    assert set(hdfs.find('/tmp/test', name='^x', prune=vanish)) == {
+        '/tmp/test/c/x1', '/tmp/test/c/x2'}
+
+
+def test_watch(hdfs):
+    hdfs.mkdir(c)
+    hdfs.touch(a)
+    watcher = hdfs.watch('/tmp/test', interval=0.1, initial=True)
+    events = sorted(next(watcher)[:2] for _ in range(2))
+    assert events == [('added', a), ('added', c)]
+
+    x = posixpath.join(c, 'x')
+    hdfs.touch(x)
+    event, path, info = next(watcher)
+    assert (event, path) == ('added', x)
+    assert info == hdfs.info(x)
+
+    with hdfs.open(x, 'wb', replication=1) as f:
+        f.write(b'123')
+    event, path, info = next(watcher)
+    assert (event, path, info['size']) == ('modified', x, 3)
+
+    hdfs.rm(c)
+    events = sorted(next(watcher)[:2] for _ in range(2))
+    assert events == [('removed', c), ('removed', x)]
+    watcher.close()
+
+
+def test_tree_snapshot_lists_only_changes(hdfs, monkeypatch):
+    from hdfs3.watch import TreeSnapshot
+    hdfs.mkdir(c)
+    hdfs.touch(a)
+    time.sleep(1)  # let the tree's mtimes fall before the first listing
+    snapshot = TreeSnapshot(hdfs, '/tmp/test')
+    listed = []
+    scandir = hdfs.scandir
+    monkeypatch.setattr(hdfs, 'scandir',
+                        lambda path: listed.append(path) or scandir(path))
+    assert len(snapshot.poll()) == 2
+    assert sorted(listed) == ['/tmp/test', c]
+
+    del listed[:]
+    assert snapshot.poll() == []
+    assert listed == []
+
+
 def test_info(hdfs):
     with hdfs.open(a, 'wb', replication=1) as f:
         f.write('a' * 5)
@@ -402,6 +632,29 @@ def test_tail_head(hdfs):
     assert hdfs.tail(a, 100) == b'0123456789'
 
 
+def test_cat_ranges(hdfs):
+    with hdfs.open(a, 'wb', replication=1) as f:
+        f.write(b'0123456789')
+    with hdfs.open(b, 'wb', replication=1) as f:
+        f.write(b'abcdefghij')
+
+    out = hdfs.cat_ranges([a, b, a, c], [-3, 2, None, 0], [None, 4, 2, 1])
+    assert out[:3] == [b'789', b'cd', b'01']
+    assert isinstance(out[3], FileNotFoundError)
+
+    assert hdfs.cat_ranges([a, b], -2, None) == [b'89', b'ij']
+    assert hdfs.cat_ranges([a, b], 8, 100, sizes=[10, 10]) == [b'89', b'ij']
+    assert hdfs.cat_ranges([a], 20, 30) == [b'']
+    assert hdfs.cat_ranges([a], -20, 2) == [b'01']
+    assert hdfs.cat_ranges([], 0, 1) == []
+    with pytest.raises(ValueError):
+        hdfs.cat_ranges([a, b], [0], [1, 2])
+
+    hedged = HDFileSystem(host=test_host, port=test_port, hedge=0)
+    assert hedged.cat_ranges([a, b], 0, 1) == [b'0', b'a']
+    assert hedged.hedge.stats()['reads'] == 2
+
+
 @pytest.yield_fixture
 def conffile():
     fd, fname = tempfile.mkstemp()
@@ -480,6 +733,20 @@ def test_read_delimited_block(hdfs):
         assert b''.join(filter(None, out)) == data
 
 
+def test_hedged_read_block(hdfs):
+    data = b'123\n456\n789'
+    with hdfs.open(a, 'wb', replication=1) as f:
+        f.write(data)
+
+    hedged = HDFileSystem(host=test_host, port=test_port, hedge=0)
+    assert hedged.read_block(a, 1, 5, delimiter=b'\n') == b'456\n'
+    assert hedged.read_block(a, 0, 100) == data
+    stats = hedged.hedge.stats()
+    assert stats['reads'] == 2
+    assert stats['hedged'] == 2
+    assert HDFileSystem(connect=False, hedge=True).hedge.delay is None
+
+
 @pytest.mark.parametrize(['lineterminator'], [(b'\n',), (b'--',)])
 def test_readline(hdfs, lineterminator):
     with hdfs.open(a, 'wb', replication=1) as f:
@@ -565,10 +832,58 @@ def test_stress_read_block(hdfs):
             t.join()
 
 
-def test_different_handles():
+def test_shared_handles():
     a = HDFileSystem(host=test_host, port=test_port)
     b = HDFileSystem(host=test_host, port=test_port)
-    assert a._handle.contents.filesystem != b._handle.contents.filesystem
+    c = HDFileSystem(host=test_host, port=test_port, user='other')
+    assert a._handle.contents.filesystem == b._handle.contents.filesystem
+    assert a._handle.contents.filesystem != c._handle.contents.filesystem
+
+    a.disconnect()
+    assert a._handle is None
+    assert b.exists('/')
+    b.disconnect()
+    c.disconnect()
+
+    d = HDFileSystem(host=test_host, port=test_port)
+    assert d.exists('/')
+    d.disconnect()
+
+
+def test_thread_local_handles():
+    hdfs = HDFileSystem(host=test_host, port=test_port, thread_local=True,
+                        max_handles=3)
+    main = hdfs._handle.contents.filesystem
+    assert hdfs._handle.contents.filesystem == main
+    q = Queue()
+
+    def run():
+        fs = hdfs._handle.contents.filesystem
+        assert hdfs.exists('/')
+        assert hdfs._handle.contents.filesystem == fs
+        with hdfs.open('/tmp/test/a', 'wb', replication=1) as f:
+            assert f._fs.contents.filesystem == fs
+        q.put(fs)
+
+    for i in range(5):
+        t = Thread(target=run)
+        t.start()
+        t.join()
+    handles = [q.get() for i in range(5)]
+    assert len(set(handles)) == 3
+    assert main in handles
+
+    hdfs.disconnect()
+    assert hdfs._handle is None
+
+
+def test_lazy_connect_on_unpickle(hdfs):
+    import pickle
+    hdfs2 = pickle.loads(pickle.dumps(hdfs))
+    assert 'Disconnected' in repr(hdfs2)
+    assert hdfs2.exists('/')
+    assert 'Disconnected' not in repr(hdfs2)
+    assert hdfs2._handle is hdfs._handle
 
 
 def handle(q):
@@ -596,19 +911,30 @@ def test_different_handles_in_processes():
 
 
 @pytest.mark.skipif(not hasattr(os, 'fork'), reason='No fork()')
-def test_warn_on_fork():
-    hdfs = HDFileSystem(host=test_host, port=test_port)
-    hdfs.disconnect()
+def test_fork(hdfs):
+    data = b'0123456789' * 1000
+    with hdfs.open(a, 'wb', replication=1) as f:
+        f.write(data)
+    parent_handle = hdfs._handle.contents.filesystem
+    f = hdfs.open(a, 'rb')
+    f.seek(2)
+    assert f.read(3) == b'234'
+    assert f.loc == 5
+    w = hdfs.open(b, 'wb', replication=1)
+    w.write(b'parent')
 
     pid = os.fork()
     if not pid:
         # In child
         try:
-            with pytest.warns(RuntimeWarning) as record:
-                hdfs = HDFileSystem(host=test_host, port=test_port)
-            assert len(record) == 1
-            assert ("Attempting to re-use hdfs3 in child process"
-                    in str(record[0].message))
+            assert hdfs.exists(a)
+            assert hdfs._handle.contents.filesystem != parent_handle
+            assert f.read(5) == b'56789'
+            assert f.tell() == 10
+            with pytest.raises(IOError):
+                w.write(b'child')
+            with hdfs.open(c, 'wb', replication=1) as f2:
+                f2.write(b'child')
         except BaseException:
             print("\n------ Child exception -------")
             traceback.print_exc()
@@ -621,6 +947,14 @@ def test_warn_on_fork():
     if status:
         pytest.fail("child raised exception")
 
+    assert hdfs._handle.contents.filesystem == parent_handle
+    assert f.read(5) == b'56789'
+    f.close()
+    w.write(b'!')
+    w.close()
+    assert hdfs.cat(b) == b'parent!'
+    assert hdfs.cat(c) == b'child'
+
 
 def test_ensure():
     assert isinstance(ensure_bytes(''), bytes)
@@ -793,6 +1127,31 @@ def test_get_block_locations(hdfs):
     locs = hdfs.get_block_locations(a)
     assert len(locs) == 1
     assert locs[0]['length'] == 3
+    assert hdfs.get_block_locations(a) == locs
+    assert hdfs._block_cache.info()['hits'] == 1
+
+    # rewriting the file invalidates the cached locations
+    with hdfs.open(a, 'wb', replication=1) as f:
+        f.write(b'12345')
+    assert hdfs.get_block_locations(a)[0]['length'] == 5
+
+
+def test_locality_map(hdfs):
+    pytest.importorskip('numpy')
+    for fn in [a, b]:
+        with hdfs.open(fn, 'wb', replication=1) as f:
+            f.write(b'123')
+
+    m = hdfs.locality_map([a, b, c])
+    assert m['paths'] == [a, b]
+    assert list(m['errors']) == [c]
+    assert list(m['block_path']) == [0, 1]
+    assert list(m['block_length']) == [3, 3]
+    assert m['host_bytes'].sum() == 6
+    assert len(m['block_hosts']) == m['block_hosts_ptr'][-1] == 2
+    assert ([m['hosts'][i] for i in m['block_hosts']] ==
+            [ensure_string(h) for fn in [a, b]
+             for h in hdfs.get_block_locations(fn)[0]['hosts']])
 
 
 def test_chmod(hdfs):
@@ -0,0 +1,91 @@
+import pickle
+import threading
+import time
+
+import pytest
+
+from hdfs3.hedge import HedgedReads
+
+
+def test_fast_reads_not_hedged():
+    h = HedgedReads(delay=1)
+    assert h.read(lambda: b'data') == b'data'
+    assert h.stats() == {'reads': 1, 'hedged': 0, 'hedge_won': 0,
+                         'threshold': 1}
+
+
+def test_read_inline_without_threshold():
+    h = HedgedReads(min_samples=1)
+    assert h.read(threading.current_thread) is threading.current_thread()
+    assert h.stats()['reads'] == 1
+    # with a threshold, the background threads are reused
+    h = HedgedReads(delay=1)
+    h.read(lambda: None)
+    count = threading.active_count()
+    for i in range(5):
+        h.read(lambda: None)
+    assert threading.active_count() == count
+
+
+def test_slow_read_hedged():
+    calls = []
+    lock = threading.Lock()
+    second_done = threading.Event()
+
+    def read():
+        with lock:
+            calls.append(None)
+            first = len(calls) == 1
+        if first:
+            second_done.wait()
+            return b'slow'
+        second_done.set()
+        return b'fast'
+
+    h = HedgedReads(delay=0.05)
+    assert h.read(read) == b'fast'
+    assert len(calls) == 2
+    stats = h.stats()
+    assert stats['hedged'] == 1
+    assert stats['hedge_won'] == 1
+
+    # with no delay, both reads start at once
+    calls[:] = []
+    second_done.clear()
+    h = HedgedReads(delay=0)
+    assert h.read(read) == b'fast'
+    assert h.stats()['hedged'] == 1
+
+
+def test_errors():
+    def fail():
+        raise ValueError('bad')
+
+    h = HedgedReads(delay=0.01)
+    with pytest.raises(ValueError):
+        h.read(fail)
+
+    calls = []
+
+    def slow_fail_then_succeed():
+        calls.append(None)
+        if len(calls) == 1:
+            time.sleep(0.1)
+            raise ValueError('bad')
+        time.sleep(0.2)
+        return b'ok'
+
+    assert h.read(slow_fail_then_succeed) == b'ok'
+
+
+def test_adaptive_threshold():
+    h = HedgedReads(percentile=50, min_samples=3, min_delay=0)
+    assert h.threshold() is None
+    for delay in [0.01, 0.02, 0.03]:
+        h.read(lambda: time.sleep(delay))
+    assert 0.02 <= h.threshold() < 0.03
+    assert h.stats()['hedged'] == 0
+
+    h2 = pickle.loads(pickle.dumps(h))
+    assert h2.percentile == 50
+    assert h2.stats()['reads'] == 0
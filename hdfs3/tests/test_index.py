@@ -0,0 +1,50 @@
+import time
+
+from hdfs3.tests.test_hdfs3 import hdfs
+from hdfs3.index import HDFSIndex
+
+hdfs = hdfs  # squash flake8 errors
+
+
+def test_index(hdfs):
+    for d in ['/tmp/test/a', '/tmp/test/a/x', '/tmp/test/b']:
+        hdfs.mkdir(d)
+    for fn, data in [('/tmp/test/a/f1.csv', b'0123456789'),
+                     ('/tmp/test/a/x/f2.csv', b'01234'),
+                     ('/tmp/test/b/f3.txt', b'0')]:
+        with hdfs.open(fn, 'wb', replication=1) as f:
+            f.write(data)
+    # directories changed in the second they are listed are listed again
+    time.sleep(1)
+
+    idx = HDFSIndex(hdfs, '/tmp/test', ':memory:')
+    assert len(idx) == 7
+    assert idx.glob('/tmp/test/*/*.csv') == ['/tmp/test/a/f1.csv']
+    assert idx.du('/tmp/test', total=True) == {'/tmp/test': 16}
+    assert idx.find(min_size=5, kind='file') == ['/tmp/test/a/f1.csv',
+                                                 '/tmp/test/a/x/f2.csv']
+    info = hdfs.info('/tmp/test/b/f3.txt')
+    info.pop('encryption_info')
+    assert idx.info('/tmp/test/b/f3.txt') == info
+    assert idx.refresh()['listed'] == 0
+
+    hdfs.rm('/tmp/test/a/x')
+    hdfs.touch('/tmp/test/b/new')
+    stats = idx.refresh()
+    assert stats['listed'] == 2
+    assert idx.find(kind='file') == ['/tmp/test/a/f1.csv',
+                                     '/tmp/test/b/f3.txt',
+                                     '/tmp/test/b/new']
+    assert set(idx.ls('/tmp/test/b')) == set(hdfs.ls('/tmp/test/b'))
+
+
+def test_index_persists(hdfs, tmpdir):
+    hdfs.touch('/tmp/test/a')
+    time.sleep(1)
+    fn = str(tmpdir.join('index.db'))
+    HDFSIndex(hdfs, '/tmp/test', fn).close()
+
+    idx = HDFSIndex(hdfs, '/tmp/test', fn, refresh=False)
+    assert idx.exists('/tmp/test/a')
+    assert idx.last_refresh is not None
+    assert idx.refresh() == {'listed': 0, 'checked': 0}
@@ -1,5 +1,12 @@
+import pickle
+import threading
+import time
+
+import pytest
+
 from hdfs3.tests.test_hdfs3 import hdfs
-from hdfs3.mapping import HDFSMap
+from hdfs3.compression import MAGIC
+from hdfs3.mapping import HDFSMap, HDFSPackedMap
 
 hdfs = hdfs  # squash flake8 errors
 root = '/tmp/mapping'
@@ -75,3 +82,319 @@ def test_bytearray(hdfs):
     d['x'] = bytearray(b'123')
 
     assert d['x'] == b'123'
+
+
+def test_batch(hdfs):
+    d = HDFSMap(hdfs, root)
+    d.clear()
+    d.setitems({'x': b'1', 'y': b'2', 'z': b''})
+    d.setitems([('w', b'3' * 100000)])
+    assert d.getitems(['x', 'y', 'z', 'w', 'missing']) == {
+        'x': b'1', 'y': b'2', 'z': b'', 'w': b'3' * 100000}
+
+    d.delitems(['x', 'y', 'missing'])
+    assert set(d) == {'z', 'w'}
+    assert d.getitems([]) == {}
+
+
+def test_read_errors(hdfs, monkeypatch):
+    d = HDFSMap(hdfs, root)
+    d['x'] = b'1'
+
+    def fail(path, mode='rb', **kwargs):
+        raise IOError('read failed')
+
+    monkeypatch.setattr(hdfs, 'open', fail)
+    # only a missing file is a missing key
+    with pytest.raises(KeyError):
+        d['missing']
+    assert d.getitems(['missing']) == {}
+    with pytest.raises(IOError):
+        d['x']
+    with pytest.raises(IOError):
+        d.getitems(['x', 'missing'])
+
+
+def test_cache(hdfs):
+    d = HDFSMap(hdfs, root, cache_bytes=10)
+    d.clear()
+    assert HDFSMap(hdfs, root).cache_info() is None
+    d['x'] = b'12345'
+    d['y'] = b'67890'
+    assert d['x'] == b'12345'
+    assert d['x'] == b'12345'
+    info = d.cache_info()
+    assert info['hits'] == 1 and info['misses'] == 1
+    assert info['size'] == 5
+
+    # writes through this map invalidate, others' writes are not seen
+    d['x'] = b'abc'
+    assert d['x'] == b'abc'
+    HDFSMap(hdfs, root)['x'] = b'other'
+    assert d['x'] == b'abc'
+
+    # LRU by size: y pushes x out
+    assert d['y'] == b'67890'
+    d.getitems(['y', 'x'])
+    assert d.cache_info()['size'] <= 10
+
+    del d['x']
+    assert 'x' not in d
+    with pytest.raises(KeyError):
+        d['x']
+
+    v = HDFSMap(hdfs, root, cache_bytes=100, validate=True)
+    # values modified within the current second are not cached: a rewrite
+    # of the same size in that second would keep the stamp
+    HDFSMap(hdfs, root)['z'] = b'aaaaa'
+    assert v['z'] == b'aaaaa'
+    HDFSMap(hdfs, root)['z'] = b'bbbbb'
+    assert v['z'] == b'bbbbb'
+
+    time.sleep(1)
+    assert v['y'] == b'67890'
+    assert v['y'] == b'67890'
+    HDFSMap(hdfs, root)['y'] = b'changed'
+    assert v['y'] == b'changed'
+    assert v.cache_info()['stale'] == 1
+    assert v.cache_info()['hits'] == 1
+
+    v.clear()
+    assert v.cache_info()['count'] == 0
+
+
+def test_cache_write_during_read(hdfs):
+    d = HDFSMap(hdfs, root, cache_bytes=100)
+    d['x'] = b'old'
+    read = d._read
+    have_read, written = threading.Event(), threading.Event()
+
+    def slow_read(path):
+        out = read(path)
+        have_read.set()
+        written.wait()
+        return out
+
+    d._read = slow_read
+    t = threading.Thread(target=lambda: d['x'])
+    t.start()
+    have_read.wait()
+    d['x'] = b'new'
+    written.set()
+    t.join()
+    del d._read
+    # the old value read meanwhile was not cached
+    assert d['x'] == b'new'
+
+
+def test_snapshot(hdfs):
+    d = HDFSMap(hdfs, root, snapshot=True)
+    d.clear()
+    d.setitems({'x': b'1', 'y': b'2'})
+    hdfs.mkdir(root + '/a/b')
+    hdfs.touch(root + '/a/b/0')
+    hdfs.touch(root + '/a/1')
+
+    # written by others: not seen until refreshed
+    assert len(d) == 2 and 'x' in d
+    assert d.refresh() == {'x', 'y', 'a/1', 'a/b/0'}
+    assert len(d) == 4
+    assert d.listdir() == ['a', 'x', 'y']
+    assert d.listdir('a') == ['1', 'b']
+    assert d.listdir('a/b/') == ['0']
+    assert d.listdir('missing') == []
+
+    d['z'] = b'3'
+    del d['x']
+    d.delitems(['y', 'missing'])
+    assert set(d) == {'z', 'a/1', 'a/b/0'}
+    assert 'x' not in d and 'z' in d
+
+    # the same answers from the name-node
+    d2 = HDFSMap(hdfs, root)
+    assert set(d2) == set(d)
+    assert d2.listdir('a') == ['1', 'b']
+    assert len(d2) == 3
+
+
+def test_nested_keys(hdfs):
+    d = HDFSMap(hdfs, root)
+    d.clear()
+    d.setitems({'a/0': b'0', 'a/b/1': b'1'})
+    d['c'] = b'2'
+    assert d['a/b/1'] == b'1'
+    assert set(d) == {'a/0', 'a/b/1', 'c'}
+    assert d.listdir() == ['a', 'c']
+    assert d.listdir('a') == ['0', 'b']
+    assert 'a/0' in d and 'a' not in d
+    with pytest.raises(KeyError):
+        d['a']
+    for key in ['/a', 'a//b', 'a/', 'a/../b', './a']:
+        with pytest.raises(ValueError):
+            d[key] = b''
+    with pytest.raises(ValueError):
+        HDFSMap(hdfs, root + '-nested', shards=4)['a/b'] = b''
+
+
+def test_packed(hdfs):
+    proot = root + '-packed'
+    if hdfs.exists(proot):
+        hdfs.rm(proot)
+    with HDFSPackedMap(hdfs, proot, pack_bytes=10) as d:
+        d['x'] = b'123'
+        d.setitems({'y': b'456', 'z': b''})
+        # readable while still buffered
+        assert d['x'] == b'123'
+        assert d.pack_info()['pending'] == 6
+        d['w'] = b'0' * 20  # fills the buffer: written as a pack
+        assert d.pack_info()['packs'] == 1
+    assert d.pack_info()['pending'] == 0
+    assert sorted(hdfs.ls(proot, detail=False)) == [
+        proot + '/00000000.idx', proot + '/00000000.pack']
+
+    d2 = HDFSPackedMap(hdfs, proot)
+    assert set(d2) == {'x', 'y', 'z', 'w'}
+    assert d2['y'] == b'456' and d2['z'] == b''
+    assert d2.getitems(['x', 'w', 'missing']) == {
+        'x': b'123', 'w': b'0' * 20}
+    with pytest.raises(TypeError):
+        d2[1] = b''
+
+    d2['x'] = b'abc'
+    del d2['y']
+    d2.delitems(['z', 'missing'])
+    with pytest.raises(KeyError):
+        del d2['y']
+    d2.flush()
+    info = d2.pack_info()
+    assert (info['packs'], info['bytes'], info['live_bytes']) == (2, 29, 23)
+
+    d.refresh()
+    assert set(d) == {'x', 'w'}
+    assert d['x'] == b'abc'
+    assert 'y' not in d
+
+    assert d.compact() == 6
+    info = d.pack_info()
+    assert info['bytes'] == info['live_bytes'] == 23
+    assert len(hdfs.ls(proot)) == 2 * info['packs']
+
+    d['v'] = b'1'
+    d.flush()
+    packs = d.pack_info()['packs']
+    del d['v']
+    d.flush()  # deletions only: an index is written, but no pack
+    assert d.pack_info()['packs'] == packs
+    assert d.compact() == 1
+    assert len(hdfs.ls(proot)) == 2 * d.pack_info()['packs']
+
+    d['u'] = b'2'
+    d3 = pickle.loads(pickle.dumps(d))  # flushes the buffered value
+    assert d.pack_info()['pending'] == 0
+    assert dict(d3.items()) == {'x': b'abc', 'w': b'0' * 20, 'u': b'2'}
+
+    d3.clear()
+    assert len(d3) == 0
+    assert hdfs.ls(proot) == []
+
+
+def test_write_behind(hdfs):
+    d = HDFSMap(hdfs, root, write_behind=4, workers=2)
+    d.clear()
+    with d:
+        for i in range(20):
+            d[str(i)] = b'%d' % i
+        d['x'] = b'1'
+        d['x'] = bytearray(b'2')
+        # queued values are seen by reads
+        assert d['x'] == b'2'
+        assert 'x' in d
+        assert d.getitems(['x', '19']) == {'x': b'2', '19': b'19'}
+    assert HDFSMap(hdfs, root)['x'] == b'2'
+    assert len(d) == 21
+
+    d.setitems({'y': b'3', 'z': b'4'})
+    del d['y']
+    assert set(d) == set(map(str, range(20))) | {'x', 'z'}
+    d2 = pickle.loads(pickle.dumps(d))
+    assert d2['z'] == b'4'
+
+    hdfs.mkdir(root + '/dir')
+    d['dir'] = b'cannot write over a directory'
+    with pytest.raises(IOError):
+        d.flush()
+    d.flush()
+
+    # an exception leaving the block is not replaced by a write error
+    with pytest.raises(ZeroDivisionError):
+        with d:
+            d['dir'] = b'cannot write over a directory'
+            1 / 0
+    with pytest.raises(IOError):
+        d.flush()
+
+
+def test_compression(hdfs):
+    d = HDFSMap(hdfs, root, compression='gzip')
+    d.clear()
+    d['x'] = b'0' * 10000
+    assert hdfs.info(root + '/x')['size'] < 1000
+    assert d['x'] == b'0' * 10000
+
+    # stores mixing codecs and raw values read back correctly
+    raw = HDFSMap(hdfs, root)
+    raw['y'] = b'raw'
+    assert raw['x'] == b'0' * 10000
+    d.setitems({'z': b'1' * 100})
+    assert d.getitems(['x', 'y', 'z']) == {
+        'x': b'0' * 10000, 'y': b'raw', 'z': b'1' * 100}
+
+    # raw values which start like compressed ones are read back as stored
+    for value in [MAGIC, MAGIC + b'\x01binary', MAGIC + b'\xff']:
+        raw['w'] = value
+        assert raw['w'] == value
+        assert d['w'] == value
+
+    with pytest.raises(ValueError):
+        HDFSMap(hdfs, root, compression='rar')
+
+
+def test_shards(hdfs):
+    if hdfs.exists(root):
+        hdfs.rm(root)
+    flat = HDFSMap(hdfs, root)
+    flat['a'] = b'1'
+    # existing keys would be hidden by sharding
+    with pytest.raises(ValueError):
+        HDFSMap(hdfs, root, shards=16)
+    assert list(flat) == ['a']
+    hdfs.rm(root)
+
+    d = HDFSMap(hdfs, root, shards=16)
+    d.setitems(dict((str(i), b'%d' % i) for i in range(50)))
+    d['x', 1] = b'tuple'
+    assert d['7'] == b'7' and d['x', 1] == b'tuple'
+    assert set(d) == set(map(str, range(50))) | {str(('x', 1))}
+    assert d.listdir() == sorted(d)
+
+    # keys are spread over (lazily made) subdirectories
+    dirs = [p for p in hdfs.ls(root, detail=False) if hdfs.isdir(p)]
+    assert 1 < len(dirs) <= 16
+    assert all(len(hdfs.ls(p)) < 50 for p in dirs)
+
+    del d['7']
+    assert '7' not in d and len(d) == 50
+    s = HDFSMap(hdfs, root, shards=16, snapshot=True)
+    assert len(s) == 50 and '8' in s and '7' not in s
+    assert pickle.loads(pickle.dumps(d))['8'] == b'8'
+
+    # opened without a number of shards, the recorded one is used
+    o = HDFSMap(hdfs, root)
+    assert o.shards == 16
+    assert set(o) == set(d) and o['8'] == b'8'
+
+    with pytest.raises(ValueError):
+        HDFSMap(hdfs, root, shards=8)
+    d.clear()
+    assert list(d) == []
+    hdfs.rm(root)
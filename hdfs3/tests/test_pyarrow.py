@@ -0,0 +1,55 @@
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+pafs = pytest.importorskip('pyarrow.fs')
+
+from hdfs3._pyarrow import open_input_file, arrow_filesystem, HDFSHandler  # noqa
+from hdfs3.tests.test_hdfs3 import hdfs, a  # noqa: E402
+hdfs = hdfs  # squash flake8 errors
+
+
+def test_input_file(hdfs):
+    with hdfs.open(a, 'wb') as f:
+        f.write(b'0123456789')
+    f = open_input_file(hdfs, a)
+    assert f.size() == 10
+    assert f.read_at(3, 2) == b'234'
+    buf = f.read_buffer(4)
+    assert isinstance(buf, pa.Buffer)
+    assert buf.to_pybytes() == b'5678'
+    f.seek(-2, 2)
+    assert f.read() == b'89'
+    f.close()
+
+
+def test_dataset(hdfs):
+    pq = pytest.importorskip('pyarrow.parquet')
+    ds = pytest.importorskip('pyarrow.dataset')
+    fs = arrow_filesystem(hdfs)
+    table = pa.table({'x': list(range(100))})
+    fs.create_dir('/tmp/test/table/part=0')
+    pq.write_table(table, '/tmp/test/table/part=0/0.parquet', filesystem=fs)
+    pq.write_table(table, '/tmp/test/table/1.parquet', filesystem=fs)
+
+    infos = fs.get_file_info(['/tmp/test/table/1.parquet',
+                              '/tmp/test/table', '/tmp/test/missing'])
+    assert [i.type for i in infos] == [pafs.FileType.File,
+                                       pafs.FileType.Directory,
+                                       pafs.FileType.NotFound]
+    assert infos[0].size == hdfs.info('/tmp/test/table/1.parquet')['size']
+    found = fs.get_file_info(pafs.FileSelector('/tmp/test/table',
+                                               recursive=True))
+    assert len(found) == 3
+
+    data = ds.dataset('/tmp/test/table', filesystem=fs, format='parquet')
+    assert data.to_table().num_rows == 200
+
+    fs.delete_dir_contents('/tmp/test/table')
+    assert hdfs.ls('/tmp/test/table') == []
+
+
+def test_handler_hashable(hdfs):
+    handler = HDFSHandler(hdfs)
+    assert handler == HDFSHandler(hdfs)
+    assert hash(handler) == hash(HDFSHandler(hdfs))
+    assert len({handler, HDFSHandler(hdfs)}) == 1
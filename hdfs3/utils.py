@@ -1,9 +1,13 @@
 from __future__ import absolute_import
 
+from collections import OrderedDict
 from contextlib import contextmanager
+import functools
+from multiprocessing.pool import ThreadPool
 import os
 import shutil
 import tempfile
+import threading
 
 from .compatibility import PY3, bytes, unicode
 
@@ -159,5 +163,140 @@ def tmpfile(extension=''):
                 pass
 
 
+def threaded_map(func, seq, workers, return_exceptions=False):
+    """ Apply ``func`` to every item of ``seq`` on a pool of threads
+
+    Results are returned in the order of ``seq``. The native library releases
+    the GIL, so this gives real concurrency for calls into libhdfs3.
+
+    Parameters
+    ----------
+    func: callable
+        Function of one argument
+    seq: iterable
+        Items to call ``func`` on
+    workers: int
+        Maximum number of threads to use; if 1, runs serially in this thread
+    return_exceptions: bool (False)
+        If True, an exception raised for an item is placed in the output
+        list instead of being raised.
+
+    >>> threaded_map(lambda x: x + 1, [1, 2, 3], workers=2)
+    [2, 3, 4]
+    >>> threaded_map(lambda x: 1 // x, [1, 0], 2, True)  # doctest: +ELLIPSIS
+    [1, ZeroDivisionError(...)]
+    """
+    seq = list(seq)
+    if return_exceptions:
+        func = _capture_exceptions(func)
+    workers = min(workers, len(seq))
+    if workers <= 1:
+        return [func(x) for x in seq]
+    pool = ThreadPool(workers)
+    try:
+        return pool.map(func, seq, chunksize=1)
+    finally:
+        pool.terminate()
+
+
+def _capture_exceptions(func):
+    @functools.wraps(func)
+    def wrapped(*args):
+        try:
+            return func(*args)
+        except Exception as e:
+            return e
+    return wrapped
+
+
+class LRUCache(object):
+    """ Thread-safe cache which evicts the least recently used items
+
+    Parameters
+    ----------
+    maxsize: int
+        Maximum total size of the values held
+    sizeof: callable or None
+        Gives the size of a value; by default every value has size 1, so
+        that ``maxsize`` is a number of items.
+
+    Caches do not travel: a pickled cache unpickles empty.
+
+    >>> c = LRUCache(2)
+    >>> c.put('a', 1); c.put('b', 2); c.get('a')
+    1
+    >>> c.put('c', 3)
+    >>> 'b' in c
+    False
+    >>> c.info()['hits']
+    1
+    """
+
+    def __init__(self, maxsize, sizeof=None):
+        self.maxsize = maxsize
+        self.sizeof = sizeof
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """ Value for key, marking it as recently used, or default """
+        with self._lock:
+            try:
+                item = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = item
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value):
+        """ Store value, evicting old items if over size; values larger than
+        ``maxsize`` are not stored """
+        size = self.sizeof(value) if self.sizeof else 1
+        with self._lock:
+            self._discard(key)
+            if size > self.maxsize:
+                return
+            self._data[key] = (value, size)
+            self.size += size
+            while self.size > self.maxsize:
+                _, (_, old) = self._data.popitem(last=False)
+                self.size -= old
+
+    def discard(self, key):
+        """ Remove key if present """
+        with self._lock:
+            self._discard(key)
+
+    def _discard(self, key):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.size -= item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def info(self):
+        """ Hit/miss statistics and current occupancy """
+        return {'hits': self.hits, 'misses': self.misses,
+                'count': len(self._data), 'size': self.size,
+                'maxsize': self.maxsize}
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __reduce__(self):
+        return (LRUCache, (self.maxsize, self.sizeof))
+
+
 class MyNone(object):
     """ A do-nothing class to see if parameter was passed """
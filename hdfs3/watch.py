@@ -0,0 +1,157 @@
+"Incremental change detection for directory trees on HDFS"
+from __future__ import absolute_import
+
+import posixpath
+import time
+
+from .compatibility import FileNotFoundError
+from .core import DEFAULT_WORKERS
+from .utils import threaded_map
+
+
+class TreeSnapshot(object):
+    """ In-memory state of a directory tree, updated incrementally by polling
+
+    Each ``poll()`` checks the root with one ``info`` call and then descends
+    one level at a time: a directory whose modification time is unchanged
+    keeps its remembered children, and only directories whose time changed
+    are listed again. Since HDFS does not update a directory's time when a
+    file inside it grows, files which were added or modified in the previous
+    poll are also re-checked with ``info`` until they stop changing.
+    Modification times only have a resolution of one second, so a directory
+    last changed in the second its listing started is listed once more on
+    the next poll, to catch changes made within that second.
+
+    Parameters
+    ----------
+    hdfs : HDFileSystem
+    root : string
+        directory to watch
+    recursive : bool (True)
+        whether to watch subdirectories
+    workers : int
+        number of concurrent requests
+    """
+
+    def __init__(self, hdfs, root, recursive=True,
+                 workers=DEFAULT_WORKERS):
+        self.hdfs = hdfs
+        self.root = root.rstrip('/') or '/'
+        self.recursive = recursive
+        self.workers = workers
+        self.listed = {}    # directory -> mtime when its children were listed
+        self.children = {}  # directory -> set of child paths
+        self.entries = {}   # path -> DirEntry
+        self.hot = set()    # files changed in the previous poll
+        self.hot_dirs = set()  # directories to list again, see poll
+
+    def _forget(self, path, events):
+        """ Drop path and everything below it, recording removal events """
+        for child in self.children.pop(path, ()):
+            self._forget(child, events)
+        self.listed.pop(path, None)
+        self.hot.discard(path)
+        self.hot_dirs.discard(path)
+        entry = self.entries.pop(path, None)
+        if entry is not None:
+            events.append(('removed', path, None))
+
+    def _update(self, path, entry, events):
+        """ Store a fresh entry, recording an event if it changed
+
+        Directories are only reported when they appear, disappear or change
+        kind; changes to their contents are reported for the children.
+        """
+        old = self.entries.get(path)
+        self.entries[path] = entry
+        if old is None:
+            events.append(('added', path, entry.to_dict()))
+        elif old.kind != entry.kind:
+            for child in self.children.pop(path, ()):
+                self._forget(child, events)
+            self.listed.pop(path, None)
+            events.append(('modified', path, entry.to_dict()))
+        elif entry.is_file() and (old.size != entry.size or
+                                  old.last_mod != entry.last_mod):
+            events.append(('modified', path, entry.to_dict()))
+        else:
+            return False
+        return True
+
+    def poll(self):
+        """ Bring the snapshot up to date
+
+        Returns
+        -------
+        list of ``(event, path, info)`` tuples, where event is one of
+        'added', 'modified' or 'removed' and info is the new ``ls``-style
+        dict of the entry, or None for removals.
+        """
+        events, changed, relisted, hot_dirs = [], set(), set(), set()
+        info = self.hdfs.info(self.root)
+        level = [(self.root, info['last_mod'])]
+        while level:
+            unknown = [p for p, mtime in level if mtime is None]
+            infos = threaded_map(self.hdfs.info, unknown, self.workers,
+                                 return_exceptions=True)
+            current = dict(level)
+            for p, res in zip(unknown, infos):
+                if isinstance(res, FileNotFoundError):
+                    self._forget(p, events)
+                    del current[p]
+                elif isinstance(res, Exception):
+                    raise res
+                else:
+                    current[p] = res['last_mod']
+            stale = [p for p, mtime in current.items()
+                     if self.listed.get(p) != mtime or p in self.hot_dirs]
+            started = int(time.time())
+            listings = threaded_map(lambda p: list(self.hdfs.scandir(p)),
+                                    stale, self.workers,
+                                    return_exceptions=True)
+            level = []
+            for p, res in zip(stale, listings):
+                if isinstance(res, FileNotFoundError):
+                    self._forget(p, events)
+                    continue
+                elif isinstance(res, Exception):
+                    raise res
+                new = dict((e.path, e) for e in res)
+                for gone in self.children.get(p, set()) - set(new):
+                    self._forget(gone, events)
+                for child, entry in new.items():
+                    if self._update(child, entry, events):
+                        changed.add(child)
+                    if entry.is_dir() and self.recursive:
+                        level.append((child, entry.last_mod))
+                self.children[p] = set(new)
+                # a later change within the same second keeps the mtime
+                if current[p] >= started:
+                    hot_dirs.add(p)
+                self.listed[p] = current[p]
+                relisted.add(p)
+            if self.recursive:
+                for p in set(current) - set(stale):
+                    level.extend((c, None) for c in self.children.get(p, ())
+                                 if self.entries[c].is_dir())
+        self.hot_dirs = hot_dirs
+        self._check_hot(events, changed, relisted)
+        return events
+
+    def _check_hot(self, events, changed, relisted):
+        """ Re-check files that changed last time but were not re-listed """
+        hot = [p for p in self.hot if p in self.entries and
+               posixpath.dirname(p) not in relisted]
+        infos = threaded_map(self.hdfs._entry, hot, self.workers,
+                             return_exceptions=True)
+        for p, res in zip(hot, infos):
+            if isinstance(res, FileNotFoundError):
+                parent = posixpath.dirname(p)
+                self.children.get(parent, set()).discard(p)
+                self._forget(p, events)
+            elif isinstance(res, Exception):
+                raise res
+            elif self._update(p, res, events):
+                changed.add(p)
+        self.hot = set(p for p in changed
+                       if p in self.entries and self.entries[p].is_file())
@@ -15,6 +15,9 @@ setup(name='hdfs3',
       keywords='hdfs',
       packages=['hdfs3'],
       install_requires=[],
+      entry_points={
+          'fsspec.specs': ['hdfs3=hdfs3._fsspec:FsspecHDFileSystem'],
+      },
       long_description=(open('README.rst').read() if os.path.exists('README.rst')
                         else ''),
       zip_safe=False)